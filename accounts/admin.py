@@ -1,37 +1,141 @@
 from django.contrib import admin
-from .models import CustomUser, VendorProfile, CustomerProfile,Property, PropertyImage, PropertyFeature
+from django.core.paginator import Paginator
+from django.db import OperationalError, connections
+from django.db.models import Q
+from django.db.models.functions import Lower
+from django.utils.functional import cached_property
+from .models import CustomUser, VendorProfile, CustomerProfile,Property, PropertyImage, PropertyFeature, Review
 from django.contrib.auth.admin import UserAdmin
+from listings import fulltext
 
 
+# --------------------------------
+# Changelists for large tables
+# --------------------------------
+# Filtered or searched changelists count at most this many rows.
+COUNT_LIMIT = 10_000
+
+
+def estimated_row_count(model, using='default'):
+    """Row count from SQLite's ANALYZE statistics, or None if it has none"""
+    connection = connections[using]
+    if connection.vendor != 'sqlite':
+        return None
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT stat FROM sqlite_stat1 WHERE tbl = %s", [model._meta.db_table])
+            counts = [int(stat.split()[0]) for stat, in cursor.fetchall()]
+    except OperationalError:
+        # No sqlite_stat1 table: ANALYZE has never run.
+        return None
+    return max(counts) if counts else None
+
+
+class EstimatedCountPaginator(Paginator):
+    """Counts without scanning millions of rows.
+
+    The unfiltered list uses the ANALYZE estimate (refreshed by ``ANALYZE``
+    or ``PRAGMA optimize``). A filtered list counts up to ``COUNT_LIMIT``
+    matches and stops there, so its last pages may come up empty.
+    """
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not queryset.query.where:
+            estimate = estimated_row_count(queryset.model, queryset.db)
+            if estimate is not None:
+                return estimate
+        return queryset.order_by()[:COUNT_LIMIT].count()
+
+
+def prefix_q(field, term):
+    """``field`` starts with ``term``, as a range the field's index can seek"""
+    return Q(**{f'{field}__gte': term, f'{field}__lt': term + '\U0010ffff'})
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    paginator = EstimatedCountPaginator
+    # Skip the second, unfiltered count on filtered pages.
+    show_full_result_count = False
+
 
 # Register your models here.
 @admin.register(CustomUser)
-class CustomUserAdmin(admin.ModelAdmin):
+class CustomUserAdmin(LargeTableAdmin):
     list_display = ['email', 'username', 'role', 'is_active', 'created_at']
     list_filter = ['role', 'is_active']
-    search_fields = ['email', 'username']
+    search_fields = ['^email', '^username']
+
+    def get_search_results(self, request, queryset, search_term):
+        """Case-insensitive prefix match on email or username, through their lowercased indexes"""
+        term = search_term.strip().lower()
+        if not term:
+            return queryset, False
+        queryset = queryset.alias(email_lower=Lower('email'), username_lower=Lower('username'))
+        return queryset.filter(prefix_q('email_lower', term) | prefix_q('username_lower', term)), False
+
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        obj.ensure_role_profile()
 
 @admin.register(VendorProfile)
 class VendorProfileAdmin(admin.ModelAdmin):
     list_display = ['user', 'company_name', 'rating', 'total_reviews']
+    list_select_related = ['user']
 
 @admin.register(CustomerProfile)
 class CustomerProfileAdmin(admin.ModelAdmin):
     list_display = ['user', 'occupation', 'preferred_location']
+    list_select_related = ['user']
 
 @admin.register(Property)
-class PropertyAdmin(admin.ModelAdmin):
+class PropertyAdmin(LargeTableAdmin):
     list_display = ['title', 'property_type', 'listing_type', 'status', 'price', 'city', 'vendor', 'is_featured', 'created_at']
     list_filter = ['property_type', 'listing_type', 'status', 'is_featured', 'is_verified', 'created_at']
-    search_fields = ['title', 'city', 'state', 'vendor__email']
+    # VendorProfile.__str__ reads the vendor's user too.
+    list_select_related = ['vendor__user']
+    search_fields = ['title', 'city', 'state', 'vendor__user__email']
+    raw_id_fields = ['vendor']
+
+    def get_search_results(self, request, queryset, search_term):
+        """An id, a vendor's exact email, or keywords via the full-text index"""
+        term = search_term.strip()
+        if not term:
+            return queryset, False
+        if term.isdigit():
+            return queryset.filter(pk=int(term)), False
+        if '@' in term:
+            return queryset.filter(vendor__user__email=term), False
+        return queryset.filter(fulltext.matching_q(term)), False
 
 @admin.register(PropertyImage)
-class PropertyImageAdmin(admin.ModelAdmin):
+class PropertyImageAdmin(LargeTableAdmin):
     list_display = ['property', 'alt_text', 'created_at']
     list_filter = ['created_at']
-    search_fields = ['property__title', 'alt_text']
+    list_select_related = ['property']
+    search_fields = ['property__title']
+    raw_id_fields = ['property']
+
+    def get_search_results(self, request, queryset, search_term):
+        """Images of the property with this id, or of properties matching the keywords"""
+        term = search_term.strip()
+        if not term:
+            return queryset, False
+        if term.isdigit():
+            return queryset.filter(property_id=int(term)), False
+        return queryset.filter(property__in=Property.objects.filter(fulltext.matching_q(term))), False
 
 
 @admin.register(PropertyFeature)
-class PropertyFeatureAdmin(admin.ModelAdmin):
-    list_display = ['property', 'feature']
\ No newline at end of file
+class PropertyFeatureAdmin(LargeTableAdmin):
+    list_display = ['property', 'feature']
+    list_select_related = ['property']
+    raw_id_fields = ['property']
+
+@admin.register(Review)
+class ReviewAdmin(LargeTableAdmin):
+    list_display = ['vendor', 'customer', 'property', 'score', 'created_at']
+    list_filter = ['score', 'created_at']
+    list_select_related = ['vendor__user', 'customer__user', 'property']
+    raw_id_fields = ['customer', 'vendor', 'property']
@@ -0,0 +1,54 @@
+from django.contrib.auth.backends import ModelBackend, UserModel
+from django.core.exceptions import PermissionDenied
+
+
+class ProfileModelBackend(ModelBackend):
+    """ModelBackend that loads the session user together with its role profile.
+
+    ``get_user`` runs on every authenticated request; joining both profile
+    tables here means ``request.user.role_profile`` (and the reverse
+    ``vendor_profile`` / ``customer_profile`` accessors) never query again.
+
+    ``ModelBackend`` stays listed after it so sessions logged in through it
+    keep working. Both check the same password, so a rejected login stops
+    here rather than hashing a second time in the fallback.
+    """
+
+    def authenticate(self, request, username=None, password=None, **kwargs):
+        user = super().authenticate(request, username=username, password=password, **kwargs)
+        if user is None and password is not None:
+            raise PermissionDenied
+        return user
+
+    def get_user(self, user_id):
+        try:
+            user = (
+                UserModel._default_manager
+                .select_related('vendor_profile', 'customer_profile')
+                .get(pk=user_id)
+            )
+        except UserModel.DoesNotExist:
+            return None
+        return user if self.user_can_authenticate(user) else None
+
+    async def aget_user(self, user_id):
+        # request.auser() calls this; the default one would skip the join.
+        try:
+            user = await (
+                UserModel._default_manager
+                .select_related('vendor_profile', 'customer_profile')
+                .aget(pk=user_id)
+            )
+        except UserModel.DoesNotExist:
+            return None
+        return user if self.user_can_authenticate(user) else None
+
+
+async def load_user(request):
+    """Resolve ``request.user`` through the async auth API, for async views.
+
+    ``request.user`` is otherwise loaded lazily on first access, which from
+    a template rendered inside an async view would query synchronously.
+    """
+    request.user = await request.auser()
+    return request.user
@@ -1,4 +1,5 @@
 from django import forms
+from django.template.loader import render_to_string
 from django.contrib.auth.forms import (
     UserCreationForm, UserChangeForm, PasswordResetForm,
     SetPasswordForm, AuthenticationForm
@@ -7,6 +8,8 @@ from .models import (
     CustomUser, VendorProfile, CustomerProfile,
     Property, PropertyImage, PropertyFeature
 )
+from .outbox import enqueue_email
+from listings.models import SavedSearch
 
 
 # ===========================
@@ -40,6 +43,7 @@ class RegistrationForm(UserCreationForm):
         user.role = 'customer'
         if commit:
             user.save()
+            user.ensure_role_profile()
         return user
 
 #VENDOR FORM
@@ -69,6 +73,7 @@ class VendorRegistrationForm(UserCreationForm):
         user.role = 'vendor'
         if commit:
             user.save()
+            user.ensure_role_profile()
         return user
 
 
@@ -136,15 +141,42 @@ class CustomerProfileForm(forms.ModelForm):
     """Form for updating customer profile"""
     class Meta:
         model = CustomerProfile
-        fields = ['date_of_birth', 'occupation', 'preferred_location', 'budget_min', 'budget_max']
+        fields = [
+            'date_of_birth', 'occupation', 'preferred_location', 'budget_min', 'budget_max',
+            'preferred_property_type', 'preferred_bedrooms'
+        ]
         widgets = {
             'date_of_birth': forms.DateInput(attrs={'class': 'form-control', 'type': 'date'}),
             'occupation': forms.TextInput(attrs={'class': 'form-control', 'placeholder': 'Occupation'}),
             'preferred_location': forms.TextInput(attrs={'class': 'form-control', 'placeholder': 'Preferred Location'}),
             'budget_min': forms.NumberInput(attrs={'class': 'form-control', 'placeholder': 'Minimum Budget'}),
             'budget_max': forms.NumberInput(attrs={'class': 'form-control', 'placeholder': 'Maximum Budget'}),
+            'preferred_property_type': forms.Select(attrs={'class': 'form-control'}),
+            'preferred_bedrooms': forms.NumberInput(attrs={'class': 'form-control', 'placeholder': 'Bedrooms'}),
+        }
+
+
+class SavedSearchForm(forms.ModelForm):
+    """Criteria for new-listing alerts; blank fields match any listing"""
+    class Meta:
+        model = SavedSearch
+        fields = ['name', 'city', 'property_type', 'listing_type', 'min_price', 'max_price']
+        widgets = {
+            'name': forms.TextInput(attrs={'class': 'form-control', 'placeholder': 'e.g. 3-bed flats in Lagos'}),
+            'city': forms.TextInput(attrs={'class': 'form-control', 'placeholder': 'Any city'}),
+            'property_type': forms.Select(attrs={'class': 'form-control'}),
+            'listing_type': forms.Select(attrs={'class': 'form-control'}),
+            'min_price': forms.NumberInput(attrs={'class': 'form-control', 'placeholder': 'Minimum Price'}),
+            'max_price': forms.NumberInput(attrs={'class': 'form-control', 'placeholder': 'Maximum Price'}),
         }
 
+    def clean(self):
+        cleaned_data = super().clean()
+        min_price, max_price = cleaned_data.get('min_price'), cleaned_data.get('max_price')
+        if min_price is not None and max_price is not None and min_price > max_price:
+            raise forms.ValidationError("Minimum price cannot be above the maximum price.")
+        return cleaned_data
+
 
 # ====================
 # PASSWORD RESET FORMS
@@ -161,6 +193,24 @@ class CustomPasswordResetForm(PasswordResetForm):
         })
     )
 
+    def send_mail(self, subject_template_name, email_template_name,
+                  context, from_email, to_email, html_email_template_name=None):
+        """Queue the reset email instead of sending it inside the request"""
+        subject = render_to_string(subject_template_name, context)
+        # Email subject *must not* contain newlines
+        subject = "".join(subject.splitlines())
+        if html_email_template_name is not None:
+            body = render_to_string(html_email_template_name, context)
+        else:
+            body = render_to_string(email_template_name, context)
+        enqueue_email(
+            subject=subject,
+            body=body,
+            to=[to_email],
+            from_email=from_email,
+            html=html_email_template_name is not None,
+        )
+
 
 class CustomSetPasswordForm(SetPasswordForm):
     """Custom set password form with styling"""
@@ -194,7 +244,7 @@ class PropertyForm(forms.ModelForm):
         model = Property
         fields = [
             'title', 'description', 'property_type', 'listing_type', 'status',
-            'address', 'city', 'state', 'price', 'currency',
+            'address', 'city', 'state', 'latitude', 'longitude', 'price', 'currency',
             'bedrooms', 'bathrooms', 'square_footage', 'year_built',
             'is_featured', 'is_verified'
         ]
@@ -204,8 +254,25 @@ class PropertyForm(forms.ModelForm):
             'address': forms.TextInput(attrs={'class': 'form-control', 'placeholder': 'Property Address'}),
             'city': forms.TextInput(attrs={'class': 'form-control', 'placeholder': 'City'}),
             'state': forms.TextInput(attrs={'class': 'form-control', 'placeholder': 'State'}),
+            'latitude': forms.NumberInput(attrs={'class': 'form-control', 'placeholder': 'Latitude', 'step': 'any', 'min': -90, 'max': 90}),
+            'longitude': forms.NumberInput(attrs={'class': 'form-control', 'placeholder': 'Longitude', 'step': 'any', 'min': -180, 'max': 180}),
             'price': forms.NumberInput(attrs={'class': 'form-control', 'placeholder': 'Price'}),
             'currency': forms.TextInput(attrs={'class': 'form-control', 'placeholder': 'Currency'}),
             'square_footage': forms.NumberInput(attrs={'class': 'form-control', 'placeholder': 'Square Footage'}),
             'year_built': forms.NumberInput(attrs={'class': 'form-control', 'placeholder': 'Year Built'}),
         }
+
+
+class PropertyImportForm(forms.Form):
+    """Upload form for bulk importing properties from CSV or JSONL"""
+    file = forms.FileField(
+        help_text="CSV with a header row, or JSON Lines (one property object per line).",
+        widget=forms.ClearableFileInput(attrs={'class': 'form-control', 'accept': '.csv,.jsonl,.ndjson'})
+    )
+
+    def clean_file(self):
+        from listings.importer import detect_format
+        upload = self.cleaned_data['file']
+        if detect_format(upload.name) is None:
+            raise forms.ValidationError("Upload a .csv or .jsonl file.")
+        return upload
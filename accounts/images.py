@@ -0,0 +1,83 @@
+"""Off-request responsive image variants for uploaded images.
+
+When a model in ``IMAGE_FIELDS`` is saved with a new upload, the resize
+job is handed to a process pool after the transaction commits. The worker
+writes thumb/card/full variants in WebP and JPEG under
+``MEDIA_ROOT/variants/<hash>/`` and the pool callback stores the content
+hash, placeholder and variant width on the row, then sends ``variants_built``.
+"""
+import logging
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.dispatch import Signal
+
+from . import imaging
+
+
+logger = logging.getLogger(__name__)
+
+WORKERS = getattr(settings, 'IMAGE_VARIANT_WORKERS', 2)
+
+# Sent with ``pk`` once a row's hash and placeholder are stored; the row is
+# updated with QuerySet.update(), so post_save does not fire for it.
+variants_built = Signal()
+
+# model label -> (image field, hash field, placeholder field, width field)
+IMAGE_FIELDS = {
+    'accounts.PropertyImage': ('image', 'image_hash', 'image_placeholder', 'image_width'),
+    'accounts.CustomUser': (
+        'profile_image', 'profile_image_hash', 'profile_image_placeholder', 'profile_image_width',
+    ),
+}
+
+_executor = None
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(max_workers=WORKERS)
+    return _executor
+
+
+def fields_for(instance):
+    return IMAGE_FIELDS.get(instance._meta.label)
+
+
+def _store_result(model, pk, name, future):
+    image_field, hash_field, placeholder_field, width_field = IMAGE_FIELDS[model._meta.label]
+    try:
+        digest, placeholder, width = future.result()
+        # Only record the result if the row still points at the same file.
+        updated = model.objects.filter(pk=pk, **{image_field: name}).update(
+            **{hash_field: digest, placeholder_field: placeholder, width_field: width}
+        )
+        if updated:
+            variants_built.send(sender=model, pk=pk)
+    except Exception:
+        logger.exception("Building image variants failed for %s %s (%s)", model._meta.label, pk, name)
+    finally:
+        close_old_connections()
+
+
+def submit(instance, force=False):
+    """Queue variant generation for ``instance``'s current image"""
+    image_field = fields_for(instance)[0]
+    file = getattr(instance, image_field)
+    if not file:
+        return None
+    model, pk, name = type(instance), instance.pk, file.name
+    future = get_executor().submit(imaging.build_variants, file.path, settings.MEDIA_ROOT, force)
+    future.add_done_callback(lambda f: _store_result(model, pk, name, f))
+    return future
+
+
+def schedule(instance):
+    """Submit once the surrounding transaction commits, so the file and row exist"""
+    transaction.on_commit(lambda: submit(instance))
+
+
+def variant_url(digest, variant, ext):
+    return settings.MEDIA_URL + imaging.variant_name(digest, variant, ext)
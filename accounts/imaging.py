@@ -0,0 +1,104 @@
+"""Image resizing work that runs inside the variant process pool.
+
+Kept free of Django imports so pool workers only need Pillow.
+"""
+import base64
+import hashlib
+import io
+import os
+
+from PIL import Image, ImageFilter, ImageOps
+
+
+# Variant name -> maximum width in pixels, smallest first.
+VARIANTS = {
+    'thumb': 160,
+    'card': 480,
+    'full': 1280,
+}
+FORMATS = {
+    'webp': {'format': 'WEBP', 'quality': 78, 'method': 4},
+    'jpg': {'format': 'JPEG', 'quality': 80, 'optimize': True, 'progressive': True},
+}
+PLACEHOLDER_WIDTH = 16
+VARIANT_ROOT = 'variants'
+
+
+def content_hash(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as handle:
+        for chunk in iter(lambda: handle.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def variant_dir(digest):
+    """Storage-relative directory holding every variant of one source image"""
+    return f"{VARIANT_ROOT}/{digest[:2]}/{digest}"
+
+
+def variant_name(digest, variant, ext):
+    return f"{variant_dir(digest)}/{variant}.{ext}"
+
+
+def variant_widths(width):
+    """``{variant: width in pixels}`` for a set whose largest variant is ``width`` wide.
+
+    Images are never upscaled, so variants above the source's width would
+    only repeat the largest one and are left out.
+    """
+    widths = {}
+    for variant, max_width in VARIANTS.items():
+        widths[variant] = min(width, max_width)
+        if width <= max_width:
+            break
+    return widths
+
+
+def _placeholder(image):
+    """A tiny blurred JPEG as a data URI, shown while the real image loads"""
+    width = PLACEHOLDER_WIDTH
+    height = max(1, round(image.height * width / image.width))
+    tiny = image.resize((width, height)).filter(ImageFilter.GaussianBlur(1))
+    buffer = io.BytesIO()
+    tiny.save(buffer, format='JPEG', quality=40)
+    return 'data:image/jpeg;base64,' + base64.b64encode(buffer.getvalue()).decode()
+
+
+def _largest_width(out_dir):
+    largest = max(VARIANTS, key=VARIANTS.get)
+    with Image.open(os.path.join(out_dir, f"{largest}.jpg")) as image:
+        return image.width
+
+
+def build_variants(source_path, media_root, force=False):
+    """Write every variant of ``source_path`` under ``media_root``.
+
+    Returns ``(digest, placeholder, width)``, ``width`` being that of the
+    largest variant. Images whose content hash already has a complete
+    variant set are not decoded again unless ``force`` is set.
+    """
+    digest = content_hash(source_path)
+    out_dir = os.path.join(media_root, variant_dir(digest))
+    placeholder_path = os.path.join(out_dir, 'placeholder.txt')
+    if os.path.exists(placeholder_path) and not force:
+        with open(placeholder_path) as handle:
+            return digest, handle.read(), _largest_width(out_dir)
+
+    os.makedirs(out_dir, exist_ok=True)
+    with Image.open(source_path) as original:
+        image = ImageOps.exif_transpose(original).convert('RGB')
+
+    for variant, max_width in VARIANTS.items():
+        resized = image
+        if image.width > max_width:
+            height = max(1, round(image.height * max_width / image.width))
+            resized = image.resize((max_width, height), Image.LANCZOS)
+        for ext, options in FORMATS.items():
+            resized.save(os.path.join(out_dir, f"{variant}.{ext}"), **options)
+
+    placeholder = _placeholder(image)
+    # Written last: its presence marks the set as complete for later duplicates.
+    with open(placeholder_path, 'w') as handle:
+        handle.write(placeholder)
+    return digest, placeholder, min(image.width, max(VARIANTS.values()))
@@ -0,0 +1,56 @@
+import time
+
+from django.contrib.auth.hashers import PBKDF2PasswordHasher, get_hashers
+from django.core.management.base import BaseCommand
+
+from accounts.hashers import TunedPBKDF2PasswordHasher
+
+
+class Command(BaseCommand):
+    help = "Measure password verifications per second per core for each configured hasher"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--duration', type=float, default=2.0,
+                            help="Seconds to spend on each hasher (default 2)")
+        parser.add_argument('--pbkdf2-iterations', type=int, nargs='*', default=[],
+                            help="Also try PBKDF2-SHA256 at these iteration counts")
+
+    def handle(self, *args, **options):
+        candidates = [(hasher.algorithm, self.describe(hasher), hasher) for hasher in get_hashers()]
+        for iterations in options['pbkdf2_iterations']:
+            hasher = TunedPBKDF2PasswordHasher()
+            hasher.iterations = iterations
+            candidates.append((hasher.algorithm, f"iterations={iterations}", hasher))
+
+        self.stdout.write(f"{'hasher':<24} {'parameters':<24} {'ms/login':>10} {'logins/s/core':>14}")
+        for name, parameters, hasher in candidates:
+            try:
+                encoded = hasher.encode('benchmark-password', hasher.salt())
+            except ValueError as exc:
+                # Library not installed (argon2-cffi, bcrypt, ...)
+                self.stdout.write(f"{name:<24} {'-':<24} skipped: {exc}")
+                continue
+            seconds_per_login = self.measure(hasher, encoded, options['duration'])
+            self.stdout.write(
+                f"{name:<24} {parameters:<24} {seconds_per_login * 1000:>10.1f} "
+                f"{1 / seconds_per_login:>14.1f}"
+            )
+
+    def describe(self, hasher):
+        if isinstance(hasher, PBKDF2PasswordHasher):
+            return f"iterations={hasher.iterations}"
+        for attribute in ('time_cost', 'rounds', 'work_factor', 'iterations'):
+            if hasattr(hasher, attribute):
+                return f"{attribute}={getattr(hasher, attribute)}"
+        return ''
+
+    def measure(self, hasher, encoded, duration):
+        """Average seconds per ``verify()`` on one core, run for about ``duration`` seconds"""
+        hasher.verify('benchmark-password', encoded)  # warm-up / library import
+        runs, start = 0, time.perf_counter()
+        while True:
+            hasher.verify('benchmark-password', encoded)
+            runs += 1
+            elapsed = time.perf_counter() - start
+            if elapsed >= duration:
+                return elapsed / runs
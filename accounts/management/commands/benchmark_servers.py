@@ -0,0 +1,182 @@
+import asyncio
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+from wsgiref.util import setup_testing_defaults
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.handlers.asgi import ASGIHandler
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client, override_settings
+
+from accounts.models import Property
+
+
+HOST = 'benchmark.local'
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare WSGI and ASGI throughput and tail latency for the same pages: "
+        "many concurrent clients against a threaded WSGI worker and an ASGI event loop"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'paths', nargs='*',
+            help="Paths to request (default: home page, API property list and detail)",
+        )
+        parser.add_argument('--concurrency', type=int, default=64, help="Clients with a request in flight")
+        parser.add_argument('--requests', type=int, default=1000, help="Requests per path and server")
+        parser.add_argument(
+            '--threads', type=int, default=8,
+            help="WSGI worker threads, like a threaded server's pool (the clients queue for them)",
+        )
+        parser.add_argument('--login', metavar='EMAIL', help="Send the session cookie of this user")
+
+    def handle(self, *args, **options):
+        paths = options['paths'] or self.default_paths()
+        headers = [('host', HOST)]
+        if options['login']:
+            headers.append(('cookie', self.session_cookie(options['login'])))
+
+        self.stdout.write(
+            f"{options['requests']} requests per path, {options['concurrency']} concurrent clients, "
+            f"{options['threads']} WSGI threads"
+        )
+        self.stdout.write(
+            f"{'path':<40} {'server':<6} {'req/s':>8} {'p50':>9} {'p95':>9} {'p99':>9} {'max':>9} {'errors':>7}"
+        )
+        with override_settings(ALLOWED_HOSTS=[HOST], SERVER_TIMING_HEADER=False, SERVER_TIMING_LOG=False):
+            servers = [('wsgi', WSGIServer(WSGIHandler(), options['threads'])), ('asgi', ASGIServer(ASGIHandler()))]
+            for path in paths:
+                for name, server in servers:
+                    elapsed, latencies, errors = asyncio.run(
+                        self.run(server, path, headers, options['requests'], options['concurrency'])
+                    )
+                    self.report(path, name, elapsed, latencies, errors)
+            servers[0][1].close()
+
+    def default_paths(self):
+        pk = Property.objects.exclude(status='inactive').values_list('pk', flat=True).first()
+        # Async views plus the sync API list for comparison; pass the
+        # listings page explicitly, its facet counts make it slow on big tables.
+        paths = ['/', '/api/v1/properties?limit=20']
+        if pk is not None:
+            paths.append(f'/api/v1/properties/{pk}')
+        return paths
+
+    def session_cookie(self, email):
+        user = get_user_model().objects.filter(email=email).first()
+        if user is None:
+            raise CommandError(f"No user with email {email}")
+        client = Client()
+        client.force_login(user)
+        return f"{settings.SESSION_COOKIE_NAME}={client.cookies[settings.SESSION_COOKIE_NAME].value}"
+
+    async def run(self, server, path, headers, total, concurrency):
+        # One untimed request first, so lazy loading is not counted.
+        await server.request(path, headers)
+        latencies = []
+        errors = 0
+        remaining = total
+
+        async def client():
+            nonlocal remaining, errors
+            while remaining > 0:
+                remaining -= 1
+                started = time.perf_counter()
+                status = await server.request(path, headers)
+                latencies.append(time.perf_counter() - started)
+                errors += status != 200
+
+        started = time.perf_counter()
+        await asyncio.gather(*(client() for _ in range(concurrency)))
+        return time.perf_counter() - started, latencies, errors
+
+    def report(self, path, name, elapsed, latencies, errors):
+        latencies.sort()
+
+        def ms(fraction):
+            return f"{latencies[min(int(len(latencies) * fraction), len(latencies) - 1)] * 1000:>7.1f}ms"
+        self.stdout.write(
+            f"{path[:40]:<40} {name:<6} {len(latencies) / elapsed:>8.0f} "
+            f"{statistics.median(latencies) * 1000:>7.1f}ms {ms(0.95)} {ms(0.99)} {ms(1.0)} {errors:>7}"
+        )
+
+
+class WSGIServer:
+    """Runs the WSGI application on a fixed pool of threads, as a threaded server would"""
+
+    def __init__(self, application, threads):
+        self.application = application
+        self.pool = ThreadPoolExecutor(max_workers=threads)
+
+    async def request(self, path, headers):
+        return await asyncio.get_running_loop().run_in_executor(self.pool, self.call, path, headers)
+
+    def call(self, path, headers):
+        url = urlsplit(path)
+        environ = {'PATH_INFO': url.path, 'QUERY_STRING': url.query}
+        for name, value in headers:
+            environ['HTTP_' + name.upper().replace('-', '_')] = value
+        setup_testing_defaults(environ)
+        status = []
+        result = self.application(environ, lambda line, response_headers, exc_info=None: status.append(line))
+        try:
+            for _ in result:
+                pass
+        finally:
+            # Fires request_finished, which closes the thread's database connection.
+            result.close()
+        return int(status[0].split()[0])
+
+    def close(self):
+        self.pool.shutdown()
+
+
+class ASGIServer:
+    """Calls the ASGI application directly on the running event loop"""
+
+    def __init__(self, application):
+        self.application = application
+
+    async def request(self, path, headers):
+        url = urlsplit(path)
+        scope = {
+            'type': 'http',
+            'asgi': {'version': '3.0'},
+            'http_version': '1.1',
+            'method': 'GET',
+            'scheme': 'http',
+            'path': url.path,
+            'raw_path': url.path.encode(),
+            'query_string': url.query.encode(),
+            'root_path': '',
+            'headers': [(name.encode(), value.encode()) for name, value in headers],
+            'client': ('127.0.0.1', 0),
+            'server': (HOST, 80),
+        }
+        body_sent = False
+        disconnected = asyncio.Event()
+        status = []
+
+        async def receive():
+            nonlocal body_sent
+            if not body_sent:
+                body_sent = True
+                return {'type': 'http.request', 'body': b'', 'more_body': False}
+            # The client stays connected until the response is complete.
+            await disconnected.wait()
+            return {'type': 'http.disconnect'}
+
+        async def send(message):
+            if message['type'] == 'http.response.start':
+                status.append(message['status'])
+
+        await self.application(scope, receive, send)
+        disconnected.set()
+        return status[0]
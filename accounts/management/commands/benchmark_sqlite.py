@@ -0,0 +1,149 @@
+import os
+import sqlite3
+import statistics
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from estates.sqlite import PROFILES, begin_statement, connect
+
+
+SEED_ROWS = 20000
+
+
+def variants():
+    """Settings from SQLite's defaults to the production profile, one change at a time"""
+    default, production = PROFILES['default'], PROFILES['production']
+    immediate = {**default, 'timeout': production['timeout'], 'transaction_mode': production['transaction_mode']}
+    wal = {**immediate, 'pragmas': {'journal_mode': 'wal'}}
+    return [
+        ('default', default),
+        ('+ busy timeout, BEGIN IMMEDIATE', immediate),
+        ('+ WAL (synchronous=FULL)', wal),
+        ('production', production),
+    ]
+
+
+class Stats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.commits = 0
+        self.errors = 0
+        self.lock_waits = []
+        self.reads = 0
+
+
+class Command(BaseCommand):
+    help = "Measure concurrent write throughput and lock waits for each SQLite connection setting"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--writers', type=int, default=8, help="Concurrent writing connections")
+        parser.add_argument('--readers', type=int, default=2, help="Concurrent reading connections")
+        parser.add_argument('--duration', type=float, default=3.0, help="Seconds per setting")
+        parser.add_argument(
+            '--directory',
+            help="Where to create the scratch databases (default: next to the configured "
+                 "database, so fsync costs match the real disk)",
+        )
+
+    def handle(self, *args, **options):
+        directory = options['directory'] or Path(settings.DATABASES['default']['NAME']).parent
+        self.stdout.write(
+            f"{options['writers']} writers, {options['readers']} readers, "
+            f"{options['duration']:.0f}s each, scratch databases in {directory}"
+        )
+        self.stdout.write(
+            f"{'setting':<32} {'commits/s':>10} {'locked':>7} "
+            f"{'wait p50':>9} {'wait p95':>9} {'wait max':>9} {'reads/s':>9}"
+        )
+        for label, profile in variants():
+            handle, path = tempfile.mkstemp(suffix='.sqlite3', dir=directory)
+            os.close(handle)
+            try:
+                stats = self.run(path, profile, options)
+            finally:
+                for suffix in ('', '-wal', '-shm', '-journal'):
+                    if os.path.exists(path + suffix):
+                        os.remove(path + suffix)
+            waits = sorted(stats.lock_waits) or [0.0]
+            self.stdout.write(
+                f"{label:<32} {stats.commits / options['duration']:>10.0f} {stats.errors:>7} "
+                f"{statistics.median(waits) * 1000:>7.1f}ms {waits[int(len(waits) * 0.95)] * 1000:>7.1f}ms "
+                f"{waits[-1] * 1000:>7.1f}ms {stats.reads / options['duration']:>9.0f}"
+            )
+
+    def seed(self, path, profile):
+        connection = connect(path, profile)
+        connection.execute('CREATE TABLE counter (id INTEGER PRIMARY KEY, value INTEGER NOT NULL)')
+        connection.execute('CREATE TABLE item (id INTEGER PRIMARY KEY, owner INTEGER NOT NULL, payload TEXT NOT NULL)')
+        connection.execute('BEGIN')
+        connection.executemany('INSERT INTO counter (id, value) VALUES (?, 0)', ((i,) for i in range(100)))
+        connection.executemany(
+            'INSERT INTO item (owner, payload) VALUES (?, ?)', ((i % 100, 'x' * 200) for i in range(SEED_ROWS))
+        )
+        connection.execute('COMMIT')
+        connection.close()
+
+    def run(self, path, profile, options):
+        self.seed(path, profile)
+        stats = Stats()
+        deadline = time.perf_counter() + options['duration']
+        threads = [
+            threading.Thread(target=self.writer, args=(path, profile, stats, deadline, n))
+            for n in range(options['writers'])
+        ] + [
+            threading.Thread(target=self.reader, args=(path, profile, stats, deadline, n))
+            for n in range(options['readers'])
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return stats
+
+    def writer(self, path, profile, stats, deadline, number):
+        """Read-then-write transactions, like a form save: the shape that trips deferred BEGIN"""
+        connection = connect(path, profile)
+        begin = begin_statement(profile)
+        n = 0
+        while time.perf_counter() < deadline:
+            n += 1
+            owner = (number * 7919 + n) % 100
+            started = time.perf_counter()
+            try:
+                connection.execute(begin)
+                connection.execute('SELECT value FROM counter WHERE id = ?', (owner,)).fetchone()
+                # With a deferred BEGIN the write lock is taken here, not at BEGIN.
+                connection.execute('UPDATE counter SET value = value + 1 WHERE id = ?', (owner,))
+                waited = time.perf_counter() - started
+                connection.execute('INSERT INTO item (owner, payload) VALUES (?, ?)', (owner, 'y' * 200))
+                connection.execute('COMMIT')
+            except sqlite3.OperationalError:
+                if connection.in_transaction:
+                    connection.execute('ROLLBACK')
+                with stats.lock:
+                    stats.errors += 1
+                continue
+            with stats.lock:
+                stats.commits += 1
+                stats.lock_waits.append(waited)
+        connection.close()
+
+    def reader(self, path, profile, stats, deadline, number):
+        connection = connect(path, profile)
+        n = 0
+        while time.perf_counter() < deadline:
+            n += 1
+            try:
+                connection.execute(
+                    'SELECT count(*), max(id) FROM item WHERE owner = ?', ((number + n) % 100,)
+                ).fetchone()
+            except sqlite3.OperationalError:
+                continue
+            with stats.lock:
+                stats.reads += 1
+        connection.close()
@@ -0,0 +1,94 @@
+import statistics
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
+from django.core.management.base import BaseCommand, CommandError
+from django.http import QueryDict
+from django.template.backends.django import DjangoTemplates
+from django.test import RequestFactory, override_settings
+
+from listings.search import PropertySearch
+
+
+class Command(BaseCommand):
+    help = (
+        "Time rendering the main page templates with plain loaders, the cached loader, "
+        "and the cached loader plus base.html fragment caching"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('templates', nargs='*', help="Templates to render (default: index.html listings.html)")
+        parser.add_argument('--renders', type=int, default=200, help="Renders per template and setting")
+        parser.add_argument('--login', metavar='EMAIL', help="Render as this user instead of anonymously")
+
+    def handle(self, *args, **options):
+        request = RequestFactory().get('/')
+        request.user = self.user(options['login'])
+        names = options['templates'] or ['index.html', 'listings.html']
+        contexts = {name: self.context(name) for name in names}
+
+        plain = settings.TEMPLATE_LOADERS
+        cached = [('django.template.loaders.cached.Loader', plain)]
+        variants = [
+            ('plain loaders', plain, 0),
+            ('cached loader', cached, 0),
+            ('cached loader + fragments', cached, 60 * 60),
+        ]
+        self.stdout.write(f"{options['renders']} renders each, as {request.user}")
+        self.stdout.write(f"{'template':<22} {'setting':<27} {'mean':>8} {'p50':>8} {'p95':>8} {'speedup':>8}")
+        for name in names:
+            baseline = None
+            for label, loaders, fragment_seconds in variants:
+                engine = self.engine(label, loaders)
+                with override_settings(TEMPLATE_FRAGMENT_SECONDS=fragment_seconds):
+                    timings = self.time(engine, name, contexts[name], request, options['renders'])
+                mean = statistics.fmean(timings)
+                baseline = baseline or mean
+                self.stdout.write(
+                    f"{name:<22} {label:<27} {mean * 1000:>6.2f}ms {statistics.median(timings) * 1000:>6.2f}ms "
+                    f"{timings[int(len(timings) * 0.95)] * 1000:>6.2f}ms {baseline / mean:>7.1f}x"
+                )
+
+    def user(self, email):
+        if not email:
+            return AnonymousUser()
+        user = get_user_model().objects.select_related('vendor_profile', 'customer_profile').filter(email=email).first()
+        if user is None:
+            raise CommandError(f"No user with email {email}")
+        return user
+
+    def context(self, name):
+        """What the view passes; evaluated up front so only rendering is timed"""
+        if name != 'listings.html':
+            return {}
+        search = PropertySearch(QueryDict())
+        return {
+            'page': search.page(),
+            'facets': search.facets(),
+            'filters': QueryDict(),
+            'query_string': '',
+            'sort': search.sort,
+        }
+
+    def engine(self, label, loaders):
+        config = settings.TEMPLATES[0]
+        return DjangoTemplates({
+            'NAME': label,
+            'DIRS': config['DIRS'],
+            'APP_DIRS': False,
+            'OPTIONS': {**config['OPTIONS'], 'loaders': loaders},
+        })
+
+    def time(self, engine, name, context, request, renders):
+        # get_template() runs per render, as it does per request: with plain
+        # loaders that means reading and parsing the file every time.
+        engine.get_template(name).render(context, request)
+        timings = []
+        for _ in range(renders):
+            started = time.perf_counter()
+            engine.get_template(name).render(context, request)
+            timings.append(time.perf_counter() - started)
+        timings.sort()
+        return timings
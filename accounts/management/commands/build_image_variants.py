@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+
+from accounts import images
+from accounts.models import CustomUser, PropertyImage
+
+
+class Command(BaseCommand):
+    help = "Generate responsive variants for uploaded images that do not have them yet"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--all', action='store_true',
+            help="Rebuild every image's variants from its original, even if they already exist",
+        )
+
+    def handle(self, *args, **options):
+        futures = []
+        for model in (PropertyImage, CustomUser):
+            image_field, hash_field, _, width_field = images.IMAGE_FIELDS[model._meta.label]
+            queryset = model.objects.exclude(**{image_field: ''}).exclude(**{f'{image_field}__isnull': True})
+            if not options['all']:
+                # Sets built before widths were recorded only need their width read back.
+                queryset = queryset.filter(Q(**{hash_field: ''}) | Q(**{f'{width_field}__isnull': True}))
+            for instance in queryset.only('pk', image_field).iterator(chunk_size=500):
+                futures.append(images.submit(instance, force=options['all']))
+
+        # Shutting down waits for the workers and for the callbacks that save results.
+        images.get_executor().shutdown(wait=True)
+        failed = sum(1 for future in futures if future.exception() is not None)
+        self.stdout.write(f"Processed {len(futures) - failed} image(s), {failed} failed")
@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+
+from accounts import ratings
+
+
+class Command(BaseCommand):
+    help = "Report and repair vendor ratings that drifted from their reviews"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--vendor', type=int, action='append', dest='vendors',
+                            help="Limit to this VendorProfile id (repeatable)")
+        parser.add_argument('--check', action='store_true',
+                            help="Only report profiles that differ from a fresh aggregate")
+
+    def handle(self, *args, **options):
+        vendor_ids = options['vendors']
+        out_of_date = ratings.drift(vendor_ids)
+        for vendor_id, (have, expected) in sorted(out_of_date.items()):
+            self.stdout.write(
+                f"vendor {vendor_id}: have sum/count/rating {have}, expected {expected}"
+            )
+
+        if options['check']:
+            self.stdout.write(f"{len(out_of_date)} vendor rating(s) out of date")
+            return
+        if out_of_date:
+            count = ratings.reconcile(vendor_ids)
+            self.stdout.write(self.style.SUCCESS(f"Reconciled {count} vendor rating(s)"))
+        else:
+            self.stdout.write(self.style.SUCCESS("Vendor ratings are up to date"))
@@ -0,0 +1,22 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from accounts import throttling
+
+
+class Command(BaseCommand):
+    help = "Show how many requests each auth throttle bucket has rejected (needs a shared cache)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reset', action='store_true', help="Zero the counters after printing")
+
+    def handle(self, *args, **options):
+        counts = throttling.rejection_counts()
+        rates = getattr(settings, 'THROTTLE_RATES', throttling.DEFAULT_RATES)
+        for scope, limits in rates.items():
+            for kind, rate in limits.items():
+                self.stdout.write(f"{scope:<16} {kind:<8} {rate:>6}  rejected={counts.get((scope, kind), 0)}")
+        if options['reset']:
+            throttling.get_cache().delete_many(
+                [throttling.rejection_key(scope, kind) for scope, kind in counts]
+            )
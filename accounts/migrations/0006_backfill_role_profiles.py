@@ -0,0 +1,27 @@
+from django.db import migrations
+
+
+def create_missing_profiles(apps, schema_editor):
+    CustomUser = apps.get_model('accounts', 'CustomUser')
+    VendorProfile = apps.get_model('accounts', 'VendorProfile')
+    CustomerProfile = apps.get_model('accounts', 'CustomerProfile')
+
+    VendorProfile.objects.bulk_create(
+        VendorProfile(user_id=pk)
+        for pk in CustomUser.objects.filter(role='vendor', vendor_profile__isnull=True).values_list('pk', flat=True)
+    )
+    CustomerProfile.objects.bulk_create(
+        CustomerProfile(user_id=pk)
+        for pk in CustomUser.objects.filter(role='customer', customer_profile__isnull=True).values_list('pk', flat=True)
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0005_image_variants'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_missing_profiles, migrations.RunPython.noop),
+    ]
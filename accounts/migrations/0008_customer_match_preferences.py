@@ -0,0 +1,24 @@
+# Generated by Django 5.2.7 on 2026-10-18 08:57
+
+import accounts.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0007_property_geo'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customerprofile',
+            name='preferred_bedrooms',
+            field=models.PositiveSmallIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='customerprofile',
+            name='preferred_property_type',
+            field=models.CharField(blank=True, choices=accounts.models.property_type_choices, max_length=20),
+        ),
+    ]
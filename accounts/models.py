@@ -1,8 +1,12 @@
-from django.db import models
+from django.db import models, transaction
 import uuid
 from django.contrib.auth.models import AbstractBaseUser, BaseUserManager, PermissionsMixin
+from django.core.exceptions import ObjectDoesNotExist
 from django.core.validators import MinValueValidator, MaxValueValidator
+from django.db.models.functions import Lower
 from django.urls import reverse
+from django.utils.functional import cached_property
+from django.utils import timezone
 
 
 # ============================
@@ -16,7 +20,9 @@ class UserManager(BaseUserManager):
         email = self.normalize_email(email)
         user = self.model(email=email, username=username, **extra_fields)
         user.set_password(password)
-        user.save(using=self._db)
+        with transaction.atomic(using=self._db):
+            user.save(using=self._db)
+            user.ensure_role_profile()
         return user
 
     def create_superuser(self, email, username, password=None, **extra_fields):
@@ -42,6 +48,10 @@ class CustomUser(AbstractBaseUser, PermissionsMixin):
     last_name = models.CharField(max_length=150, blank=True)
     phone_number = models.CharField(max_length=20, unique=True, blank=True, null=True)
     profile_image = models.ImageField(upload_to='profiles/', blank=True, null=True)
+    # Filled in by the image variant pipeline (accounts.images)
+    profile_image_hash = models.CharField(max_length=64, blank=True, editable=False)
+    profile_image_placeholder = models.TextField(blank=True, editable=False)
+    profile_image_width = models.PositiveIntegerField(blank=True, null=True, editable=False)
 
     # Status
     is_active = models.BooleanField(default=True)
@@ -61,6 +71,11 @@ class CustomUser(AbstractBaseUser, PermissionsMixin):
         ordering = ['username']
         verbose_name = 'User'
         verbose_name_plural = 'Users'
+        indexes = [
+            # Case-insensitive prefix search in the admin (CustomUserAdmin)
+            models.Index(Lower('email'), name='user_email_lower'),
+            models.Index(Lower('username'), name='user_username_lower'),
+        ]
 
     
     
@@ -72,7 +87,32 @@ class CustomUser(AbstractBaseUser, PermissionsMixin):
     
     def is_superadmin(self):
         return self.role == 'superadmin'
-    
+
+    # role -> reverse one-to-one accessor of that role's profile
+    PROFILE_RELATIONS = {
+        'vendor': 'vendor_profile',
+        'customer': 'customer_profile',
+    }
+
+    @cached_property
+    def role_profile(self):
+        """The VendorProfile/CustomerProfile for this user's role, or None"""
+        relation = self.PROFILE_RELATIONS.get(self.role)
+        if relation is None:
+            return None
+        try:
+            return getattr(self, relation)
+        except ObjectDoesNotExist:
+            return None
+
+    def ensure_role_profile(self):
+        """Create the profile for this user's role if it does not exist yet"""
+        profile_model = {'vendor': VendorProfile, 'customer': CustomerProfile}.get(self.role)
+        if profile_model is None:
+            return None
+        profile, _ = profile_model.objects.get_or_create(user=self)
+        self.__dict__.pop('role_profile', None)
+        return profile
 
 
     def __str__(self):
@@ -100,6 +140,8 @@ class VendorProfile(models.Model):
         validators=[MinValueValidator(0), MaxValueValidator(5)]
     )
     total_reviews = models.PositiveIntegerField(default=0)
+    # Sum of review scores; with total_reviews, kept current by accounts.ratings
+    rating_sum = models.PositiveIntegerField(default=0, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -107,6 +149,10 @@ class VendorProfile(models.Model):
         return f"{self.user.get_full_name()} - {self.company_name or 'Independent Vendor'}"
 
 
+def property_type_choices():
+    return Property.PROPERTY_TYPES
+
+
 class CustomerProfile(models.Model):
     """Extended profile for customers/buyers"""
     user = models.OneToOneField(CustomUser, on_delete=models.CASCADE, related_name='customer_profile')
@@ -115,6 +161,9 @@ class CustomerProfile(models.Model):
     preferred_location = models.CharField(max_length=200, blank=True, null=True)
     budget_min = models.DecimalField(max_digits=15, decimal_places=2, blank=True, null=True)
     budget_max = models.DecimalField(max_digits=15, decimal_places=2, blank=True, null=True)
+    # Used with the fields above by the listing matcher (listings.matching)
+    preferred_property_type = models.CharField(max_length=20, choices=property_type_choices, blank=True)
+    preferred_bedrooms = models.PositiveSmallIntegerField(blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -163,6 +212,14 @@ class Property(models.Model):
     address = models.TextField()
     city = models.CharField(max_length=100)
     state = models.CharField(max_length=100)
+    latitude = models.FloatField(
+        blank=True, null=True, validators=[MinValueValidator(-90), MaxValueValidator(90)]
+    )
+    longitude = models.FloatField(
+        blank=True, null=True, validators=[MinValueValidator(-180), MaxValueValidator(180)]
+    )
+    # Derived from latitude/longitude in save(); see listings.geo
+    geohash = models.CharField(max_length=12, blank=True, editable=False)
 
     # Pricing
     price = models.DecimalField(max_digits=12, decimal_places=2)
@@ -188,6 +245,41 @@ class Property(models.Model):
     updated_at = models.DateTimeField(auto_now=True)
     views_count = models.IntegerField(default=0)
 
+    class Meta:
+        # Composite indexes matching the listing search filter shapes,
+        # each ending on the sort key used for seek pagination.
+        indexes = [
+            models.Index(fields=['status', 'created_at', 'id'], name='property_status_created'),
+            models.Index(fields=['status', 'price', 'id'], name='property_status_price'),
+            models.Index(fields=['status', 'city', 'price'], name='property_status_city_price'),
+            models.Index(fields=['status', 'state', 'price'], name='property_status_state_price'),
+            models.Index(fields=['status', 'property_type', 'listing_type', 'price'], name='property_status_type_price'),
+            models.Index(fields=['status', 'bedrooms', 'bathrooms'], name='property_status_rooms'),
+            # Geohash cell range scans for radius / map searches (listings.geo)
+            models.Index(fields=['status', 'geohash'], name='property_status_geohash'),
+        ]
+
+    def update_geohash(self):
+        from listings.geo import encode
+        if self.latitude is None or self.longitude is None:
+            self.geohash = ''
+        else:
+            self.geohash = encode(self.latitude, self.longitude)
+
+    def save(self, *args, **kwargs):
+        self.update_geohash()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and {'latitude', 'longitude'} & set(update_fields):
+            kwargs['update_fields'] = {*update_fields, 'geohash'}
+        elif update_fields is None and not args and not self._state.adding and not kwargs.get('force_insert'):
+            # views_count only moves through F() increments (listings.viewcounts); writing
+            # back the value loaded with this instance would undo any flushed since.
+            kwargs['update_fields'] = [
+                field.attname for field in self._meta.concrete_fields
+                if not field.primary_key and field.attname != 'views_count'
+            ]
+        super().save(*args, **kwargs)
+
     def get_absolute_url(self):
         return reverse('property_detail', kwargs={'pk': self.pk})
 
@@ -200,6 +292,10 @@ class PropertyImage(models.Model):
     property = models.ForeignKey(Property, on_delete=models.CASCADE, related_name='images')
     image = models.ImageField(upload_to='properties/')
     alt_text = models.CharField(max_length=200, blank=True)
+    # Filled in by the image variant pipeline (accounts.images)
+    image_hash = models.CharField(max_length=64, blank=True, editable=False)
+    image_placeholder = models.TextField(blank=True, editable=False)
+    image_width = models.PositiveIntegerField(blank=True, null=True, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
 
     def __str__(self):
@@ -213,3 +309,73 @@ class PropertyFeature(models.Model):
 
     def __str__(self):
         return f"{self.property.title} - {self.feature}"
+
+
+# ======================
+# REVIEWS
+# ======================
+
+class Review(models.Model):
+    """A customer's 1-5 score for a vendor, optionally about one of its properties"""
+    customer = models.ForeignKey(CustomerProfile, on_delete=models.CASCADE, related_name='reviews')
+    vendor = models.ForeignKey(VendorProfile, on_delete=models.CASCADE, related_name='reviews')
+    property = models.ForeignKey(
+        Property, on_delete=models.SET_NULL, related_name='reviews', blank=True, null=True
+    )
+    score = models.PositiveSmallIntegerField(validators=[MinValueValidator(1), MaxValueValidator(5)])
+    text = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['vendor', '-created_at'], name='review_vendor_recent'),
+        ]
+
+    def save(self, *args, **kwargs):
+        # The vendor's rating aggregates are updated by signals; commit them with the row.
+        with transaction.atomic(using=kwargs.get('using')):
+            super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        with transaction.atomic(using=kwargs.get('using')):
+            return super().delete(*args, **kwargs)
+
+    def __str__(self):
+        return f"{self.score}/5 for {self.vendor_id} by {self.customer_id}"
+
+
+# ======================
+# OUTBOUND EMAIL QUEUE
+# ======================
+
+class OutboundEmail(models.Model):
+    """Email waiting to be delivered by the send_queued_mail worker"""
+
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('sent', 'Sent'),
+        ('failed', 'Failed'),
+    ]
+
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    from_email = models.CharField(max_length=254, blank=True)
+    recipients = models.JSONField(default=list)
+    content_subtype = models.CharField(max_length=20, default='plain')
+
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at'], name='outbox_due'),
+        ]
+
+    def __str__(self):
+        return f"{self.subject} -> {', '.join(self.recipients)}"
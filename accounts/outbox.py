@@ -0,0 +1,173 @@
+"""Database-backed outbound email queue.
+
+Views call ``enqueue_email`` and return immediately; the ``send_queued_mail``
+worker drains due messages in batches over a single SMTP connection,
+retrying failures with exponential backoff.
+"""
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.utils import timezone
+
+from .models import OutboundEmail
+
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = getattr(settings, 'EMAIL_OUTBOX_BATCH_SIZE', 50)
+MAX_ATTEMPTS = getattr(settings, 'EMAIL_OUTBOX_MAX_ATTEMPTS', 6)
+BACKOFF_SECONDS = getattr(settings, 'EMAIL_OUTBOX_BACKOFF_SECONDS', 60)
+MAX_BACKOFF_SECONDS = getattr(settings, 'EMAIL_OUTBOX_MAX_BACKOFF_SECONDS', 6 * 60 * 60)
+
+# How long a worker owns a claimed batch before another worker may retry it.
+LEASE_SECONDS = 5 * 60
+
+
+def enqueue_email(subject, body, to, from_email=None, html=False):
+    """Queue a message for delivery and return the stored row"""
+    return OutboundEmail.objects.create(
+        subject=subject,
+        body=body,
+        from_email=from_email or settings.DEFAULT_FROM_EMAIL,
+        recipients=list(to),
+        content_subtype='html' if html else 'plain',
+    )
+
+
+def backoff_delay(attempts):
+    """Delay before the next try after ``attempts`` failures"""
+    return timedelta(seconds=min(BACKOFF_SECONDS * 2 ** (attempts - 1), MAX_BACKOFF_SECONDS))
+
+
+def claim_batch(batch_size=BATCH_SIZE):
+    """Lease up to ``batch_size`` due messages to this worker.
+
+    The lease is a conditional UPDATE of ``next_attempt_at``, so two workers
+    draining the same outbox never pick up the same row.
+    """
+    now = timezone.now()
+    due = list(
+        OutboundEmail.objects
+        .filter(status='pending', next_attempt_at__lte=now)
+        .order_by('next_attempt_at')
+        .values_list('pk', flat=True)[:batch_size]
+    )
+    if not due:
+        return []
+    lease_until = now + timedelta(seconds=LEASE_SECONDS)
+    OutboundEmail.objects.filter(
+        pk__in=due, status='pending', next_attempt_at__lte=now
+    ).update(next_attempt_at=lease_until)
+    return list(OutboundEmail.objects.filter(pk__in=due, next_attempt_at=lease_until))
+
+
+def _build_message(queued, connection):
+    message = EmailMessage(
+        subject=queued.subject,
+        body=queued.body,
+        from_email=queued.from_email or None,
+        to=queued.recipients,
+        connection=connection,
+    )
+    message.content_subtype = queued.content_subtype
+    return message
+
+
+class MailServerUnavailable(Exception):
+    """The mail server could not be reached"""
+
+
+def _open(connection):
+    try:
+        connection.open()
+    except Exception as exc:
+        raise MailServerUnavailable(f"{type(exc).__name__}: {exc}") from exc
+
+
+def _close(connection):
+    try:
+        connection.close()
+    except Exception as exc:
+        logger.warning("Error closing the mail connection: %s", exc)
+
+
+def _record_failure(queued, error, max_attempts):
+    queued.attempts += 1
+    queued.last_error = error
+    if queued.attempts >= max_attempts:
+        queued.status = 'failed'
+        logger.error("Giving up on email %s after %s attempts: %s",
+                     queued.pk, queued.attempts, queued.last_error)
+    else:
+        queued.next_attempt_at = timezone.now() + backoff_delay(queued.attempts)
+
+
+def _tally(batch):
+    sent = sum(1 for queued in batch if queued.status == 'sent')
+    return sent, len(batch) - sent
+
+
+def send_batch(batch, connection, max_attempts=MAX_ATTEMPTS):
+    """Deliver ``batch`` over ``connection``; returns ``(sent, failed)`` counts.
+
+    If the server cannot be reached, every message not yet sent is charged
+    a failed attempt (and backed off) before ``MailServerUnavailable`` is
+    raised, so no claimed row is left sitting on its lease.
+    """
+    attempted = 0
+    try:
+        _open(connection)
+        for queued in batch:
+            attempted += 1
+            try:
+                _build_message(queued, connection).send()
+            except Exception as exc:
+                _record_failure(queued, f"{type(exc).__name__}: {exc}", max_attempts)
+                # The server may have dropped us; start the next message on a fresh session.
+                _close(connection)
+                _open(connection)
+            else:
+                queued.attempts += 1
+                queued.status = 'sent'
+                queued.sent_at = timezone.now()
+                queued.last_error = ''
+    except MailServerUnavailable as exc:
+        for queued in batch[attempted:]:
+            _record_failure(queued, str(exc), max_attempts)
+        raise
+    finally:
+        OutboundEmail.objects.bulk_update(
+            batch, ['status', 'attempts', 'next_attempt_at', 'last_error', 'sent_at']
+        )
+    return _tally(batch)
+
+
+def drain_outbox(batch_size=BATCH_SIZE, max_attempts=MAX_ATTEMPTS):
+    """Send every message that is currently due, reusing one connection throughout.
+
+    Stops early, with the current batch backed off, if the server is unreachable.
+    """
+    connection = None
+    total_sent = total_failed = 0
+    reachable = True
+    try:
+        while reachable:
+            batch = claim_batch(batch_size)
+            if not batch:
+                break
+            if connection is None:
+                connection = get_connection()
+            try:
+                send_batch(batch, connection, max_attempts=max_attempts)
+            except MailServerUnavailable as exc:
+                logger.warning("Mail server unavailable, backing off %s email(s): %s", len(batch), exc)
+                reachable = False
+            sent, failed = _tally(batch)
+            total_sent += sent
+            total_failed += failed
+    finally:
+        if connection is not None:
+            _close(connection)
+    return total_sent, total_failed
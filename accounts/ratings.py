@@ -0,0 +1,108 @@
+"""Incrementally maintained vendor ratings.
+
+Every Review insert, update and delete adjusts the vendor's ``rating_sum``
+and ``total_reviews`` and recomputes ``rating`` from them in a single
+``F()`` update, so showing a vendor's rating never aggregates over its
+reviews. ``reconcile()`` repairs drift (rows written with ``raw`` saves,
+bulk operations or plain SQL) from one grouped query.
+"""
+from decimal import ROUND_HALF_UP, Decimal
+
+from django.db import transaction
+from django.db.models import Case, Count, DecimalField, F, FloatField, Sum, Value, When
+from django.db.models.functions import Cast, Greatest, Round
+
+from .models import Review, VendorProfile
+
+
+def _rating(score_sum, count):
+    if not count:
+        return Decimal('0.00')
+    # Half away from zero (the same as for positive values), as SQL ROUND() does in apply_delta.
+    return (Decimal(score_sum) / count).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
+
+
+def apply_delta(vendor_id, score=0, count=0):
+    """Add ``score`` to the vendor's score sum and ``count`` to its review count"""
+    if not (score or count):
+        return
+    # Right-hand sides read the row as it was before this update.
+    new_sum = F('rating_sum') + score
+    new_count = F('total_reviews') + count
+    VendorProfile.objects.filter(pk=vendor_id).update(
+        rating_sum=Greatest(new_sum, 0),
+        total_reviews=Greatest(new_count, 0),
+        rating=Case(
+            When(total_reviews__lte=-count, then=Value(Decimal('0.00'))),
+            default=Round(Cast(new_sum, FloatField()) / new_count, 2),
+            output_field=DecimalField(max_digits=3, decimal_places=2),
+        ),
+    )
+
+
+def review_created(review):
+    apply_delta(review.vendor_id, review.score, 1)
+
+
+def review_changed(old, review):
+    old_vendor, old_score = old
+    if old_vendor == review.vendor_id:
+        apply_delta(review.vendor_id, review.score - old_score)
+    else:
+        apply_delta(old_vendor, -old_score, -1)
+        apply_delta(review.vendor_id, review.score, 1)
+
+
+def review_deleted(review):
+    apply_delta(review.vendor_id, -review.score, -1)
+
+
+# --------------------------------
+# Reconcile
+# --------------------------------
+def expected_ratings(vendor_ids=None):
+    """``{vendor_id: (score_sum, count)}`` recomputed from ``Review``"""
+    queryset = Review.objects.all()
+    if vendor_ids is not None:
+        queryset = queryset.filter(vendor_id__in=vendor_ids)
+    return {
+        row['vendor_id']: (row['score_sum'], row['count'])
+        for row in queryset.order_by().values('vendor_id').annotate(score_sum=Sum('score'), count=Count('pk'))
+    }
+
+
+def current_ratings(vendor_ids=None):
+    """``{vendor_id: (score_sum, count, rating)}`` as stored on the profiles"""
+    queryset = VendorProfile.objects.all()
+    if vendor_ids is not None:
+        queryset = queryset.filter(pk__in=vendor_ids)
+    return {
+        vendor_id: (score_sum, count, rating)
+        for vendor_id, score_sum, count, rating in queryset.values_list(
+            'pk', 'rating_sum', 'total_reviews', 'rating'
+        )
+    }
+
+
+def drift(vendor_ids=None):
+    """``{vendor_id: (have, expected)}`` for profiles whose stored figures are off"""
+    expected = expected_ratings(vendor_ids)
+    out_of_date = {}
+    for vendor_id, have in current_ratings(vendor_ids).items():
+        score_sum, count = expected.get(vendor_id, (0, 0))
+        want = (score_sum, count, _rating(score_sum, count))
+        if have != want:
+            out_of_date[vendor_id] = (have, want)
+    return out_of_date
+
+
+@transaction.atomic
+def reconcile(vendor_ids=None):
+    """Overwrite drifted profiles with fresh aggregates; returns how many changed"""
+    out_of_date = drift(vendor_ids)
+    profiles = [
+        VendorProfile(pk=vendor_id, rating_sum=score_sum, total_reviews=count, rating=rating)
+        for vendor_id, (_, (score_sum, count, rating)) in out_of_date.items()
+    ]
+    VendorProfile.objects.bulk_update(profiles, ['rating_sum', 'total_reviews', 'rating'], batch_size=500)
+    return len(profiles)
@@ -0,0 +1,58 @@
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+
+from . import images, ratings
+from .models import Review
+
+
+# --------------------------------
+# Responsive image variants
+# --------------------------------
+@receiver(pre_save, sender='accounts.PropertyImage')
+@receiver(pre_save, sender='accounts.CustomUser')
+def detect_new_upload(sender, instance, **kwargs):
+    """Clear stale variant data when a new file is about to be stored"""
+    image_field, hash_field, placeholder_field, width_field = images.fields_for(instance)
+    file = getattr(instance, image_field)
+    instance._new_upload = bool(file) and not file._committed
+    if instance._new_upload or not file:
+        setattr(instance, hash_field, '')
+        setattr(instance, placeholder_field, '')
+        setattr(instance, width_field, None)
+
+
+@receiver(post_save, sender='accounts.PropertyImage')
+@receiver(post_save, sender='accounts.CustomUser')
+def build_image_variants(sender, instance, **kwargs):
+    if getattr(instance, '_new_upload', False):
+        instance._new_upload = False
+        images.schedule(instance)
+
+
+# --------------------------------
+# Vendor ratings
+# --------------------------------
+@receiver(pre_save, sender=Review)
+def remember_review_score(sender, instance, raw=False, **kwargs):
+    if raw or instance._state.adding:
+        instance._rating_state = None
+        return
+    instance._rating_state = (
+        Review.objects.filter(pk=instance.pk).values_list('vendor_id', 'score').first()
+    )
+
+
+@receiver(post_save, sender=Review)
+def update_rating_on_save(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    old = getattr(instance, '_rating_state', None)
+    if created or old is None:
+        ratings.review_created(instance)
+    else:
+        ratings.review_changed(old, instance)
+
+
+@receiver(post_delete, sender=Review)
+def update_rating_on_delete(sender, instance, **kwargs):
+    ratings.review_deleted(instance)
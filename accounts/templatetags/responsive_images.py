@@ -0,0 +1,46 @@
+from django import template
+from django.utils.html import format_html, format_html_join
+
+from accounts import images, imaging
+
+
+register = template.Library()
+
+DEFAULT_SIZES = "(max-width: 576px) 100vw, (max-width: 992px) 50vw, 480px"
+
+
+def _srcset(digest, widths, ext):
+    return format_html_join(
+        ", ", "{} {}w",
+        ((images.variant_url(digest, name, ext), width) for name, width in widths.items()),
+    )
+
+
+@register.simple_tag
+def responsive_image(file, alt="", sizes=DEFAULT_SIZES, variant="card", css_class="", style=""):
+    """Render ``file`` as a <picture> with WebP/JPEG srcsets and a blurred placeholder.
+
+    Falls back to a plain <img> of the original while variants are still being built.
+    """
+    if not file:
+        return ""
+    image_field, hash_field, placeholder_field, width_field = images.fields_for(file.instance)
+    digest = getattr(file.instance, hash_field)
+    width = getattr(file.instance, width_field)
+    if not digest or not width:
+        return format_html(
+            '<img src="{}" alt="{}" class="{}" style="{}" loading="lazy">', file.url, alt, css_class, style
+        )
+
+    placeholder = getattr(file.instance, placeholder_field)
+    widths = imaging.variant_widths(width)
+    return format_html(
+        '<picture>'
+        '<source type="image/webp" srcset="{}" sizes="{}">'
+        '<img src="{}" srcset="{}" sizes="{}" alt="{}" class="{}" loading="lazy" decoding="async"'
+        ' style="background-size: cover; background-image: url({}); {}">'
+        '</picture>',
+        _srcset(digest, widths, "webp"), sizes,
+        images.variant_url(digest, variant, "jpg"), _srcset(digest, widths, "jpg"), sizes,
+        alt, css_class, placeholder, style,
+    )
@@ -1,3 +1,661 @@
-from django.test import TestCase
+import gzip
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from functools import partial
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from PIL import Image
+
+from asgiref.sync import async_to_sync, iscoroutinefunction
+from django.contrib import auth
+from django.contrib.auth.hashers import (
+    MD5PasswordHasher, PBKDF2PasswordHasher, PBKDF2SHA1PasswordHasher, check_password,
+)
+from django.core import mail
+from django.core.cache import cache
+from django.core.cache.utils import make_template_fragment_key
+from django.core.exceptions import MiddlewareNotUsed
+from django.core.management import call_command
+from django.core.mail.backends.locmem import EmailBackend as LocmemBackend
+from django.db import connection
+from django.template import Context, Template
+from django.test import AsyncRequestFactory, RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.urls import resolve
+from django.utils import timezone
+
+from estates import context_processors, staticfiles
+from estates.testing import assert_query_budget, plain_static_storage
+from listings import matching
+from listings.models import SavedSearch
+
+from . import admin as accounts_admin, imaging, outbox, ratings, throttling, views
+from .backends import ProfileModelBackend, load_user
+from .hashers import TunedPBKDF2PasswordHasher
+from .models import CustomUser, OutboundEmail, Property, PropertyImage, Review
+
+
+# --------------------------------
+# Outbound email queue
+# --------------------------------
+class FlakyBackend(LocmemBackend):
+    """Locmem backend whose opens and sends fail on cue"""
+
+    def __init__(self, open_failures=(), send_failures=(), **kwargs):
+        super().__init__(**kwargs)
+        self.open_failures = list(open_failures)
+        self.send_failures = list(send_failures)
+        self.opens = 0
+
+    def open(self):
+        self.opens += 1
+        if self.opens in self.open_failures:
+            raise ConnectionRefusedError(111, 'Connection refused')
+        return super().open()
+
+    def send_messages(self, messages):
+        if self.send_failures and self.send_failures.pop(0):
+            raise ConnectionResetError(104, 'Connection reset by peer')
+        return super().send_messages(messages)
+
+
+@override_settings(EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend')
+class OutboxTests(TestCase):
+    def setUp(self):
+        self.queued = [outbox.enqueue_email(f"Message {i}", "Body", [f"user{i}@example.com"]) for i in range(3)]
+
+    def drain(self, backend, unreachable=True):
+        with mock.patch.object(outbox, 'get_connection', return_value=backend):
+            if not unreachable:
+                return outbox.drain_outbox(batch_size=10)
+            with self.assertLogs(outbox.logger, 'WARNING'):
+                return outbox.drain_outbox(batch_size=10)
+
+    def assertBackedOff(self, queued, attempts, error):
+        queued.refresh_from_db()
+        self.assertEqual(queued.status, 'pending')
+        self.assertEqual(queued.attempts, attempts)
+        self.assertIn(error, queued.last_error)
+        # Past the lease, on the backoff schedule.
+        self.assertGreater(queued.next_attempt_at, timezone.now() + timedelta(seconds=outbox.BACKOFF_SECONDS - 5))
+        self.assertLess(queued.next_attempt_at, timezone.now() + timedelta(seconds=outbox.LEASE_SECONDS - 5))
+
+    def test_sends_due_messages(self):
+        self.assertEqual(outbox.drain_outbox(), (3, 0))
+        self.assertEqual(len(mail.outbox), 3)
+        self.assertEqual(OutboundEmail.objects.filter(status='sent', attempts=1).count(), 3)
+        self.assertEqual(outbox.drain_outbox(), (0, 0))
+
+    def test_unreachable_server_backs_off_the_claimed_batch(self):
+        self.assertEqual(self.drain(FlakyBackend(open_failures=[1])), (0, 3))
+        for queued in self.queued:
+            self.assertBackedOff(queued, 1, 'ConnectionRefusedError')
+        self.assertEqual(outbox.claim_batch(), [])
+
+    def test_failed_reopen_backs_off_the_rest_of_the_batch(self):
+        backend = FlakyBackend(open_failures=[2], send_failures=[True])
+        self.assertEqual(self.drain(backend), (0, 3))
+        self.assertBackedOff(self.queued[0], 1, 'ConnectionResetError')
+        self.assertBackedOff(self.queued[1], 1, 'ConnectionRefusedError')
+        self.assertBackedOff(self.queued[2], 1, 'ConnectionRefusedError')
+
+    def test_one_failed_send_does_not_stop_the_batch(self):
+        self.assertEqual(self.drain(FlakyBackend(send_failures=[False, True]), unreachable=False), (2, 1))
+        self.assertBackedOff(self.queued[1], 1, 'ConnectionResetError')
+        self.assertEqual(len(mail.outbox), 2)
+
+    def test_gives_up_after_max_attempts(self):
+        OutboundEmail.objects.update(attempts=outbox.MAX_ATTEMPTS - 1)
+        self.drain(FlakyBackend(open_failures=[1]))
+        self.assertEqual(OutboundEmail.objects.filter(status='failed').count(), 3)
+
+    def test_loop_survives_an_unreachable_server(self):
+        backend = FlakyBackend(open_failures=[1])
+        with mock.patch.object(outbox, 'get_connection', return_value=backend), \
+                mock.patch('time.sleep', side_effect=[None, KeyboardInterrupt]), \
+                self.assertLogs(outbox.logger, 'WARNING'):
+            with self.assertRaises(KeyboardInterrupt):
+                call_command('send_queued_mail', '--loop', stdout=StringIO())
+        self.assertEqual(OutboundEmail.objects.filter(attempts=1).count(), 3)
+
+
+# --------------------------------
+# Vendor ratings
+# --------------------------------
+class VendorRatingTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.customer = CustomUser.objects.create_user('customer@example.com', 'customer', role='customer').customer_profile
+
+    def rate(self, *scores):
+        username = f'vendor{CustomUser.objects.count()}'
+        vendor = CustomUser.objects.create_user(f'{username}@example.com', username, role='vendor').vendor_profile
+        for score in scores:
+            Review.objects.create(customer=self.customer, vendor=vendor, score=score)
+        vendor.refresh_from_db()
+        return vendor
+
+    def test_halves_round_up_as_in_sql(self):
+        # 9/8 = 1.125 and 13/8 = 1.625 sit exactly on a half cent.
+        low = self.rate(2, 1, 1, 1, 1, 1, 1, 1)
+        high = self.rate(5, 1, 1, 1, 1, 1, 1, 2)
+        self.assertEqual((low.rating, high.rating), (Decimal('1.13'), Decimal('1.63')))
+        self.assertEqual(ratings._rating(9, 8), Decimal('1.13'))
+
+    def test_signal_updated_vendors_do_not_drift(self):
+        vendors = [self.rate(*[1 + (i * step) % 5 for i in range(count)]) for count in (3, 6, 7, 8) for step in (1, 2)]
+        Review.objects.filter(vendor=vendors[0]).first().delete()
+        self.assertEqual(ratings.drift(), {})
+        out = StringIO()
+        call_command('reconcile_vendor_ratings', stdout=out)
+        self.assertIn('up to date', out.getvalue())
+
+
+# --------------------------------
+# Authentication
+# --------------------------------
+@plain_static_storage
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class AuthBackendTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.vendor = CustomUser.objects.create_user('vendor@example.com', 'vendor', 'secret-pass-1', role='vendor')
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+
+    def test_create_user_creates_the_role_profile(self):
+        self.assertTrue(hasattr(self.vendor, 'vendor_profile'))
+        customer = CustomUser.objects.create_user('customer@example.com', 'customer', role='customer')
+        self.assertTrue(hasattr(CustomUser.objects.get(pk=customer.pk), 'customer_profile'))
+        staff = CustomUser.objects.create_user('staff@example.com', 'staff', role='admin')
+        self.assertIsNone(CustomUser.objects.get(pk=staff.pk).role_profile)
+
+    def test_registration_creates_a_customer_profile(self):
+        response = self.client.post('/register/', {
+            'username': 'newcomer', 'email': 'newcomer@example.com',
+            'password1': 'Sturdy-passphrase-9', 'password2': 'Sturdy-passphrase-9',
+        })
+        self.assertRedirects(response, '/login/', fetch_redirect_response=False)
+        user = CustomUser.objects.get(email='newcomer@example.com')
+        self.assertEqual((user.role, user.is_active), ('customer', False))
+        self.assertTrue(hasattr(user, 'customer_profile'))
+
+    def test_session_user_and_profile_load_in_one_query(self):
+        backend = ProfileModelBackend()
+        with self.assertNumQueries(1):
+            user = backend.get_user(self.vendor.pk)
+            self.assertEqual(user.role_profile, self.vendor.vendor_profile)
+        with self.assertNumQueries(1):
+            user = async_to_sync(backend.aget_user)(self.vendor.pk)
+            self.assertEqual(user.role_profile, self.vendor.vendor_profile)
+
+    def test_sessions_from_the_plain_model_backend_still_resolve(self):
+        self.client.force_login(self.vendor, backend='django.contrib.auth.backends.ModelBackend')
+        response = self.client.get('/profile/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['user'], self.vendor)
+
+    def test_login(self):
+        response = self.client.post('/login/', {'username': 'vendor@example.com', 'password': 'secret-pass-1'})
+        self.assertRedirects(response, '/vendor_dashboard/', fetch_redirect_response=False)
+        self.assertEqual(self.client.session['_auth_user_backend'], 'accounts.backends.ProfileModelBackend')
+
+    def test_rejected_password_is_hashed_once(self):
+        with mock.patch.object(MD5PasswordHasher, 'verify', autospec=True, return_value=False) as verify:
+            response = self.client.post('/login/', {'username': 'vendor@example.com', 'password': 'wrong'})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('_auth_user_id', self.client.session)
+        self.assertEqual(verify.call_count, 1)
+
+
+# --------------------------------
+# Async views
+# --------------------------------
+@plain_static_storage
+class AsyncViewTests(TestCase):
+    ASYNC_URLS = (
+        '/', '/listings/listings', '/listings/listings/1', '/api/v1/properties/1',
+        '/vendor_dashboard/', '/customer/dashboard/',
+    )
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.vendor = CustomUser.objects.create_user('vendor@example.com', 'vendor', role='vendor')
+        cls.customer = CustomUser.objects.create_user('customer@example.com', 'customer', role='customer')
+        profile = cls.customer.customer_profile
+        profile.preferred_location = 'Lagos'
+        profile.save()
+        cls.listing = Property.objects.create(
+            vendor=cls.vendor.vendor_profile, title='Lekki penthouse', description='Penthouse.',
+            property_type='apartment', listing_type='sale', address='1 Admiralty Way', city='Lagos',
+            state='Lagos', price=Decimal('900000.00'), bedrooms=3, bathrooms=3,
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        matching.engine.reset()
+        self.addCleanup(matching.engine.reset)
+        patcher = mock.patch('listings.viewcounts.record_view')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_read_heavy_views_are_async(self):
+        for url in self.ASYNC_URLS:
+            with self.subTest(url=url):
+                self.assertTrue(iscoroutinefunction(resolve(url).func))
+        # Its URL is shadowed by the admin site's catch-all, so check the view itself
+        self.assertTrue(iscoroutinefunction(views.admin_dashboard))
+
+    async def test_pages_render_under_the_async_client(self):
+        response = await self.async_client.get('/')
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.context['user'].is_authenticated)
+        self.assertContains(await self.async_client.get('/listings/listings'), 'Lekki penthouse')
+        self.assertContains(await self.async_client.get(f'/listings/listings/{self.listing.pk}'), 'Lekki penthouse')
+        response = await self.async_client.get(f'/api/v1/properties/{self.listing.pk}')
+        self.assertEqual(response.json()['title'], 'Lekki penthouse')
+
+        await self.async_client.aforce_login(self.vendor)
+        response = await self.async_client.get('/vendor_dashboard/')
+        self.assertContains(response, 'Lekki penthouse')
+        self.assertEqual(response.context['user'], self.vendor)
+
+        await self.async_client.aforce_login(self.customer)
+        response = await self.async_client.get('/customer/dashboard/')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(self.listing, [match for match, _ in response.context['matches']])
+
+    async def request(self):
+        request = AsyncRequestFactory().get('/')
+        request.session = await self.async_client.asession()
+        request.auser = partial(auth.aget_user, request)
+        return request
+
+    async def test_load_user_resolves_user_and_profile_up_front(self):
+        request = await self.request()
+        self.assertFalse((await load_user(request)).is_authenticated)
+
+        await self.async_client.aforce_login(self.vendor)
+        request = await self.request()
+        user = await load_user(request)
+        self.assertEqual(user, self.vendor)
+        self.assertIs(request.user, user)
+        # A lazy load would raise SynchronousOnlyOperation here, as it would in a template
+        self.assertEqual(request.user.role_profile.pk, self.vendor.vendor_profile.pk)
+
+
+# --------------------------------
+# Password hashing
+# --------------------------------
+@plain_static_storage
+@override_settings(PASSWORD_HASHERS=[
+    'accounts.hashers.TunedPBKDF2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+])
+class PasswordHasherTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.vendor = CustomUser.objects.create_user('vendor@example.com', 'vendor', role='vendor')
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        # Cheap enough for tests, and different from the counts used for the "old" hashes below.
+        patcher = mock.patch.object(TunedPBKDF2PasswordHasher, 'iterations', 1200)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def set_hash(self, encoded):
+        CustomUser.objects.filter(pk=self.vendor.pk).update(password=encoded)
+
+    def login(self, password='secret-pass-1'):
+        return self.client.post('/login/', {'username': 'vendor@example.com', 'password': password})
+
+    def test_hashes_with_other_iteration_counts_still_verify(self):
+        encoded = PBKDF2PasswordHasher().encode('secret-pass-1', 'seasalt', iterations=1000)
+        self.assertTrue(check_password('secret-pass-1', encoded))
+        self.assertFalse(check_password('wrong', encoded))
+        self.assertTrue(TunedPBKDF2PasswordHasher().must_update(encoded))
+
+    def test_login_rehashes_with_the_tuned_count(self):
+        self.set_hash(PBKDF2PasswordHasher().encode('secret-pass-1', 'seasalt', iterations=1000))
+        self.assertRedirects(self.login(), '/vendor_dashboard/', fetch_redirect_response=False)
+        self.vendor.refresh_from_db()
+        self.assertTrue(self.vendor.password.startswith('pbkdf2_sha256$1200$'))
+        self.assertTrue(self.vendor.check_password('secret-pass-1'))
+
+    def test_login_moves_older_algorithms_to_the_tuned_hasher(self):
+        self.set_hash(PBKDF2SHA1PasswordHasher().encode('secret-pass-1', 'seasalt', iterations=1000))
+        self.login()
+        self.vendor.refresh_from_db()
+        self.assertTrue(self.vendor.password.startswith('pbkdf2_sha256$1200$'))
+
+    def test_failed_login_keeps_the_old_hash(self):
+        old = PBKDF2PasswordHasher().encode('secret-pass-1', 'seasalt', iterations=1000)
+        self.set_hash(old)
+        self.assertEqual(self.login('wrong').status_code, 200)
+        self.vendor.refresh_from_db()
+        self.assertEqual(self.vendor.password, old)
+
+
+# --------------------------------
+# Admin changelists
+# --------------------------------
+@plain_static_storage
+class UserAdminTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin_user = CustomUser.objects.create_superuser('root@example.com', 'root')
+        for name in ('Adebola', 'adebayo', 'Chinedu'):
+            CustomUser.objects.create_user(f'{name}@Example.com', name, role='customer')
+
+    def setUp(self):
+        self.client.force_login(self.admin_user)
+
+    def changelist(self, **params):
+        response = self.client.get('/admin/accounts/customuser/', params)
+        self.assertEqual(response.status_code, 200)
+        return response.context['cl']
+
+    def test_search_is_a_case_insensitive_prefix_match(self):
+        for term in ('ade', 'ADE', ' Ade '):
+            with self.subTest(term=term):
+                self.assertEqual(
+                    sorted(user.username for user in self.changelist(q=term).result_list), ['Adebola', 'adebayo'],
+                )
+        self.assertEqual([user.username for user in self.changelist(q='chinedu@example').result_list], ['Chinedu'])
+        self.assertEqual(list(self.changelist(q='ebo').result_list), [])
+
+    def test_changelist_query_count(self):
+        self.changelist()
+        # Session, user, the capped count and the page itself.
+        with self.assertNumQueries(4):
+            self.changelist(q='ade')
+        with mock.patch.object(accounts_admin, 'estimated_row_count', return_value=None), self.assertNumQueries(4):
+            self.changelist()
+
+    def test_unfiltered_count_comes_from_analyze(self):
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+        self.assertEqual(accounts_admin.estimated_row_count(CustomUser), 4)
+        with mock.patch.object(accounts_admin, 'estimated_row_count', return_value=250_000):
+            self.assertEqual(self.changelist().result_count, 250_000)
+            # Searches count for real, up to COUNT_LIMIT.
+            self.assertEqual(self.changelist(q='ade').result_count, 2)
+            with mock.patch.object(accounts_admin, 'COUNT_LIMIT', 1):
+                self.assertEqual(self.changelist(q='ade').result_count, 1)
+
+
+# --------------------------------
+# Query budgets
+# --------------------------------
+@plain_static_storage
+class AccountQueryBudgetTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.vendor = CustomUser.objects.create_user('vendor@example.com', 'vendor', role='vendor')
+        cls.customer = CustomUser.objects.create_user('customer@example.com', 'customer', role='customer')
+        for i in range(8):
+            Property.objects.create(
+                vendor=cls.vendor.vendor_profile, title=f'Flat {i}', description='Flat.', property_type='apartment',
+                listing_type='rent', address=f'{i} Marina Road', city='Lagos', state='Lagos',
+                price=Decimal('1200.00'), bedrooms=2, bathrooms=1,
+            )
+        SavedSearch.objects.create(customer=cls.customer.customer_profile, name='Lagos', city='Lagos')
+        profile = cls.customer.customer_profile
+        profile.preferred_location, profile.preferred_bedrooms = 'Lagos', 2
+        profile.save()
+
+    def setUp(self):
+        matching.engine.reset()
+        self.addCleanup(matching.engine.reset)
+
+    def assertWithinBudget(self, url_name, *args, method='get', data=None, status=200):
+        response = assert_query_budget(self.client, url_name, *args, method=method, data=data)
+        self.assertEqual(response.status_code, status)
+        return response
+
+    def test_anonymous_pages(self):
+        self.assertWithinBudget('index')
+
+    def test_template_render_time_is_measured(self):
+        metrics = self.assertWithinBudget('index').request_metrics
+        self.assertGreater(metrics.template_time, 0)
+        self.assertLessEqual(metrics.template_time, metrics.total)
+
+    def test_vendor_pages(self):
+        self.client.force_login(self.vendor)
+        for url_name in ('index', 'profile', 'edit_profile', 'vendor_property_list', 'vendor_dashboard'):
+            with self.subTest(url_name=url_name):
+                self.assertWithinBudget(url_name)
+
+    def test_customer_pages(self):
+        self.client.force_login(self.customer)
+        for url_name in ('index', 'profile', 'edit_profile', 'customer_dashboard', 'saved_searches'):
+            with self.subTest(url_name=url_name):
+                self.assertWithinBudget(url_name)
+        self.assertWithinBudget('saved_searches', method='post', data={'name': 'Flats', 'city': 'Lagos'}, status=302)
+
+
+# --------------------------------
+# Cached template fragments
+# --------------------------------
+@plain_static_storage
+@override_settings(TEMPLATE_FRAGMENT_SECONDS=3600, TEMPLATE_FRAGMENT_VERSION='r1')
+class TemplateFragmentTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        context_processors.fragment_version.cache_clear()
+        self.addCleanup(context_processors.fragment_version.cache_clear)
+
+    def plant(self, fragment, *vary_on):
+        """Replace a cached fragment so a page that reuses it shows the marker"""
+        key = make_template_fragment_key(fragment, vary_on)
+        self.assertIsNotNone(cache.get(key))
+        cache.set(key, f'<p>stale {fragment}</p>')
+
+    def test_fragments_are_reused_until_the_version_changes(self):
+        self.client.get('/')
+        self.plant('base_header', 'r1', 'anonymous')
+        self.plant('base_footer', 'r1')
+        self.assertContains(self.client.get('/'), 'stale base_header')
+
+        with override_settings(TEMPLATE_FRAGMENT_VERSION='r2'):
+            context_processors.fragment_version.cache_clear()
+            response = self.client.get('/')
+        self.assertNotContains(response, 'stale base_header')
+        self.assertNotContains(response, 'stale base_footer')
+
+    def test_header_varies_by_role(self):
+        self.client.get('/')
+        self.plant('base_header', 'r1', 'anonymous')
+        self.plant('base_footer', 'r1')
+        self.client.force_login(CustomUser.objects.create_user('vendor@example.com', 'vendor', role='vendor'))
+        response = self.client.get('/')
+        self.assertNotContains(response, 'stale base_header')
+        self.assertContains(response, 'stale base_footer')
+
+    @override_settings(TEMPLATE_FRAGMENT_VERSION='')
+    def test_default_version_follows_the_static_manifest(self):
+        static_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, static_root)
+        with override_settings(STATIC_ROOT=static_root):
+            before = context_processors.fragment_version()
+            with open(os.path.join(static_root, 'staticfiles.json'), 'w') as handle:
+                json.dump({'paths': {'style.css': 'style.0123456789ab.css'}}, handle)
+            context_processors.fragment_version.cache_clear()
+            self.assertNotEqual(context_processors.fragment_version(), before)
+
+
+# --------------------------------
+# Responsive image variants
+# --------------------------------
+class ImageVariantTests(SimpleTestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        self.source = os.path.join(self.media_root, 'narrow.jpg')
+        Image.new('RGB', (300, 200), 'teal').save(self.source)
+
+    def test_widths_are_the_real_output_widths(self):
+        digest, placeholder, width = imaging.build_variants(self.source, self.media_root)
+        self.assertEqual(width, 300)
+        self.assertEqual(imaging.variant_widths(width), {'thumb': 160, 'card': 300})
+        with Image.open(os.path.join(self.media_root, imaging.variant_name(digest, 'card', 'jpg'))) as card:
+            self.assertEqual(card.width, 300)
+        self.assertEqual(imaging.variant_widths(4000), imaging.VARIANTS)
+
+    def test_existing_sets_are_reused_unless_forced(self):
+        digest, _, _ = imaging.build_variants(self.source, self.media_root)
+        card = os.path.join(self.media_root, imaging.variant_name(digest, 'card', 'webp'))
+        os.remove(card)
+        self.assertEqual(imaging.build_variants(self.source, self.media_root)[2], 300)
+        self.assertFalse(os.path.exists(card))
+        imaging.build_variants(self.source, self.media_root, force=True)
+        self.assertTrue(os.path.exists(card))
+
+    def test_srcset_uses_variant_widths(self):
+        image = PropertyImage(image='properties/narrow.jpg', image_hash='ab' * 32, image_width=300)
+        html = Template('{% load responsive_images %}{% responsive_image image.image %}').render(
+            Context({'image': image})
+        )
+        self.assertIn('thumb.webp 160w', html)
+        self.assertIn('card.jpg 300w', html)
+        self.assertNotIn('480w', html)
+        self.assertNotIn('full.', html)
+
+    def test_unknown_width_falls_back_to_the_original(self):
+        image = PropertyImage(image='properties/narrow.jpg', image_hash='ab' * 32)
+        html = Template('{% load responsive_images %}{% responsive_image image.image %}').render(
+            Context({'image': image})
+        )
+        self.assertNotIn('srcset', html)
+
+
+# --------------------------------
+# Auth throttling
+# --------------------------------
+@override_settings(THROTTLE_RATES={'login': {'ip': '5/m', 'account': '3/m'}})
+class ThrottleTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+
+    def attempt(self, username='someone@example.com', ip='203.0.113.7'):
+        request = RequestFactory().post('/login/', {'username': username}, REMOTE_ADDR=ip)
+        return throttling.check(request, 'login', account_field='username')
+
+    def test_account_limit(self):
+        self.assertEqual([self.attempt()[0] for _ in range(4)], [True, True, True, False])
+        allowed, retry_after, kind = self.attempt()
+        self.assertEqual((allowed, kind), (False, 'account'))
+        self.assertTrue(1 <= retry_after <= 60)
+
+    def test_blocked_account_does_not_use_up_the_ip_allowance(self):
+        for _ in range(6):
+            self.attempt('victim@example.com')
+        self.assertTrue(self.attempt('other@example.com')[0])
+        self.assertTrue(self.attempt('third@example.com')[0])
+        allowed, _, kind = self.attempt('fourth@example.com')
+        self.assertEqual((allowed, kind), (False, 'ip'))
+
+    def test_previous_window_still_counts(self):
+        start = 600.0
+        with mock.patch('time.time', return_value=start + 50):
+            self.assertEqual([self.attempt(f'u{i}@example.com')[0] for i in range(5)], [True] * 5)
+        # A quarter into the next minute, 3/4 of the last one's five requests still count.
+        with mock.patch('time.time', return_value=start + 75):
+            self.assertEqual([self.attempt(f'v{i}@example.com')[0] for i in range(2)], [True, False])
+
+    def test_parallel_burst_stays_within_the_limit(self):
+        results, barrier = [], threading.Barrier(20)
+        cache_class = type(throttling.get_cache())
+        original_get = cache_class.get
+
+        def slow_get(cache, *args, **kwargs):
+            # Widen the gap between a read and the write after it, as a network cache would.
+            value = original_get(cache, *args, **kwargs)
+            time.sleep(0.01)
+            return value
+
+        def attempt():
+            barrier.wait()
+            results.append(self.attempt(username='')[0])
+
+        with mock.patch.object(cache_class, 'get', slow_get):
+            threads = [threading.Thread(target=attempt) for _ in range(20)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        self.assertEqual(results.count(True), 5)
+
+
+# --------------------------------
+# Static files
+# --------------------------------
+class StaticFilesTests(SimpleTestCase):
+    CSS = 'body { color: rgb(142, 118, 84); }\n' * 200
+
+    def setUp(self):
+        source, self.static_root = tempfile.mkdtemp(), tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, source)
+        self.addCleanup(shutil.rmtree, self.static_root)
+        with open(os.path.join(source, 'app.css'), 'w') as handle:
+            handle.write(self.CSS)
+        Image.new('RGB', (8, 8), 'teal').save(os.path.join(source, 'logo.png'))
+
+        override = override_settings(
+            STATICFILES_DIRS=[source], STATIC_ROOT=self.static_root, SERVE_STATIC=True,
+            STATICFILES_FINDERS=['django.contrib.staticfiles.finders.FileSystemFinder'],
+        )
+        override.enable()
+        self.addCleanup(override.disable)
+        call_command('collectstatic', interactive=False, verbosity=0)
+        with open(os.path.join(self.static_root, 'staticfiles.json')) as handle:
+            self.hashed = json.load(handle)['paths']
+        self.middleware = staticfiles.StaticFilesMiddleware(lambda request: None)
+
+    def get(self, name, **headers):
+        return self.middleware(RequestFactory().get(f'/static/{name}', headers=headers))
+
+    def test_collectstatic_writes_gzip_variants(self):
+        for name in ('app.css', self.hashed['app.css']):
+            with open(os.path.join(self.static_root, name + '.gz'), 'rb') as handle:
+                self.assertEqual(gzip.decompress(handle.read()).decode(), self.CSS)
+        # Already compressed
+        self.assertFalse(os.path.exists(os.path.join(self.static_root, self.hashed['logo.png'] + '.gz')))
+
+    def test_hashed_names_are_immutable_and_gzipped_on_request(self):
+        compressed = self.get(self.hashed['app.css'], accept_encoding='gzip, deflate')
+        self.assertEqual(compressed['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(b''.join(compressed.streaming_content)).decode(), self.CSS)
+        self.assertEqual(compressed['Cache-Control'], f'public, max-age={staticfiles.IMMUTABLE_MAX_AGE}, immutable')
+        self.assertEqual(compressed['Vary'], 'Accept-Encoding')
+        self.assertEqual(compressed['Content-Type'], 'text/css; charset=utf-8')
+
+        plain = self.get(self.hashed['app.css'], accept_encoding='gzip;q=0')
+        self.assertFalse(plain.has_header('Content-Encoding'))
+        self.assertEqual(b''.join(plain.streaming_content).decode(), self.CSS)
+        self.assertNotEqual(plain['ETag'], compressed['ETag'])
+
+    def test_unhashed_names_revalidate(self):
+        response = self.get('app.css')
+        self.assertEqual(response['Cache-Control'], 'public, max-age=60')
+        self.assertEqual(self.get('app.css', if_none_match=response['ETag']).status_code, 304)
+        self.assertIsNone(self.get('missing.css'))
+
+    def test_off_unless_serving_static(self):
+        with override_settings(SERVE_STATIC=False):
+            with self.assertRaises(MiddlewareNotUsed):
+                staticfiles.StaticFilesMiddleware(lambda request: None)
@@ -0,0 +1,198 @@
+"""Rate limiting for the expensive auth endpoints.
+
+Each POST to a throttled view counts against a bucket per client IP and,
+when the form names an account, one per account. A bucket is a sliding
+window: a counter per fixed window of one period, with the previous
+window's count weighted by how much of it still overlaps the last period.
+Counters live in the cache (``THROTTLE_CACHE``) and only change through
+``add()``, ``incr()`` and ``decr()``, which are atomic on shared caches,
+so parallel requests each see a distinct count and no burst gets past the
+limit. With the local-memory cache limits are per process. A request over
+a limit is answered with 429 before the view runs, i.e. before any
+password hashing or email work.
+
+Limits come from ``THROTTLE_RATES`` as ``"<requests>/<period>"`` strings,
+where period is ``s``, ``m``, ``h`` or ``d``.
+"""
+import hashlib
+import logging
+import math
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import caches
+from django.http import HttpResponse
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_RATES = {
+    'login': {'ip': '20/m', 'account': '10/m'},
+    'register': {'ip': '10/h'},
+    'password_reset': {'ip': '10/h', 'account': '3/h'},
+}
+PERIODS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+KEY_PREFIX = 'throttle'
+
+
+def get_cache():
+    return caches[getattr(settings, 'THROTTLE_CACHE', 'default')]
+
+
+def get_rates(scope):
+    rates = getattr(settings, 'THROTTLE_RATES', DEFAULT_RATES)
+    return rates.get(scope, {})
+
+
+def parse_rate(rate):
+    """``"10/m"`` -> ``(requests, period in seconds)``"""
+    count, _, period = rate.partition('/')
+    return int(count), PERIODS[period[:1]]
+
+
+def client_ip(request):
+    return request.META.get('REMOTE_ADDR', '')
+
+
+def bucket_key(scope, kind, ident):
+    digest = hashlib.sha256(ident.encode()).hexdigest()[:32]
+    return f"{KEY_PREFIX}:{scope}:{kind}:{digest}"
+
+
+class SlidingWindow:
+    def __init__(self, key, rate):
+        self.key = key
+        self.limit, self.period = parse_rate(rate)
+
+    def _window(self, now):
+        index = int(now // self.period)
+        elapsed = (now - index * self.period) / self.period
+        return index, elapsed
+
+    def _window_key(self, index):
+        return f"{self.key}:{index}"
+
+    def hit(self, cache, now):
+        """Count one request at ``now``; returns ``(allowed, retry_after)``.
+
+        The request is counted even when it is not allowed; ``refund()`` it.
+        """
+        index, elapsed = self._window(now)
+        # Kept long enough to serve as the previous window of the next one.
+        timeout = 2 * self.period + 1
+        key = self._window_key(index)
+        while True:
+            if cache.add(key, 1, timeout):
+                count = 1
+                break
+            try:
+                count = cache.incr(key)
+                break
+            except ValueError:
+                # Expired between add() and incr(); start the window again.
+                continue
+        previous = cache.get(self._window_key(index - 1), 0)
+        if previous * (1 - elapsed) + count <= self.limit:
+            return True, 0
+        return False, self.retry_after(previous, count - 1, elapsed)
+
+    def retry_after(self, previous, count, elapsed):
+        """Seconds until one more request fits, assuming no other traffic"""
+        if count + 1 > self.limit or not previous:
+            wait = 1 - elapsed
+        else:
+            # The previous window's weight must fall to (limit - count - 1) / previous.
+            wait = max(0, 1 - (self.limit - count - 1) / previous - elapsed)
+        return max(1, math.ceil(wait * self.period))
+
+    def refund(self, cache, now):
+        try:
+            cache.decr(self._window_key(self._window(now)[0]))
+        except ValueError:
+            pass
+
+
+def buckets_for(request, scope, account_field=None):
+    rates = get_rates(scope)
+    buckets = []
+    if 'ip' in rates:
+        buckets.append(('ip', SlidingWindow(bucket_key(scope, 'ip', client_ip(request)), rates['ip'])))
+    account = request.POST.get(account_field, '').strip().lower() if account_field else ''
+    if account and 'account' in rates:
+        buckets.append(('account', SlidingWindow(bucket_key(scope, 'account', account), rates['account'])))
+    return buckets
+
+
+def check(request, scope, account_field=None):
+    """Count this request in every bucket; returns ``(allowed, retry_after, kind)``.
+
+    A rejected request is refunded from the buckets it was counted in, so a
+    blocked account does not also use up the IP's allowance (and vice versa).
+    """
+    cache = get_cache()
+    now = time.time()
+    counted = []
+    for kind, bucket in buckets_for(request, scope, account_field):
+        allowed, retry_after = bucket.hit(cache, now)
+        counted.append(bucket)
+        if not allowed:
+            for hit in counted:
+                hit.refund(cache, now)
+            return False, retry_after, kind
+    return True, 0, None
+
+
+# --------------------------------
+# Metrics
+# --------------------------------
+def rejection_key(scope, kind):
+    return f"{KEY_PREFIX}:rejected:{scope}:{kind}"
+
+
+def record_rejection(request, scope, kind, retry_after):
+    cache = get_cache()
+    key = rejection_key(scope, kind)
+    # add() is a no-op when the counter exists; incr() is atomic on shared caches.
+    cache.add(key, 0, None)
+    cache.incr(key)
+    logger.warning(
+        "Throttled %s request on %s (%s bucket), retry after %ss",
+        scope, request.path, kind, retry_after,
+        extra={'throttle_scope': scope, 'throttle_bucket': kind, 'client_ip': client_ip(request)},
+    )
+
+
+def rejection_counts():
+    """``{(scope, bucket kind): rejections}`` since the counters were last reset"""
+    cache = get_cache()
+    rates = getattr(settings, 'THROTTLE_RATES', DEFAULT_RATES)
+    keys = {rejection_key(scope, kind): (scope, kind) for scope, limits in rates.items() for kind in limits}
+    return {keys[key]: count for key, count in cache.get_many(list(keys)).items()}
+
+
+# --------------------------------
+# Decorator
+# --------------------------------
+def throttle(scope, account_field=None):
+    """Throttle POSTs to a view under ``THROTTLE_RATES[scope]``.
+
+    ``account_field`` names the POST field identifying the account (email or
+    username) for the per-account bucket.
+    """
+    def decorator(view_func):
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            if request.method == 'POST':
+                allowed, retry_after, kind = check(request, scope, account_field)
+                if not allowed:
+                    record_rejection(request, scope, kind, retry_after)
+                    response = HttpResponse(
+                        "Too many attempts. Please try again later.",
+                        status=429, content_type='text/plain; charset=utf-8',
+                    )
+                    response['Retry-After'] = str(retry_after)
+                    return response
+            return view_func(request, *args, **kwargs)
+        return wrapper
+    return decorator
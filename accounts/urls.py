@@ -1,4 +1,4 @@
-from django.urls import path
+from django.urls import path, re_path
 from . import views
 
 
@@ -32,8 +32,10 @@ urlpatterns += [
 urlpatterns += [
     path("vendor/properties/", views.vendor_property_list, name="vendor_property_list"),
     path("vendor/properties/add/", views.vendor_property_create, name="vendor_property_create"),
-    path("vendor/properties/<uuid:pk>/edit/", views.vendor_property_update, name="vendor_property_update"),
-    path("vendor/properties/<uuid:pk>/delete/", views.vendor_property_delete, name="vendor_property_delete"),
+    path("vendor/properties/import/", views.vendor_property_import, name="vendor_property_import"),
+    re_path(r"^vendor/properties/export\.(?P<fmt>csv|jsonl)$", views.vendor_property_export, name="vendor_property_export"),
+    path("vendor/properties/<int:pk>/edit/", views.vendor_property_update, name="vendor_property_update"),
+    path("vendor/properties/<int:pk>/delete/", views.vendor_property_delete, name="vendor_property_delete"),
 ]
     
 
@@ -42,10 +44,19 @@ urlpatterns += [
     # path('vendor/dashboard/', views.vendor_dashboard, name='vendor_dashboard'),
     path('vendor_dashboard/', views.vendor_dashboard, name='vendor_dashboard'),
     path('customer/dashboard/', views.customer_dashboard, name='customer_dashboard'),
+    path('customer/searches/', views.saved_searches, name='saved_searches'),
+    path('customer/searches/<int:pk>/delete/', views.saved_search_delete, name='saved_search_delete'),
     path('admin/dashboard/', views.admin_dashboard, name='admin_dashboard'),
 ]
 
 
+    # Data Exports
+urlpatterns += [
+    re_path(r"^exports/properties\.(?P<fmt>csv|jsonl)$", views.admin_property_export, name="admin_property_export"),
+    re_path(r"^exports/users\.(?P<fmt>csv|jsonl)$", views.admin_user_export, name="admin_user_export"),
+]
+
+
 
 
 
@@ -304,11 +304,12 @@
 #     messages.success(request, "Property deleted successfully.")
 #     return redirect('vendor_property_list')
 
+from asgiref.sync import sync_to_async
 from django.shortcuts import render, redirect, get_object_or_404
-from django.http import HttpResponse
+from django.http import HttpResponse, HttpResponseBadRequest
 from django.contrib import messages
 from django.contrib.auth import (
-    login, logout, authenticate,
+    login, logout,
     update_session_auth_hash, get_user_model
 )
 from django.contrib.auth.views import (
@@ -318,6 +319,9 @@ from django.contrib.auth.views import (
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.forms import PasswordChangeForm
 from django.urls import reverse_lazy
+from django.utils.decorators import method_decorator
+from django.utils import timezone
+from datetime import timedelta
 
 # Generate auth token
 from django.utils.http import urlsafe_base64_encode, urlsafe_base64_decode
@@ -326,7 +330,6 @@ from django.contrib.auth.tokens import default_token_generator
 from django.contrib.sites.shortcuts import get_current_site
 
 # Email utilities
-from django.core.mail import EmailMessage
 from django.conf import settings
 from django.template.loader import render_to_string
 
@@ -334,18 +337,31 @@ from .forms import (
     RegistrationForm, VendorRegistrationForm,
     CustomLoginForm,
     UserProfileForm, VendorProfileForm, CustomerProfileForm,
-    CustomPasswordResetForm, CustomSetPasswordForm, PropertyForm
+    CustomPasswordResetForm, CustomSetPasswordForm, PropertyForm,
+    PropertyImportForm, SavedSearchForm
 )
 from .models import CustomUser, VendorProfile, CustomerProfile, Property
+from .backends import load_user
+from .outbox import enqueue_email
+from .throttling import throttle
+from listings import exports, importer, matching, rollups
+from estates.instrumentation import query_budget
 
 
 User = get_user_model()
 
+DASHBOARD_DAILY_WINDOW = 30
+IMPORT_REPORT_LIMIT = 200
+CUSTOMER_MATCH_COUNT = 12
+SAVED_SEARCH_LIMIT = 20
+
 
 # --------------------------------
 # Homepage
 # --------------------------------
-def index(request):
+@query_budget(3)
+async def index(request):
+    await load_user(request)
     return render(request, "index.html")
 
 
@@ -365,6 +381,7 @@ def register_vendor(request):
         form = VendorRegistrationForm()
     return render(request, 'register_vendor.html', {'form': form})
 
+@throttle('register', account_field='email')
 def register_page(request):
     if request.method == "POST":
         form = RegistrationForm(request.POST)
@@ -372,6 +389,7 @@ def register_page(request):
             user = form.save(commit=False)
             user.is_active = False
             user.save()
+            user.ensure_role_profile()
 
             # Generate token for email verification
             uid = urlsafe_base64_encode(force_bytes(user.pk))
@@ -386,21 +404,16 @@ def register_page(request):
                 "verification": verification_link
             })
 
-            try:
-                email = EmailMessage(
-                    subject=subject,
-                    from_email=settings.EMAIL_HOST_USER,
-                    to=[user.email],
-                    body=html_message
-                )
-                email.content_subtype = "html"
-                email.send()
-                print('Registration Successful!!!')
-                messages.success(request, "A verification email has been sent. Please check your inbox.")
-            except Exception as e:
-                print(f"Failed to send email: {e}")
-                messages.error(request, "Failed to send verification email.")
-            
+            # Queued for the send_queued_mail worker so the request never waits on SMTP
+            enqueue_email(
+                subject=subject,
+                body=html_message,
+                to=[user.email],
+                from_email=settings.EMAIL_HOST_USER,
+                html=True,
+            )
+            messages.success(request, "A verification email has been sent. Please check your inbox.")
+
             return redirect("login")
     else:
         form = RegistrationForm()
@@ -432,13 +445,14 @@ def activate_account(request, uidb64, token):
 # Login
 # --------------------------------
 
+@throttle('login', account_field='username')
 def login_page(request):
     if request.method == "POST":
         form = CustomLoginForm(request,data=request.POST)
         if form.is_valid():
             username = form.cleaned_data.get("username")
-            password = form.cleaned_data.get("password")
-            user = authenticate(username=username, password=password)
+            # The form already ran authenticate(); reuse its user instead of hashing again
+            user = form.get_user()
             login(request,user)
             messages.success(request, f"Welcome back, {username}!")
 
@@ -496,22 +510,23 @@ def logout_page(request):
 # --------------------------------
 # Profile Views
 # --------------------------------
+@query_budget(2)
 @login_required
 def profile_view(request):
     """Display user profile"""
     user = request.user
     context = {'user': user}
 
+    # Loaded with the user by ProfileModelBackend, so no extra query
     if user.role == 'vendor':
-        vendor_profile, _ = VendorProfile.objects.get_or_create(user=user)
-        context['vendor_profile'] = vendor_profile
+        context['vendor_profile'] = user.role_profile
     elif user.role == 'customer':
-        customer_profile, _ = CustomerProfile.objects.get_or_create(user=user)
-        context['customer_profile'] = customer_profile
+        context['customer_profile'] = user.role_profile
 
     return render(request, 'profile.html', context)
 
 
+@query_budget(6)
 @login_required
 def edit_profile_view(request):
     """Edit user profile"""
@@ -522,11 +537,9 @@ def edit_profile_view(request):
 
         # Role-specific form
         if user.role == 'vendor':
-            profile, _ = VendorProfile.objects.get_or_create(user=user)
-            profile_form = VendorProfileForm(request.POST, instance=profile)
+            profile_form = VendorProfileForm(request.POST, instance=user.role_profile)
         elif user.role == 'customer':
-            profile, _ = CustomerProfile.objects.get_or_create(user=user)
-            profile_form = CustomerProfileForm(request.POST, instance=profile)
+            profile_form = CustomerProfileForm(request.POST, instance=user.role_profile)
         else:
             profile_form = None
 
@@ -541,11 +554,9 @@ def edit_profile_view(request):
     else:
         user_form = UserProfileForm(instance=user)
         if user.role == 'vendor':
-            profile, _ = VendorProfile.objects.get_or_create(user=user)
-            profile_form = VendorProfileForm(instance=profile)
+            profile_form = VendorProfileForm(instance=user.role_profile)
         elif user.role == 'customer':
-            profile, _ = CustomerProfile.objects.get_or_create(user=user)
-            profile_form = CustomerProfileForm(instance=profile)
+            profile_form = CustomerProfileForm(instance=user.role_profile)
         else:
             profile_form = None
 
@@ -578,6 +589,7 @@ def change_password_view(request):
 # --------------------------------
 # Password Reset Views
 # --------------------------------
+@method_decorator(throttle('password_reset', account_field='email'), name='dispatch')
 class CustomPasswordResetView(PasswordResetView):
     template_name = 'accounts/password_reset.html'
     email_template_name = 'accounts/password_reset_email.html'
@@ -601,7 +613,7 @@ class CustomPasswordResetCompleteView(PasswordResetCompleteView):
 
 
 def vendor_required(user):
-    return user.is_authenticated and user.role == 'vendor'
+    return user.is_authenticated and user.role == 'vendor' and user.role_profile is not None
 
 
 # --------------------------------
@@ -609,6 +621,7 @@ def vendor_required(user):
 # --------------------------------
 from django.contrib.auth.decorators import user_passes_test
 
+@query_budget(3)
 @user_passes_test(vendor_required)
 @login_required
 def vendor_property_list(request):
@@ -616,7 +629,7 @@ def vendor_property_list(request):
         messages.error(request, "Access denied. Only vendors can manage properties.")
         return redirect('index')
     
-    vendor_profile = VendorProfile.objects.get(user=request.user)
+    vendor_profile = request.user.role_profile
     properties = vendor_profile.properties.all()
     return render(request, 'vendor_property_list.html', {'properties': properties})
     
@@ -627,7 +640,7 @@ def vendor_property_create(request):
         messages.error(request, "Access denied. Only vendors can add properties.")
         return redirect('index')
 
-    vendor_profile = VendorProfile.objects.get(user=request.user)
+    vendor_profile = request.user.role_profile
     
     if request.method == 'POST':
         form = PropertyForm(request.POST, request.FILES)
@@ -642,6 +655,37 @@ def vendor_property_create(request):
     
     return render(request, 'vendor_property_form.html', {'form': form})
 
+@user_passes_test(vendor_required)
+@login_required
+def vendor_property_import(request):
+    """Bulk import properties from an uploaded CSV/JSONL file"""
+    vendor_profile = request.user.role_profile
+    report, result = [], None
+
+    if request.method == 'POST':
+        form = PropertyImportForm(request.POST, request.FILES)
+        if form.is_valid():
+            upload = form.cleaned_data['file']
+
+            def on_error(row_number, errors):
+                if len(report) < IMPORT_REPORT_LIMIT:
+                    report.extend(importer.error_rows(row_number, errors))
+
+            result = importer.import_properties(
+                upload.file, vendor_profile, importer.detect_format(upload.name), on_error=on_error
+            )
+            messages.success(request, f"Imported {result.created} of {result.total} properties.")
+            if result.failed:
+                messages.warning(request, f"{result.failed} row(s) were rejected.")
+    else:
+        form = PropertyImportForm()
+
+    return render(request, 'vendor_property_import.html', {
+        'form': form,
+        'result': result,
+        'report': report[:IMPORT_REPORT_LIMIT],
+    })
+
 @user_passes_test(vendor_required)
 @login_required
 def vendor_property_update(request, pk):
@@ -666,21 +710,121 @@ def vendor_property_delete(request, pk):
     messages.success(request, "Property deleted successfully.")
     return redirect('vendor_property_list')
 
+@user_passes_test(vendor_required)
+@login_required
+def vendor_property_export(request, fmt):
+    """Stream the vendor's own properties as CSV/JSONL"""
+    vendor_profile = request.user.role_profile
+    try:
+        queryset = exports.property_queryset(request.GET, vendor=vendor_profile)
+    except exports.InvalidFilter as exc:
+        return HttpResponseBadRequest(str(exc))
+    return exports.streaming_response(queryset, exports.PROPERTY_COLUMNS, fmt, 'properties')
+
 
 
 
 
 
+@query_budget(5)
 @login_required
 @user_passes_test(vendor_required)
-def vendor_dashboard(request):
-    return render(request, 'vendor_dashboard.html')
+async def vendor_dashboard(request):
+    user = await load_user(request)
+    vendor_profile = user.role_profile
+    since = timezone.localdate() - timedelta(days=DASHBOARD_DAILY_WINDOW - 1)
+
+    # Querysets are evaluated here: the template must not query from async code
+    recent = vendor_profile.properties.order_by('-created_at')[:5]
+    daily = vendor_profile.daily_rollups.filter(day__gte=since, new_listings__gt=0).order_by('day')
+    context = {
+        'vendor_profile': vendor_profile,
+        'recent_properties': [property_obj async for property_obj in recent],
+        'daily_listings': [rollup async for rollup in daily],
+        'daily_window': DASHBOARD_DAILY_WINDOW,
+    }
+    # Totals come from the pre-aggregated rollup rows, not from Property
+    context.update(await rollups.avendor_summary(vendor_profile))
+    return render(request, 'vendor_dashboard.html', context)
+
+# Session, user and the matched listings, plus the listing matrix on a worker's first request
+@query_budget(4)
+@login_required
+async def customer_dashboard(request):
+    user = await load_user(request)
+    matches = []
+    if user.role == 'customer' and user.role_profile is not None:
+        # Scoring is CPU-bound and may (re)load the matrix, so keep it off the event loop
+        matches = await sync_to_async(matching.top_matches)(user.role_profile, limit=CUSTOMER_MATCH_COUNT)
+    return render(request, 'customer_dashboard.html', {'matches': matches})
+
 
+# --------------------------------
+# Saved Searches (customers)
+# --------------------------------
+def customer_required(user):
+    return user.is_authenticated and user.role == 'customer' and user.role_profile is not None
+
+@query_budget(4)
+@user_passes_test(customer_required)
 @login_required
-def customer_dashboard(request):
-    return render(request, 'customer_dashboard.html')
+def saved_searches(request):
+    """List the customer's saved searches and save a new one"""
+    customer_profile = request.user.role_profile
+    if request.method == 'POST':
+        form = SavedSearchForm(request.POST)
+        if customer_profile.saved_searches.count() >= SAVED_SEARCH_LIMIT:
+            form.add_error(None, f"You can keep up to {SAVED_SEARCH_LIMIT} saved searches; delete one first.")
+        elif form.is_valid():
+            search = form.save(commit=False)
+            search.customer = customer_profile
+            search.save()
+            messages.success(request, f"Saved \"{search.name}\". We'll email you when new listings match.")
+            return redirect('saved_searches')
+    else:
+        form = SavedSearchForm()
+    searches = customer_profile.saved_searches.order_by('-created_at')
+    return render(request, 'saved_searches.html', {'form': form, 'searches': searches})
+
+@user_passes_test(customer_required)
+@login_required
+def saved_search_delete(request, pk):
+    if request.method != 'POST':
+        return redirect('saved_searches')
+    search = get_object_or_404(request.user.role_profile.saved_searches, pk=pk)
+    search.delete()
+    messages.success(request, "Saved search removed.")
+    return redirect('saved_searches')
 
 @login_required
 @user_passes_test(lambda u: u.role == 'admin')
-def admin_dashboard(request):
+async def admin_dashboard(request):
+    await load_user(request)
     return render(request, 'admin_dashboard.html')
+
+
+# --------------------------------
+# Data Exports (admin)
+# --------------------------------
+def admin_required(user):
+    return user.is_authenticated and (user.is_staff or user.role == 'admin')
+
+@login_required
+@user_passes_test(admin_required)
+def admin_property_export(request, fmt):
+    """Stream every property (filtered like the admin changelist) as CSV/JSONL"""
+    try:
+        queryset = exports.property_queryset(request.GET)
+    except exports.InvalidFilter as exc:
+        return HttpResponseBadRequest(str(exc))
+    return exports.streaming_response(queryset, exports.PROPERTY_COLUMNS, fmt, 'properties')
+
+@login_required
+@user_passes_test(admin_required)
+def admin_user_export(request, fmt):
+    """Stream user accounts as CSV/JSONL"""
+    try:
+        queryset = exports.user_queryset(request.GET)
+    except exports.InvalidFilter as exc:
+        return HttpResponseBadRequest(str(exc))
+    return exports.streaming_response(queryset, exports.USER_COLUMNS, fmt, 'users')
@@ -0,0 +1,40 @@
+"""Template context shared by every page.
+
+``base.html`` caches its header and footer with ``{% cache %}``. The keys
+include ``fragment_version``, a hash of the project templates and the
+collected static manifest, so a deploy that changes either gets new keys
+and never serves fragments rendered by the previous release. Set
+``TEMPLATE_FRAGMENT_VERSION`` (e.g. to a release id) to also cover
+changes elsewhere, such as renamed URLs. The header also varies by
+``fragment_role``, since its links depend on auth state.
+"""
+import hashlib
+from functools import cache
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+
+
+@cache
+def fragment_version():
+    version = getattr(settings, 'TEMPLATE_FRAGMENT_VERSION', '')
+    if version:
+        return version
+    digest = hashlib.sha256()
+    for path in sorted((Path(settings.BASE_DIR) / 'templates').glob('**/*.html')):
+        digest.update(path.read_bytes())
+    if settings.STATIC_ROOT:
+        manifest = Path(settings.STATIC_ROOT) / ManifestStaticFilesStorage.manifest_name
+        if manifest.exists():
+            digest.update(manifest.read_bytes())
+    return digest.hexdigest()[:12]
+
+
+def template_fragments(request):
+    user = getattr(request, 'user', None)
+    return {
+        'fragment_timeout': getattr(settings, 'TEMPLATE_FRAGMENT_SECONDS', 60 * 60),
+        'fragment_version': fragment_version(),
+        'fragment_role': user.role if user is not None and user.is_authenticated else 'anonymous',
+    }
@@ -0,0 +1,218 @@
+"""Per-request timing: SQL query count/time, template render time, total time.
+
+``ServerTimingMiddleware`` collects the numbers for every request and can
+emit them as a ``Server-Timing`` header (visible in the browser devtools
+Network tab) and/or as one JSON log line on the ``estates.timing`` logger.
+Template time comes from the ``TimedDjangoTemplates`` backend set in ``TEMPLATES``.
+
+Views can declare how many queries they are allowed with ``@query_budget(n)``.
+Going over budget is logged as a warning by the middleware, and
+``estates.testing.assert_query_budget`` turns it into a test failure.
+"""
+import json
+import logging
+import time
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from django.template.backends.django import DjangoTemplates, Template as DjangoBackendTemplate
+
+
+logger = logging.getLogger('estates.timing')
+
+_current = ContextVar('request_metrics', default=None)
+
+
+class RequestMetrics:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.total = 0.0
+        self.queries = 0
+        self.query_time = 0.0
+        self.template_time = 0.0
+        self.budget = None
+        self._rendering = 0
+
+    def record_query(self, elapsed):
+        self.query_time += elapsed
+        self.queries += 1
+
+    @property
+    def over_budget(self):
+        return self.budget is not None and self.queries > self.budget
+
+    def server_timing(self):
+        return ', '.join([
+            f'db;dur={self.query_time * 1000:.1f};desc="{self.queries} queries"',
+            f'tpl;dur={self.template_time * 1000:.1f}',
+            f'total;dur={self.total * 1000:.1f}',
+        ])
+
+    def as_dict(self):
+        return {
+            'queries': self.queries,
+            'db_ms': round(self.query_time * 1000, 1),
+            'template_ms': round(self.template_time * 1000, 1),
+            'total_ms': round(self.total * 1000, 1),
+            'query_budget': self.budget,
+        }
+
+
+def current_metrics():
+    """Metrics of the request being handled, or ``None`` outside the middleware"""
+    return _current.get()
+
+
+# --------------------------------
+# Query timing
+# --------------------------------
+def _timed_execute(execute, sql, params, many, context):
+    # The context variable follows async views into the threads that run
+    # their ORM queries, so this counts sync and async queries alike.
+    metrics = _current.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.record_query(time.perf_counter() - start)
+
+
+@receiver(connection_created)
+def install_query_timer(sender, connection, **kwargs):
+    if _timed_execute not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_timed_execute)
+
+
+# Connections opened before this module was imported missed the signal.
+for _connection in connections.all(initialized_only=True):
+    install_query_timer(None, _connection)
+
+
+# --------------------------------
+# Template render timing
+# --------------------------------
+class TimedTemplate(DjangoBackendTemplate):
+    def render(self, context=None, request=None):
+        metrics = _current.get()
+        if metrics is None:
+            return super().render(context, request)
+        # render_to_string() inside a template tag would otherwise be counted twice.
+        metrics._rendering += 1
+        start = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            metrics._rendering -= 1
+            if not metrics._rendering:
+                metrics.template_time += time.perf_counter() - start
+
+
+class TimedDjangoTemplates(DjangoTemplates):
+    """The Django template backend, timing renders into the current request's metrics.
+
+    Set as the ``BACKEND`` in ``TEMPLATES``; other engines are not affected.
+    """
+
+    def from_string(self, template_code):
+        return TimedTemplate(super().from_string(template_code).template, self)
+
+    def get_template(self, template_name):
+        return TimedTemplate(super().get_template(template_name).template, self)
+
+
+# --------------------------------
+# Query budgets
+# --------------------------------
+def query_budget(limit):
+    """Declare the most SQL queries a view may run per request"""
+    def decorator(view_func):
+        view_func.query_budget = limit
+        return view_func
+    return decorator
+
+
+def budget_for(view_func):
+    # Class-based views keep attributes on the view class.
+    view_class = getattr(view_func, 'view_class', None)
+    return getattr(view_func, 'query_budget', getattr(view_class, 'query_budget', None))
+
+
+# --------------------------------
+# Middleware
+# --------------------------------
+class ServerTimingMiddleware:
+    """Measure every request; see the module docstring.
+
+    Placed first in ``MIDDLEWARE`` so the total covers all other middleware
+    (session and auth lookups count towards the query total too). Works in
+    both WSGI and ASGI stacks without a thread hop.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.emit_header = getattr(settings, 'SERVER_TIMING_HEADER', settings.DEBUG)
+        self.emit_log = getattr(settings, 'SERVER_TIMING_LOG', False)
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+            self.process_view = self._aprocess_view
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(request, response, metrics)
+
+    async def __acall__(self, request):
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(request, response, metrics)
+
+    def finish(self, request, response, metrics):
+        metrics.total = time.perf_counter() - metrics.started
+        # For estates.testing, which checks budgets against these same numbers.
+        response.request_metrics = metrics
+        if self.emit_header:
+            response['Server-Timing'] = metrics.server_timing()
+        if self.emit_log:
+            logger.info(json.dumps({
+                'method': request.method,
+                'path': request.path,
+                'status': response.status_code,
+                **metrics.as_dict(),
+            }))
+        if metrics.over_budget:
+            logger.warning(
+                "%s %s ran %s queries (budget %s)",
+                request.method, request.path, metrics.queries, metrics.budget,
+            )
+        return response
+
+    @staticmethod
+    def _record_budget(view_func):
+        metrics = _current.get()
+        if metrics is not None:
+            metrics.budget = budget_for(view_func)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        self._record_budget(view_func)
+
+    async def _aprocess_view(self, request, view_func, view_args, view_kwargs):
+        # A coroutine, so the async stack does not wrap it in sync_to_async.
+        self._record_budget(view_func)
@@ -42,7 +42,10 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'estates.instrumentation.ServerTimingMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'estates.staticfiles.StaticFilesMiddleware',
+    'listings.middleware.PrerenderedPageMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -55,15 +58,17 @@ ROOT_URLCONF = 'estates.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # DjangoTemplates that also times renders for estates.instrumentation
+        'BACKEND': 'estates.instrumentation.TimedDjangoTemplates',
         'DIRS': [BASE_DIR, "templates"],
-        'APP_DIRS': True,
         'OPTIONS': {
             'context_processors': [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'estates.context_processors.template_fragments',
             ],
+            # 'loaders' is set below, once DEBUG is known
         },
     },
 ]
@@ -102,6 +107,22 @@ AUTH_PASSWORD_VALIDATORS = [
 
 AUTH_USER_MODEL = 'accounts.CustomUser'
 
+# Loads request.user with its vendor/customer profile in one query; ModelBackend
+# still resolves sessions that were logged in before ProfileModelBackend existed
+AUTHENTICATION_BACKENDS = [
+    'accounts.backends.ProfileModelBackend',
+    'django.contrib.auth.backends.ModelBackend',
+]
+
+# Tune with `manage.py benchmark_hashers`; old hashes are upgraded on next login
+PASSWORD_HASHERS = [
+    'accounts.hashers.TunedPBKDF2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'django.contrib.auth.hashers.Argon2PasswordHasher',
+    'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+    'django.contrib.auth.hashers.ScryptPasswordHasher',
+]
+
 # Internationalization
 # https://docs.djangoproject.com/en/5.2/topics/i18n/
 
@@ -123,14 +144,35 @@ STATIC_URL = "static/"
 
 STATICFILES_DIRS = [os.path.join(BASE_DIR, "static")]
 
+# `manage.py collectstatic` writes content-hashed copies plus .gz variants here;
+# estates.staticfiles.StaticFilesMiddleware serves them when DEBUG is off.
+STATIC_ROOT = BASE_DIR / "staticfiles"
+
+STORAGES = {
+    "default": {"BACKEND": "django.core.files.storage.FileSystemStorage"},
+    "staticfiles": {"BACKEND": "estates.staticfiles.CompressedManifestStaticFilesStorage"},
+}
+
+# Cache lifetime for collected files requested by their unhashed name
+STATIC_UNHASHED_MAX_AGE = 60
+
+# Output of `manage.py prerender_pages`
+PRERENDER_ROOT = BASE_DIR / "prerendered"
+
 MEDIA_URL = '/media/'
 
 MEDIA_ROOT = os.path.join(BASE_DIR / "media")
 
+# Processes resizing uploads into responsive variants (accounts.images)
+IMAGE_VARIANT_WORKERS = 2
+
 LOGIN_URL = '/login/'
 
 LOGIN_REDIRECT_URL = '/home/'
 
+# Seconds between flushes of buffered Property.views_count increments
+VIEW_COUNT_FLUSH_INTERVAL = 10
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
@@ -139,6 +181,8 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 from decouple import config
 
+from .sqlite import database_options
+
 #send to mail
 EMAIL_BACKEND = config("EMAIL_BACKEND")
 EMAIL_USE_TLS = config("EMAIL_USE_TLS", cast=bool)
@@ -147,6 +191,58 @@ EMAIL_PORT = config("EMAIL_PORT", cast=int)
 EMAIL_HOST_USER =  config("EMAIL_HOST_USER")
 EMAIL_HOST_PASSWORD = config("EMAIL_HOST_PASSWORD")
 DEFAULT_FROM_EMAIL = config("DEFAULT_FROM_EMAIL")
+
+# Outbound email queue (drained by `manage.py send_queued_mail`)
+EMAIL_OUTBOX_BATCH_SIZE = config("EMAIL_OUTBOX_BATCH_SIZE", default=50, cast=int)
+EMAIL_OUTBOX_MAX_ATTEMPTS = config("EMAIL_OUTBOX_MAX_ATTEMPTS", default=6, cast=int)
+EMAIL_OUTBOX_BACKOFF_SECONDS = config("EMAIL_OUTBOX_BACKOFF_SECONDS", default=60, cast=int)
  
 SECRET_KEY = config("SECRET_KEY")
-DEBUG = config("DEBUG", default=False, cast=bool)
\ No newline at end of file
+DEBUG = config("DEBUG", default=False, cast=bool)
+
+# Used by accounts.hashers.TunedPBKDF2PasswordHasher
+PASSWORD_PBKDF2_ITERATIONS = config("PASSWORD_PBKDF2_ITERATIONS", default=1_000_000, cast=int)
+
+# SQLite connection profile (estates.sqlite): "production" = WAL, synchronous=NORMAL,
+# mmap/page cache sizing, busy timeout and BEGIN IMMEDIATE; "default" = SQLite's own defaults.
+# Deployments set SQLITE_PROFILE=production; WAL mode is stored in the database file itself,
+# so the default keeps manage.py (tests included) from rewriting the checked-in dev database.
+SQLITE_PROFILE = config("SQLITE_PROFILE", default='default')
+DATABASES['default']['OPTIONS'] = database_options(
+    SQLITE_PROFILE,
+    mmap_size=config("SQLITE_MMAP_SIZE", default='') or None,
+    cache_size=config("SQLITE_CACHE_SIZE", default='') or None,
+)
+
+# Cache (throttle buckets live here; point it at Redis/Memcached to share limits across workers)
+CACHES = {
+    'default': {
+        'BACKEND': config("CACHE_BACKEND", default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': config("CACHE_LOCATION", default=''),
+    }
+}
+
+# Auth endpoint throttling (accounts.throttling): "<requests>/<s|m|h|d>" allowed per sliding
+# window of that period, counted separately per client IP and per account
+THROTTLE_CACHE = 'default'
+THROTTLE_RATES = {
+    'login': {'ip': config("THROTTLE_LOGIN_IP", default='20/m'), 'account': config("THROTTLE_LOGIN_ACCOUNT", default='10/m')},
+    'register': {'ip': config("THROTTLE_REGISTER_IP", default='10/h')},
+    'password_reset': {'ip': config("THROTTLE_RESET_IP", default='10/h'), 'account': config("THROTTLE_RESET_ACCOUNT", default='3/h')},
+}
+
+# Templates: parse each file once per process outside DEBUG (cached loader), and keep
+# base.html's header/footer fragments in the cache (0 disables, the DEBUG default)
+TEMPLATE_LOADERS = [
+    'django.template.loaders.filesystem.Loader',
+    'django.template.loaders.app_directories.Loader',
+]
+TEMPLATES[0]['OPTIONS']['loaders'] = (
+    TEMPLATE_LOADERS if DEBUG else [('django.template.loaders.cached.Loader', TEMPLATE_LOADERS)]
+)
+TEMPLATE_FRAGMENT_SECONDS = config("TEMPLATE_FRAGMENT_SECONDS", default=0 if DEBUG else 60 * 60, cast=int)
+TEMPLATE_FRAGMENT_VERSION = config("TEMPLATE_FRAGMENT_VERSION", default='')
+
+# Per-request instrumentation (estates.instrumentation.ServerTimingMiddleware)
+SERVER_TIMING_HEADER = config("SERVER_TIMING_HEADER", default=DEBUG, cast=bool)
+SERVER_TIMING_LOG = config("SERVER_TIMING_LOG", default=False, cast=bool)
@@ -0,0 +1,77 @@
+"""SQLite connection profiles.
+
+``database_options(profile)`` builds ``DATABASES['default']['OPTIONS']`` so
+that every new connection runs the profile's PRAGMAs (Django executes
+``init_command`` on connect), waits ``timeout`` seconds on a locked
+database instead of failing at once, and starts ``atomic()`` blocks with
+``BEGIN IMMEDIATE``. Taking the write lock up front means a transaction
+that reads before writing waits for the lock at BEGIN, rather than failing
+with "database is locked" when it tries to upgrade its read lock.
+
+``production`` uses WAL: readers no longer block the writer (or vice
+versa), and with ``synchronous=NORMAL`` a commit only appends to the log
+instead of fsyncing the database file; a power loss can drop the last
+commits but cannot corrupt the database. ``default`` leaves SQLite's own
+settings alone (rollback journal, ``synchronous=FULL``, deferred BEGIN).
+
+This module is imported by the settings, so it must not import Django.
+"""
+import sqlite3
+
+
+PROFILES = {
+    'default': {
+        'pragmas': {},
+        'timeout': 5,
+        'transaction_mode': None,
+    },
+    'production': {
+        'pragmas': {
+            'journal_mode': 'wal',
+            'synchronous': 'normal',
+            'mmap_size': 256 * 1024 * 1024,
+            'cache_size': -64 * 1024,       # negative = KiB, i.e. 64 MiB per connection
+            'temp_store': 'memory',
+            'wal_autocheckpoint': 1000,     # pages
+        },
+        'timeout': 20,
+        'transaction_mode': 'IMMEDIATE',
+    },
+}
+
+
+def init_command(pragmas):
+    return ';'.join(f'PRAGMA {name}={value}' for name, value in pragmas.items())
+
+
+def database_options(profile='production', **overrides):
+    """Django ``OPTIONS`` for ``profile``; ``overrides`` replace individual PRAGMAs"""
+    return profile_options(PROFILES[profile], **overrides)
+
+
+def profile_options(settings, **overrides):
+    pragmas = {**settings['pragmas'], **{name: value for name, value in overrides.items() if value is not None}}
+    options = {'timeout': settings['timeout']}
+    if pragmas:
+        options['init_command'] = init_command(pragmas)
+    if settings['transaction_mode']:
+        options['transaction_mode'] = settings['transaction_mode']
+    return options
+
+
+def connect(path, settings):
+    """A plain ``sqlite3`` connection set up the way Django sets one up for ``settings``.
+
+    The connection is in autocommit mode; start transactions with ``begin_statement``.
+    """
+    options = profile_options(settings)
+    connection = sqlite3.connect(path, timeout=options['timeout'], isolation_level=None, check_same_thread=False)
+    for statement in options.get('init_command', '').split(';'):
+        if statement:
+            connection.execute(statement)
+    return connection
+
+
+def begin_statement(settings):
+    mode = settings['transaction_mode']
+    return f'BEGIN {mode}' if mode else 'BEGIN'
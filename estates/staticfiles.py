@@ -0,0 +1,203 @@
+"""Hashed, precompressed static files served by Django itself.
+
+``collectstatic`` runs ``CompressedManifestStaticFilesStorage``: every
+file is copied to ``STATIC_ROOT`` under a content-hashed name
+(``style.3f2a9c1b0d4e.css``, with ``url()`` references in CSS rewritten
+to match) and ``{% static %}`` resolves names through the manifest. Each
+compressible file then gets a ``.gz`` sibling, written once at deploy time
+rather than per response.
+
+``StaticFilesMiddleware`` serves ``STATIC_URL`` from ``STATIC_ROOT``
+without a separate web server. It indexes the collected files once at
+startup, picks the ``.gz`` variant when the client accepts gzip, and marks
+hashed names immutable for a year: a changed file gets a new name, so a
+cached copy never needs revalidating. Unhashed names (for references the
+manifest cannot rewrite) get a short max-age and an ETag.
+"""
+import gzip
+import json
+import logging
+import mimetypes
+import os
+from pathlib import Path
+from urllib.parse import urlsplit
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.exceptions import MiddlewareNotUsed
+from django.core.files.base import ContentFile
+from django.http import FileResponse
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date
+
+
+# Formats that are already compressed; gzip would only cost CPU.
+UNCOMPRESSED_SKIP = {
+    '.jpg', '.jpeg', '.png', '.gif', '.webp', '.avif', '.ico',
+    '.woff', '.woff2', '.gz', '.br', '.zip', '.mp3', '.mp4', '.webm',
+}
+# Keep a .gz only when it saves at least this fraction of the original.
+MIN_SAVING = 0.05
+IMMUTABLE_MAX_AGE = 365 * 24 * 60 * 60
+
+logger = logging.getLogger(__name__)
+
+
+def compressible(name):
+    return os.path.splitext(name)[1].lower() not in UNCOMPRESSED_SKIP
+
+
+# --------------------------------
+# Storage (collectstatic)
+# --------------------------------
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """Manifest storage that also writes a ``.gz`` of every compressible file"""
+
+    def url_converter(self, name, hashed_files, template=None):
+        converter = super().url_converter(name, hashed_files, template)
+
+        def convert(matchobj):
+            # Vendored CSS refers to a few images that were never shipped;
+            # keep such a reference as it is rather than failing the deploy.
+            try:
+                return converter(matchobj)
+            except ValueError as exc:
+                logger.warning("%s: %s", name, exc)
+                return matchobj['matched']
+        return convert
+
+    def post_process(self, paths, dry_run=False, **options):
+        processed_names = set()
+        for name, hashed_name, processed in super().post_process(paths, dry_run, **options):
+            yield name, hashed_name, processed
+            if hashed_name and not isinstance(processed, Exception):
+                processed_names.add(hashed_name)
+        if dry_run:
+            return
+        # Both names are served: the hashed one to templates, the original to anything else.
+        for name in sorted(set(paths) | processed_names):
+            if compressible(name):
+                compressed_name = self.compress(name)
+                if compressed_name:
+                    yield name, compressed_name, True
+
+    def compress(self, name):
+        """Write ``name + '.gz'`` if it is worth it; returns the name written, or None"""
+        with self.open(name) as handle:
+            data = handle.read()
+        # mtime=0 keeps the output identical across runs for identical input.
+        compressed = gzip.compress(data, compresslevel=9, mtime=0)
+        compressed_name = name + '.gz'
+        if self.exists(compressed_name):
+            self.delete(compressed_name)
+        if len(compressed) > len(data) * (1 - MIN_SAVING):
+            return None
+        self._save(compressed_name, ContentFile(compressed))
+        return compressed_name
+
+
+# --------------------------------
+# Serving
+# --------------------------------
+class StaticFile:
+    __slots__ = ('path', 'content_type', 'etag', 'modified', 'last_modified', 'gzip_path', 'cache_control')
+
+    def __init__(self, path, immutable, unhashed_max_age):
+        self.path = path
+        content_type, _ = mimetypes.guess_type(path.name)
+        if content_type in ('text/css', 'text/javascript', 'application/javascript', 'image/svg+xml'):
+            content_type += '; charset=utf-8'
+        self.content_type = content_type or 'application/octet-stream'
+        stat = path.stat()
+        self.etag = f'"{int(stat.st_mtime):x}-{stat.st_size:x}"'
+        self.modified = int(stat.st_mtime)
+        self.last_modified = http_date(self.modified)
+        gzip_path = path.with_name(path.name + '.gz')
+        self.gzip_path = gzip_path if gzip_path.exists() else None
+        self.cache_control = (
+            f'public, max-age={IMMUTABLE_MAX_AGE}, immutable' if immutable
+            else f'public, max-age={unhashed_max_age}'
+        )
+
+
+def accepts_gzip(request):
+    for coding in request.headers.get('Accept-Encoding', '').split(','):
+        name, _, params = coding.strip().partition(';')
+        if name.strip().lower() in ('gzip', '*'):
+            return params.replace(' ', '') not in ('q=0', 'q=0.0', 'q=0.00', 'q=0.000')
+    return False
+
+
+class StaticFilesMiddleware:
+    """Serve collected static files; see the module docstring.
+
+    Goes right after ``SecurityMiddleware`` so a static request skips
+    sessions, CSRF and auth. Off when ``SERVE_STATIC`` is false (by default
+    under ``DEBUG``, where ``runserver`` serves the source files itself).
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'SERVE_STATIC', not settings.DEBUG) or not settings.STATIC_ROOT:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+        self.prefix = urlsplit(settings.STATIC_URL).path
+        self.files = self.index(
+            Path(settings.STATIC_ROOT), getattr(settings, 'STATIC_UNHASHED_MAX_AGE', 60)
+        )
+
+    def index(self, root, unhashed_max_age):
+        """URL path -> StaticFile for every collected file, built once"""
+        if not root.is_dir():
+            return {}
+        try:
+            with open(root / ManifestStaticFilesStorage.manifest_name, 'rb') as handle:
+                hashed = set(json.load(handle)['paths'].values())
+        except FileNotFoundError:
+            hashed = set()
+        files = {}
+        for path in root.rglob('*'):
+            if not path.is_file() or path.suffix == '.gz' and path.with_suffix('').is_file():
+                continue
+            name = path.relative_to(root).as_posix()
+            files[self.prefix + name] = StaticFile(path, name in hashed, unhashed_max_age)
+        return files
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return self.serve(request) or self.get_response(request)
+
+    async def __acall__(self, request):
+        return self.serve(request) or await self.get_response(request)
+
+    def serve(self, request):
+        """The response for a collected static file, or ``None``"""
+        if request.method not in ('GET', 'HEAD'):
+            return None
+        static_file = self.files.get(request.path_info)
+        if static_file is None:
+            return None
+
+        use_gzip = static_file.gzip_path is not None and accepts_gzip(request)
+        # The gzip variant is a different representation, so it gets its own ETag.
+        etag = static_file.etag[:-1] + '-gz"' if use_gzip else static_file.etag
+        response = get_conditional_response(request, etag=etag, last_modified=static_file.modified)
+        if response is None:
+            response = FileResponse(
+                open(static_file.gzip_path if use_gzip else static_file.path, 'rb'),
+                content_type=static_file.content_type,
+            )
+            del response['Content-Disposition']
+            if use_gzip:
+                response['Content-Encoding'] = 'gzip'
+        response['ETag'] = etag
+        response['Last-Modified'] = static_file.last_modified
+        response['Cache-Control'] = static_file.cache_control
+        if static_file.gzip_path is not None:
+            patch_vary_headers(response, ('Accept-Encoding',))
+        return response
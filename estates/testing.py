@@ -0,0 +1,40 @@
+"""Test helpers for the query budgets declared with ``@query_budget``."""
+from django.conf import settings
+from django.db import connection
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import resolve, reverse
+
+from .instrumentation import budget_for
+
+
+# The manifest storage needs `collectstatic` output, which test runs don't have.
+plain_static_storage = override_settings(STORAGES={
+    **settings.STORAGES,
+    'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+})
+
+
+def assert_query_budget(client, url_name, *args, method='get', data=None, **kwargs):
+    """Request ``url_name`` with ``client`` and fail if it runs more queries than its view allows.
+
+    The count is the one ``ServerTimingMiddleware`` logs, which includes the
+    queries async views run in other threads. ``args``/``kwargs`` are passed
+    to ``reverse()``. Returns the response.
+    """
+    url = reverse(url_name, args=args, kwargs=kwargs)
+    budget = budget_for(resolve(url).func)
+    if budget is None:
+        raise AssertionError(f"{url_name} has no @query_budget")
+
+    with CaptureQueriesContext(connection) as captured:
+        response = getattr(client, method)(url, data)
+    metrics = getattr(response, 'request_metrics', None)
+    if metrics is None:
+        raise AssertionError("ServerTimingMiddleware is not in MIDDLEWARE")
+    if metrics.queries > budget:
+        # Only the queries run on this thread's connection can be listed.
+        queries = '\n'.join(f"  {i}. {query['sql']}" for i, query in enumerate(captured, start=1))
+        raise AssertionError(
+            f"{url_name} ran {metrics.queries} queries, budget is {budget}:\n{queries}"
+        )
+    return response
@@ -51,6 +51,7 @@ urlpatterns = [
     # App routes
     path('', include('accounts.urls')),     # Authentication, profiles, vendor management
     path('listings/', include('listings.urls')),  # Property listing routes
+    path('api/v1/', include('listings.api_urls')),  # Read-only JSON API
 ]
 
 # Serve media files during development
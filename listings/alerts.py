@@ -0,0 +1,273 @@
+"""Saved-search alerts for new and updated listings.
+
+Checking a saved property against every saved search would cost one test
+(or one query) per search. Instead ``SearchIndex`` keeps an inverted index
+over the active searches in memory: for each criterion (city, property
+type, listing type, price bucket) a posting set of search ids per value,
+plus the set of searches that leave the criterion blank. A property's
+candidates are, per criterion, its value's postings plus the blank set,
+intersected smallest first; only those few candidates get the exact
+``SavedSearch.matches`` check (price buckets are coarser than the bounds).
+
+Each process keeps its own index. Before matching, it re-reads the
+searches whose ``updated_at`` moved since its last sync (one indexed
+query), and matched search ids are confirmed against the table before any
+alert is written, so searches created, changed, paused or deleted by
+other processes take effect on the next property saved anywhere.
+
+Matches become ``SearchAlert`` rows and are mailed later, one digest per
+customer, through the email outbox by the ``send_search_alerts`` command.
+"""
+import math
+import threading
+import time
+from collections import defaultdict
+from datetime import timedelta
+from itertools import groupby
+
+from django.conf import settings
+from django.db import transaction
+from django.template.loader import render_to_string
+from django.utils import timezone
+
+from accounts.outbox import enqueue_email
+from .models import SavedSearch, SearchAlert
+
+
+# Full reloads also catch writes that skip updated_at, such as QuerySet.update().
+REBUILD_INTERVAL = getattr(settings, 'SEARCH_ALERT_REBUILD_INTERVAL', 60 * 60)
+# Syncs re-read this much history, covering clock skew between servers and
+# transactions that commit a while after they stamped updated_at.
+SYNC_OVERLAP = timedelta(seconds=getattr(settings, 'SEARCH_ALERT_SYNC_OVERLAP', 60))
+DIGEST_MAX_LISTINGS = getattr(settings, 'SEARCH_ALERT_DIGEST_MAX_LISTINGS', 20)
+BUCKETS_PER_OCTAVE = 4    # price buckets are quarter powers of two (~19% wide)
+MAX_PRICE_BUCKET = 160    # well above the largest price a DecimalField(12, 2) holds
+CRITERIA = ('city', 'property_type', 'listing_type', 'price')
+NO_SEARCHES = frozenset()
+
+
+def price_bucket(price):
+    return max(0, int(math.log2(max(float(price), 1.0)) * BUCKETS_PER_OCTAVE))
+
+
+def search_keys(search):
+    """``{criterion: keys the search is posted under, or None for "any"}``"""
+    if search.min_price is None and search.max_price is None:
+        buckets = None
+    else:
+        low = price_bucket(search.min_price) if search.min_price is not None else 0
+        high = price_bucket(search.max_price) if search.max_price is not None else MAX_PRICE_BUCKET
+        buckets = range(low, high + 1)
+    return {
+        'city': [search.city.strip().lower()] if search.city.strip() else None,
+        'property_type': [search.property_type] if search.property_type else None,
+        'listing_type': [search.listing_type] if search.listing_type else None,
+        'price': buckets,
+    }
+
+
+def property_keys(property_obj):
+    return {
+        'city': property_obj.city.strip().lower(),
+        'property_type': property_obj.property_type,
+        'listing_type': property_obj.listing_type,
+        'price': price_bucket(property_obj.price),
+    }
+
+
+class SearchIndex:
+    """Inverted index of active saved searches; see the module docstring"""
+
+    def __init__(self):
+        self.searches = {}
+        self.postings = {criterion: defaultdict(set) for criterion in CRITERIA}
+        self.wildcards = {criterion: set() for criterion in CRITERIA}
+
+    def __len__(self):
+        return len(self.searches)
+
+    def add(self, search):
+        self.remove(search.pk)
+        if not search.is_active:
+            return
+        self.searches[search.pk] = search
+        for criterion, keys in search_keys(search).items():
+            if keys is None:
+                self.wildcards[criterion].add(search.pk)
+            else:
+                for key in keys:
+                    self.postings[criterion][key].add(search.pk)
+
+    def remove(self, pk):
+        search = self.searches.pop(pk, None)
+        if search is None:
+            return
+        for criterion, keys in search_keys(search).items():
+            if keys is None:
+                self.wildcards[criterion].discard(pk)
+                continue
+            postings = self.postings[criterion]
+            for key in keys:
+                postings[key].discard(pk)
+                if not postings[key]:
+                    del postings[key]
+
+    def candidates(self, property_obj):
+        groups = sorted(
+            (
+                (self.postings[criterion].get(key, NO_SEARCHES), self.wildcards[criterion])
+                for criterion, key in property_keys(property_obj).items()
+            ),
+            key=lambda group: len(group[0]) + len(group[1]),
+        )
+        exact, wildcard = groups[0]
+        result = exact | wildcard
+        for exact, wildcard in groups[1:]:
+            if not result:
+                break
+            result = {pk for pk in result if pk in exact or pk in wildcard}
+        return result
+
+    def match(self, property_obj):
+        """Active searches the property satisfies"""
+        return [
+            self.searches[pk] for pk in sorted(self.candidates(property_obj))
+            if self.searches[pk].matches(property_obj)
+        ]
+
+    @classmethod
+    def load(cls):
+        index = cls()
+        for search in SavedSearch.objects.filter(is_active=True).iterator(chunk_size=2000):
+            index.add(search)
+        return index
+
+
+class AlertIndex:
+    """Per-process ``SearchIndex``, synced from the database before each match"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.index = None
+        self.loaded_at = 0.0
+        self.synced_at = None
+
+    def _sync(self):
+        """Load the index, or fold in searches changed since the last sync"""
+        started = timezone.now()
+        if self.index is None or time.monotonic() - self.loaded_at > REBUILD_INTERVAL:
+            self.index = SearchIndex.load()
+            self.loaded_at = time.monotonic()
+        else:
+            for search in SavedSearch.objects.filter(updated_at__gte=self.synced_at - SYNC_OVERLAP):
+                self.index.add(search)
+        self.synced_at = started
+
+    def reset(self):
+        with self.lock:
+            self.index = None
+
+    def search_saved(self, search):
+        with self.lock:
+            if self.index is not None:
+                self.index.add(search)
+
+    def search_deleted(self, pk):
+        with self.lock:
+            if self.index is not None:
+                self.index.remove(pk)
+
+    def match_all(self, properties):
+        """``[(property, search), ...]`` for every active search each property satisfies"""
+        if not properties:
+            return []
+        with self.lock:
+            self._sync()
+            matches = [
+                (property_obj, search)
+                for property_obj in properties
+                for search in self.index.match(property_obj)
+            ]
+            if not matches:
+                return []
+            # Deleted rows never show up in a sync; drop searches that are gone or paused.
+            matched = {search.pk for _, search in matches}
+            live = set(SavedSearch.objects.filter(pk__in=matched, is_active=True).values_list('pk', flat=True))
+            for pk in matched - live:
+                self.index.remove(pk)
+        return [(property_obj, search) for property_obj, search in matches if search.pk in live]
+
+    def match(self, property_obj):
+        return [search for _, search in self.match_all([property_obj])]
+
+    def properties_saved(self, properties):
+        """Queue alerts for every search each available property matches; one INSERT in total"""
+        alerts = [
+            SearchAlert(search=search, property=property_obj)
+            for property_obj, search in self.match_all(
+                [property_obj for property_obj in properties if property_obj.status == 'available']
+            )
+        ]
+        if alerts:
+            SearchAlert.objects.bulk_create(alerts, ignore_conflicts=True)
+        return len(alerts)
+
+    def property_saved(self, property_obj):
+        return self.properties_saved([property_obj])
+
+
+index = AlertIndex()
+
+
+# --------------------------------
+# Digests
+# --------------------------------
+def pending_alerts():
+    return (
+        SearchAlert.objects
+        .filter(sent_at__isnull=True, search__is_active=True, property__status='available')
+        .select_related('search__customer__user', 'property')
+        .order_by('search__customer_id', 'search_id', 'pk')
+    )
+
+
+def send_digests(max_listings=DIGEST_MAX_LISTINGS):
+    """Queue one email per customer covering all their unsent alerts.
+
+    Returns ``(emails queued, alerts covered)``. Each customer's email and
+    the marking of their alerts as sent commit together, so an interrupted
+    run neither loses nor repeats a digest.
+    """
+    emails = covered = 0
+    customer_ids = list(
+        pending_alerts().order_by('search__customer_id')
+        .values_list('search__customer_id', flat=True).distinct()
+    )
+    # One query per customer, so no cursor is left open across the writes below.
+    for customer_id in customer_ids:
+        customer_alerts = list(pending_alerts().filter(search__customer_id=customer_id))
+        if not customer_alerts:
+            continue
+        user = customer_alerts[0].search.customer.user
+        searches = []
+        for search, search_alerts in groupby(customer_alerts, key=lambda alert: alert.search):
+            properties = [alert.property for alert in search_alerts]
+            searches.append({
+                'search': search,
+                'properties': properties[:max_listings],
+                'more': max(0, len(properties) - max_listings),
+            })
+        total = len(customer_alerts)
+        body = render_to_string('search_alert_digest.txt', {'user': user, 'searches': searches})
+        with transaction.atomic():
+            enqueue_email(
+                subject=f"{total} new listing{'s' if total != 1 else ''} match your saved searches",
+                body=body,
+                to=[user.email],
+            )
+            SearchAlert.objects.filter(pk__in=[alert.pk for alert in customer_alerts]).update(
+                sent_at=timezone.now()
+            )
+        emails += 1
+        covered += total
+    return emails, covered
@@ -0,0 +1,221 @@
+"""Read-only JSON API for the mobile and web clients.
+
+Rows are read with ``values_list`` and turned into JSON by orjson without
+building model instances; each exposed field maps to an ORM column and an
+optional converter, and ``?fields=`` narrows both the SELECT and the
+payload. Lists use the same filters and opaque keyset cursors as the
+listings page. Every response carries an ETag of its body, and a matching
+``If-None-Match`` gets an empty 304.
+"""
+import orjson
+from django.core.files.storage import default_storage
+from django.http import HttpResponse, JsonResponse
+from django.utils.cache import get_conditional_response, set_response_etag
+
+from accounts import images, imaging
+from accounts.models import Property, PropertyFeature, PropertyImage, VendorProfile
+from estates.instrumentation import query_budget
+
+from .models import VendorStatusRollup
+from .search import PropertySearch, InvalidCursor
+
+
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 100
+
+
+def _decimal(value):
+    return None if value is None else str(value)
+
+
+# name -> (ORM column, converter or None)
+PROPERTY_FIELDS = {
+    'id': ('pk', None),
+    'title': ('title', None),
+    'description': ('description', None),
+    'property_type': ('property_type', None),
+    'listing_type': ('listing_type', None),
+    'status': ('status', None),
+    'address': ('address', None),
+    'city': ('city', None),
+    'state': ('state', None),
+    'latitude': ('latitude', None),
+    'longitude': ('longitude', None),
+    'price': ('price', _decimal),
+    'currency': ('currency', None),
+    'bedrooms': ('bedrooms', None),
+    'bathrooms': ('bathrooms', None),
+    'square_footage': ('square_footage', None),
+    'year_built': ('year_built', None),
+    'is_featured': ('is_featured', None),
+    'is_verified': ('is_verified', None),
+    'views_count': ('views_count', None),
+    'vendor_id': ('vendor_id', None),
+    'vendor_name': ('vendor__company_name', None),
+    'created_at': ('created_at', None),
+    'updated_at': ('updated_at', None),
+}
+LIST_FIELDS = (
+    'id', 'title', 'property_type', 'listing_type', 'city', 'state',
+    'price', 'currency', 'bedrooms', 'bathrooms', 'is_featured',
+)
+# Related lists a detail response includes unless ?fields= leaves them out.
+DETAIL_EXTRAS = ('images', 'features')
+VENDOR_FIELDS = {
+    'id': ('pk', None),
+    'company_name': ('company_name', None),
+    'bio': ('bio', None),
+    'rating': ('rating', _decimal),
+    'total_reviews': ('total_reviews', None),
+    'member_since': ('created_at', None),
+}
+
+
+class InvalidFields(ValueError):
+    pass
+
+
+def parse_fields(params, available, default):
+    """Names from ``?fields=a,b`` (or ``default``), validated against ``available``"""
+    requested = [name.strip() for name in params.get('fields', '').split(',') if name.strip()]
+    if not requested:
+        return list(default)
+    unknown = [name for name in requested if name not in available]
+    if unknown:
+        raise InvalidFields(f"Unknown field(s): {', '.join(unknown)}")
+    return list(dict.fromkeys(requested))
+
+
+def row_serializer(names, available):
+    """``(columns to select, function turning one row tuple into a dict)``"""
+    columns = [available[name][0] for name in names]
+    converters = [(index, available[name][1]) for index, name in enumerate(names) if available[name][1]]
+
+    def to_dict(row):
+        if converters:
+            row = list(row)
+            for index, convert in converters:
+                row[index] = convert(row[index])
+        return dict(zip(names, row))
+    return columns, to_dict
+
+
+def image_dict(name, alt_text, digest, placeholder, width):
+    """An image's original URL plus its responsive variants once they are built"""
+    result = {'url': default_storage.url(name), 'alt': alt_text}
+    if digest and width:
+        result['placeholder'] = placeholder
+        result['variants'] = {
+            variant: {
+                'width': variant_width,
+                'jpg': images.variant_url(digest, variant, 'jpg'),
+                'webp': images.variant_url(digest, variant, 'webp'),
+            }
+            for variant, variant_width in imaging.variant_widths(width).items()
+        }
+    return result
+
+
+def json_response(request, payload, status=200):
+    response = HttpResponse(orjson.dumps(payload), content_type='application/json', status=status)
+    if status != 200:
+        return response
+    set_response_etag(response)
+    # Answers 304 (no body) when If-None-Match carries this ETag.
+    return get_conditional_response(request, etag=response['ETag'], response=response)
+
+
+def error_response(message, status=400):
+    return JsonResponse({'error': message}, status=status)
+
+
+def _limit(params):
+    try:
+        limit = int(params.get('limit', DEFAULT_LIMIT))
+    except ValueError:
+        return None
+    return limit if 1 <= limit <= MAX_LIMIT else None
+
+
+def invalid_filters(search):
+    return error_response(f"Invalid value(s) for: {', '.join(search.invalid)}")
+
+
+# --------------------------------
+# Endpoints
+# --------------------------------
+@query_budget(3)
+def property_list(request):
+    """Filtered, sorted properties; ``next`` is the cursor for the following page"""
+    limit = _limit(request.GET)
+    if limit is None:
+        return error_response(f"limit must be between 1 and {MAX_LIMIT}")
+    try:
+        names = parse_fields(request.GET, PROPERTY_FIELDS, LIST_FIELDS)
+    except InvalidFields as exc:
+        return error_response(str(exc))
+
+    columns, to_dict = row_serializer(names, PROPERTY_FIELDS)
+    search = PropertySearch(request.GET, page_size=limit)
+    if search.invalid:
+        return invalid_filters(search)
+    try:
+        page = search.value_page(columns, request.GET.get('cursor'))
+    except InvalidCursor:
+        return error_response("Invalid cursor")
+    return json_response(request, {
+        'results': [to_dict(row) for row in page],
+        'next': page.next_cursor,
+    })
+
+
+@query_budget(5)
+async def property_detail(request, pk):
+    """One listed property with its images and features"""
+    available = [*PROPERTY_FIELDS, *DETAIL_EXTRAS]
+    try:
+        names = parse_fields(request.GET, available, available)
+    except InvalidFields as exc:
+        return error_response(str(exc))
+
+    columns, to_dict = row_serializer([name for name in names if name in PROPERTY_FIELDS] or ['id'], PROPERTY_FIELDS)
+    row = await Property.objects.filter(pk=pk).exclude(status='inactive').values_list(*columns).afirst()
+    if row is None:
+        return error_response("Not found", status=404)
+    result = to_dict(row)
+    if 'images' in names:
+        result['images'] = [
+            image_dict(*image) async for image in
+            PropertyImage.objects.filter(property_id=pk).order_by('pk')
+            .values_list('image', 'alt_text', 'image_hash', 'image_placeholder', 'image_width')
+        ]
+    if 'features' in names:
+        result['features'] = [
+            feature async for feature in
+            PropertyFeature.objects.filter(property_id=pk).order_by('pk').values_list('feature', flat=True)
+        ]
+    return json_response(request, result)
+
+
+@query_budget(4)
+def vendor_detail(request, pk):
+    """A vendor's public profile and live listing count"""
+    columns, to_dict = row_serializer(list(VENDOR_FIELDS), VENDOR_FIELDS)
+    row = VendorProfile.objects.filter(pk=pk).values_list(*columns).first()
+    if row is None:
+        return error_response("Not found", status=404)
+    result = to_dict(row)
+    result['active_listings'] = (
+        VendorStatusRollup.objects.filter(vendor_id=pk, status='available')
+        .values_list('listing_count', flat=True).first() or 0
+    )
+    return json_response(request, result)
+
+
+@query_budget(9)
+def facets(request):
+    """Counts per value for each filter dimension, honouring the other filters"""
+    search = PropertySearch(request.GET)
+    if search.invalid:
+        return invalid_filters(search)
+    return json_response(request, search.facets())
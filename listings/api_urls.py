@@ -0,0 +1,9 @@
+from django.urls import path
+from . import api
+
+urlpatterns = [
+    path("properties", api.property_list, name="api_property_list"),
+    path("properties/<int:pk>", api.property_detail, name="api_property_detail"),
+    path("properties/facets", api.facets, name="api_property_facets"),
+    path("vendors/<int:pk>", api.vendor_detail, name="api_vendor_detail"),
+]
@@ -0,0 +1,59 @@
+"""Property detail pages, with the property's HTML cached per listing.
+
+A cache miss loads the property, its vendor and the vendor's user in one
+query, plus one query each for the images and the features, however many
+there are. The rendered body is cached under the property's pk and the
+deploy's ``fragment_version``. Signals drop it (after the transaction
+commits) whenever the property, one of its images or one of its features
+is saved or deleted, or an image's responsive variants finish building.
+Edits to the vendor's own profile show up once ``CACHE_SECONDS`` expire.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Prefetch
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+from accounts.models import Property, PropertyFeature, PropertyImage
+from estates.context_processors import fragment_version
+
+
+CACHE_SECONDS = getattr(settings, 'PROPERTY_DETAIL_CACHE_SECONDS', 10 * 60)
+
+
+def cache_key(pk):
+    return f"property_detail:{fragment_version()}:{pk}"
+
+
+def forget(*pks):
+    cache.delete_many([cache_key(pk) for pk in pks])
+
+
+def detail_queryset():
+    """Listed properties with everything the detail page shows, in three queries"""
+    return (
+        Property.objects
+        .exclude(status='inactive')
+        .select_related('vendor__user')
+        .prefetch_related(
+            Prefetch('images', queryset=PropertyImage.objects.order_by('pk')),
+            Prefetch('features', queryset=PropertyFeature.objects.order_by('pk')),
+        )
+    )
+
+
+def render_body(property_obj):
+    return render_to_string('property_detail_body.html', {'property': property_obj})
+
+
+async def abody(pk):
+    """The property's rendered body HTML, or ``None`` if it is not listed"""
+    key = cache_key(pk)
+    body = await cache.aget(key)
+    if body is None:
+        property_obj = await detail_queryset().filter(pk=pk).afirst()
+        if property_obj is None:
+            return None
+        body = render_body(property_obj)
+        await cache.aset(key, body, CACHE_SECONDS)
+    return mark_safe(body)
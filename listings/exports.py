@@ -0,0 +1,198 @@
+"""Streaming CSV / JSON Lines exports of properties and users.
+
+Rows are pulled with ``QuerySet.iterator(chunk_size=...)`` so only one chunk
+is in memory at a time; ``prefetch_related`` lookups are resolved per chunk.
+The rows are written straight into a ``StreamingHttpResponse`` (or a file
+for the management command), never into one big string.
+
+Text cells in CSV that a spreadsheet would read as a formula (leading ``=``,
+``+``, ``-``, ``@``, tab or carriage return) are prefixed with ``'``;
+titles, addresses and descriptions come from vendors.
+
+Filter parameters mirror ``PropertyAdmin.list_filter`` / ``CustomUserAdmin.list_filter``.
+"""
+import csv
+import json
+from datetime import datetime, time
+
+from django.db.models import Q
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from accounts.models import CustomUser, Property
+
+
+CHUNK_SIZE = 1000
+FORMATS = ('csv', 'jsonl')
+CONTENT_TYPES = {
+    'csv': 'text/csv; charset=utf-8',
+    'jsonl': 'application/x-ndjson; charset=utf-8',
+}
+LIST_SEPARATOR = '|'
+FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+PROPERTY_CHOICE_FILTERS = ('property_type', 'listing_type', 'status')
+PROPERTY_FLAG_FILTERS = ('is_featured', 'is_verified')
+USER_CHOICE_FILTERS = ('role',)
+USER_FLAG_FILTERS = ('is_active',)
+
+PROPERTY_COLUMNS = [
+    ('id', lambda p: p.pk),
+    ('title', lambda p: p.title),
+    ('description', lambda p: p.description),
+    ('property_type', lambda p: p.property_type),
+    ('listing_type', lambda p: p.listing_type),
+    ('status', lambda p: p.status),
+    ('address', lambda p: p.address),
+    ('city', lambda p: p.city),
+    ('state', lambda p: p.state),
+    ('price', lambda p: str(p.price)),
+    ('currency', lambda p: p.currency),
+    ('bedrooms', lambda p: p.bedrooms),
+    ('bathrooms', lambda p: p.bathrooms),
+    ('square_footage', lambda p: p.square_footage),
+    ('year_built', lambda p: p.year_built),
+    ('is_featured', lambda p: p.is_featured),
+    ('is_verified', lambda p: p.is_verified),
+    ('views_count', lambda p: p.views_count),
+    ('created_at', lambda p: p.created_at.isoformat()),
+    ('vendor_email', lambda p: p.vendor.user.email),
+    ('vendor_company', lambda p: p.vendor.company_name or ''),
+    ('images', lambda p: [image.image.url for image in p.images.all()]),
+    ('features', lambda p: [feature.feature for feature in p.features.all()]),
+]
+
+USER_COLUMNS = [
+    ('id', lambda u: str(u.pk)),
+    ('email', lambda u: u.email),
+    ('username', lambda u: u.username),
+    ('first_name', lambda u: u.first_name),
+    ('last_name', lambda u: u.last_name),
+    ('phone_number', lambda u: u.phone_number or ''),
+    ('role', lambda u: u.role),
+    ('is_active', lambda u: u.is_active),
+    ('is_staff', lambda u: u.is_staff),
+    ('created_at', lambda u: u.created_at.isoformat()),
+    ('last_login', lambda u: u.last_login.isoformat() if u.last_login else None),
+]
+
+
+class InvalidFilter(ValueError):
+    pass
+
+
+# --------------------------------
+# Filters
+# --------------------------------
+def _flag(name, value):
+    value = value.lower()
+    if value in ('1', 'true', 'yes'):
+        return True
+    if value in ('0', 'false', 'no'):
+        return False
+    raise InvalidFilter(f"{name} must be true or false")
+
+
+def _moment(name, value):
+    moment = parse_datetime(value) or parse_date(value)
+    if moment is None:
+        raise InvalidFilter(f"{name} must be a date (YYYY-MM-DD) or datetime")
+    if not isinstance(moment, datetime):
+        moment = datetime.combine(moment, time.min)
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return moment
+
+
+def _choice(model, name, value):
+    choices = {key for key, _ in model._meta.get_field(name).choices}
+    if value not in choices:
+        raise InvalidFilter(f"{name} must be one of {', '.join(sorted(choices))}")
+    return value
+
+
+def _filters(model, params, choice_fields, flag_fields):
+    q = Q()
+    for name in choice_fields:
+        if params.get(name):
+            q &= Q(**{name: _choice(model, name, params[name])})
+    for name in flag_fields:
+        if params.get(name):
+            q &= Q(**{name: _flag(name, params[name])})
+    # Same lookups the admin's created_at date filter puts in the query string.
+    if params.get('created_at__gte'):
+        q &= Q(created_at__gte=_moment('created_at__gte', params['created_at__gte']))
+    if params.get('created_at__lt'):
+        q &= Q(created_at__lt=_moment('created_at__lt', params['created_at__lt']))
+    return q
+
+
+def property_queryset(params, vendor=None):
+    """Properties matching ``params``, limited to ``vendor``'s listings when given"""
+    queryset = Property.objects.filter(
+        _filters(Property, params, PROPERTY_CHOICE_FILTERS, PROPERTY_FLAG_FILTERS)
+    )
+    if vendor is not None:
+        queryset = queryset.filter(vendor=vendor)
+    return (
+        queryset.select_related('vendor__user')
+        .prefetch_related('images', 'features')
+        .order_by('pk')
+    )
+
+
+def user_queryset(params):
+    return CustomUser.objects.filter(
+        _filters(CustomUser, params, USER_CHOICE_FILTERS, USER_FLAG_FILTERS)
+    ).order_by('created_at')
+
+
+# --------------------------------
+# Serialisation
+# --------------------------------
+def iter_rows(queryset, columns, chunk_size=CHUNK_SIZE):
+    """Yield one dict per object, fetching ``chunk_size`` rows (and their prefetches) at a time"""
+    for obj in queryset.iterator(chunk_size=chunk_size):
+        yield {name: getter(obj) for name, getter in columns}
+
+
+class _Echo:
+    """File-like object whose ``write`` hands the line back to the csv writer's caller"""
+    def write(self, value):
+        return value
+
+
+def csv_cell(value):
+    if isinstance(value, list):
+        value = LIST_SEPARATOR.join(value)
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+
+def iter_csv(rows, columns):
+    writer = csv.writer(_Echo())
+    yield writer.writerow([name for name, _ in columns])
+    for row in rows:
+        yield writer.writerow([csv_cell(value) for value in row.values()])
+
+
+def iter_jsonl(rows):
+    for row in rows:
+        yield json.dumps(row, ensure_ascii=False) + '\n'
+
+
+def iter_export(queryset, columns, fmt, chunk_size=CHUNK_SIZE):
+    rows = iter_rows(queryset, columns, chunk_size)
+    if fmt == 'csv':
+        return iter_csv(rows, columns)
+    return iter_jsonl(rows)
+
+
+def streaming_response(queryset, columns, fmt, filename):
+    response = StreamingHttpResponse(
+        iter_export(queryset, columns, fmt), content_type=CONTENT_TYPES[fmt]
+    )
+    response['Content-Disposition'] = f'attachment; filename="{filename}.{fmt}"'
+    return response
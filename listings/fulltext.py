@@ -0,0 +1,143 @@
+"""SQLite FTS5 keyword index over Property text columns.
+
+The index is an external-content FTS5 table that reads its rows from
+``accounts_property`` and is kept in sync by triggers, so inserts, updates
+and deletes (including ``bulk_create`` and ``QuerySet.update``) never
+need application code to touch it.
+"""
+import re
+
+from django.db import connection
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+
+
+FTS_TABLE = 'listings_property_fts'
+PROPERTY_TABLE = 'accounts_property'
+COLUMNS = ('title', 'description', 'address', 'city', 'state')
+
+# BM25 column weights, in COLUMNS order: a title hit outranks a description hit.
+RANK = 'bm25(10.0, 1.0, 2.0, 4.0, 2.0)'
+
+SNIPPET_COLUMN = COLUMNS.index('description')
+SNIPPET_TOKENS = 24
+
+# Control characters survive escaping and are swapped for <mark> afterwards.
+_MARK_OPEN, _MARK_CLOSE = '\x02', '\x03'
+
+_TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def is_supported(conn=connection):
+    return conn.vendor == 'sqlite'
+
+
+def install(conn=connection):
+    """Create the FTS table and sync triggers if they are missing.
+
+    Safe to run repeatedly. SQLite table rebuilds during migrations drop
+    triggers on ``accounts_property``, so this also runs after every migrate.
+    """
+    if not is_supported(conn):
+        return
+    cols = ', '.join(COLUMNS)
+    new_cols = ', '.join(f'new.{c}' for c in COLUMNS)
+    old_cols = ', '.join(f'old.{c}' for c in COLUMNS)
+    with conn.cursor() as cursor:
+        cursor.execute(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+            f"{cols}, content='{PROPERTY_TABLE}', content_rowid='id', "
+            f"tokenize='porter unicode61 remove_diacritics 2', prefix='2 3')"
+        )
+        cursor.execute(
+            f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON {PROPERTY_TABLE} BEGIN "
+            f"INSERT INTO {FTS_TABLE}(rowid, {cols}) VALUES (new.id, {new_cols}); END"
+        )
+        cursor.execute(
+            f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON {PROPERTY_TABLE} BEGIN "
+            f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, {cols}) VALUES ('delete', old.id, {old_cols}); END"
+        )
+        # Only reindex when a text column changes, not on views_count bumps.
+        cursor.execute(
+            f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au AFTER UPDATE OF {cols} ON {PROPERTY_TABLE} BEGIN "
+            f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, {cols}) VALUES ('delete', old.id, {old_cols}); "
+            f"INSERT INTO {FTS_TABLE}(rowid, {cols}) VALUES (new.id, {new_cols}); END"
+        )
+        cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rank) VALUES ('rank', %s)", [RANK])
+
+
+def rebuild(conn=connection):
+    """Repopulate the whole index from ``accounts_property`` in one pass"""
+    with conn.cursor() as cursor:
+        cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+
+
+def optimize(conn=connection):
+    """Merge index segments so queries touch a single b-tree"""
+    with conn.cursor() as cursor:
+        cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('optimize')")
+
+
+def match_expression(text):
+    """Build a safe FTS5 query: every word must match, last word as a prefix"""
+    tokens = _TOKEN_RE.findall(text or '')
+    if not tokens:
+        return None
+    terms = [f'"{token}"' for token in tokens]
+    terms[-1] += '*'
+    return ' '.join(terms)
+
+
+def matching_q(text):
+    """Q object restricting a Property queryset to keyword matches"""
+    expression = match_expression(text)
+    if expression is None:
+        return Q()
+    if not is_supported():
+        words = _TOKEN_RE.findall(text)
+        q = Q()
+        for word in words:
+            q &= Q(title__icontains=word) | Q(description__icontains=word) | Q(address__icontains=word)
+        return q
+    return Q(pk__in=RawSQL(
+        f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s', [expression]
+    ))
+
+
+def ranked(queryset, text, after=None):
+    """Join ``queryset`` to the index, adding ``search_rank`` and ``search_snippet``.
+
+    ``after`` is a ``(rank, pk)`` pair to seek past for keyset pagination.
+    """
+    expression = match_expression(text)
+    where = [f'{FTS_TABLE}.rowid = {PROPERTY_TABLE}.id', f'{FTS_TABLE} MATCH %s']
+    params = [expression]
+    if after is not None:
+        rank, pk = after
+        where.append(
+            f'({FTS_TABLE}.rank > %s OR ({FTS_TABLE}.rank = %s AND {PROPERTY_TABLE}.id > %s))'
+        )
+        params += [rank, rank, pk]
+    return queryset.extra(
+        select={
+            'search_rank': f'{FTS_TABLE}.rank',
+            'search_snippet': (
+                f"snippet({FTS_TABLE}, {SNIPPET_COLUMN}, '{_MARK_OPEN}', '{_MARK_CLOSE}', "
+                f"'…', {SNIPPET_TOKENS})"
+            ),
+        },
+        tables=[FTS_TABLE],
+        where=where,
+        params=params,
+    )
+
+
+def highlight(snippet):
+    """Escape a raw snippet and wrap matched terms in <mark>"""
+    if not snippet:
+        return ''
+    html = escape(snippet).replace(_MARK_OPEN, '<mark>').replace(_MARK_CLOSE, '</mark>')
+    return mark_safe(html)
+
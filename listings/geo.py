@@ -0,0 +1,168 @@
+"""Radius and bounding-box property search on plain SQLite.
+
+Every Property with coordinates stores a geohash of them in an indexed
+column. A query first covers its bounding box with a handful of geohash
+cells and turns each cell into an index range scan
+(``cell <= geohash < cell + '~'``), then narrows to the exact box on
+latitude/longitude, and finally computes the haversine distance in SQL
+for the few rows left so the database filters, sorts and slices by true
+distance. Boxes that cross the antimeridian are split into one box per side.
+"""
+import math
+
+from django.db.models import F, FloatField, Q, Value
+from django.db.models.functions import ASin, Cos, Least, Power, Radians, Sin, Sqrt
+
+
+BASE32 = '0123456789bcdefghjkmnpqrstuvwxyz'
+PRECISION = 9             # stored precision, cells of about 4.8m x 4.8m
+MAX_COVER_CELLS = 16      # coarsen the cover until it needs at most this many cells
+EARTH_RADIUS_KM = 6371.0088
+# Sorts after every base32 character, so ``prefix + RANGE_END`` bounds all hashes under prefix.
+RANGE_END = '~'
+
+
+# --------------------------------
+# Geohash
+# --------------------------------
+def encode(latitude, longitude, precision=PRECISION):
+    lat_range, lng_range = [-90.0, 90.0], [-180.0, 180.0]
+    chars, bits, bit_count, even = [], 0, 0, True
+    while len(chars) < precision:
+        interval, value = (lng_range, longitude) if even else (lat_range, latitude)
+        mid = (interval[0] + interval[1]) / 2
+        bits <<= 1
+        if value >= mid:
+            bits |= 1
+            interval[0] = mid
+        else:
+            interval[1] = mid
+        even = not even
+        bit_count += 1
+        if bit_count == 5:
+            chars.append(BASE32[bits])
+            bits, bit_count = 0, 0
+    return ''.join(chars)
+
+
+def cell_size(precision):
+    """``(height, width)`` of a cell in degrees"""
+    lng_bits = math.ceil(precision * 5 / 2)
+    lat_bits = precision * 5 // 2
+    return 180.0 / 2 ** lat_bits, 360.0 / 2 ** lng_bits
+
+
+def cover(south, west, north, east, max_cells=MAX_COVER_CELLS):
+    """Geohash cells (as prefixes) that together contain the box"""
+    for precision in range(PRECISION, 0, -1):
+        height, width = cell_size(precision)
+        estimate = (math.ceil((north - south) / height) + 1) * (math.ceil((east - west) / width) + 1)
+        if estimate <= max_cells:
+            break
+
+    height, width = cell_size(precision)
+    cells = set()
+    lat = south
+    while True:
+        lng = west
+        while True:
+            cells.add(encode(lat, lng, precision))
+            if lng >= east:
+                break
+            lng = min(lng + width, east)
+        if lat >= north:
+            break
+        lat = min(lat + height, north)
+    return sorted(cells)
+
+
+# --------------------------------
+# Distance
+# --------------------------------
+def haversine_km(lat1, lng1, lat2, lng2):
+    lat1, lng1, lat2, lng2 = map(math.radians, (lat1, lng1, lat2, lng2))
+    a = (math.sin((lat2 - lat1) / 2) ** 2
+         + math.cos(lat1) * math.cos(lat2) * math.sin((lng2 - lng1) / 2) ** 2)
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def bounding_box(latitude, longitude, radius_km):
+    """``(south, west, north, east)`` enclosing the circle
+
+    Latitudes are clamped to the poles; longitudes are not wrapped, so
+    west < -180 or east > 180 means the box crosses the antimeridian
+    (see ``split_box``).
+    """
+    lat_delta = math.degrees(radius_km / EARTH_RADIUS_KM)
+    south, north = latitude - lat_delta, latitude + lat_delta
+    cos_lat = math.cos(math.radians(latitude))
+    if south <= -90.0 or north >= 90.0 or cos_lat < 1e-9 or lat_delta >= 180.0 * cos_lat:
+        # The circle contains a pole (or wraps all the way round): every longitude.
+        return max(-90.0, south), -180.0, min(90.0, north), 180.0
+    lng_delta = lat_delta / cos_lat
+    return south, longitude - lng_delta, north, longitude + lng_delta
+
+
+def split_box(south, west, north, east):
+    """Boxes within -180..180 covering the given one
+
+    A box crossing the antimeridian is given either as west > east (a map
+    viewport) or with a longitude beyond +-180 (``bounding_box``).
+    """
+    if west > east:
+        return [(south, west, north, 180.0), (south, -180.0, north, east)]
+    if west < -180.0:
+        return [(south, west + 360.0, north, 180.0), (south, -180.0, north, east)]
+    if east > 180.0:
+        return [(south, west, north, 180.0), (south, -180.0, north, east - 360.0)]
+    return [(south, west, north, east)]
+
+
+# --------------------------------
+# Queries
+# --------------------------------
+def box_q(south, west, north, east):
+    """Index-backed cell ranges AND'ed with the exact coordinate box"""
+    cells = cover(south, west, north, east)
+    ranges = Q()
+    for cell in cells:
+        ranges |= Q(geohash__gte=cell, geohash__lt=cell + RANGE_END)
+    # The enclosing range lets SQLite seek the (status, geohash) index even
+    # without ANALYZE statistics; with them it may use one seek per cell instead.
+    enclosing = Q(geohash__gte=cells[0], geohash__lt=cells[-1] + RANGE_END)
+    return enclosing & ranges & Q(latitude__range=(south, north), longitude__range=(west, east))
+
+
+def boxes_q(south, west, north, east):
+    """``box_q`` OR'ed over each side of a box that may cross the antimeridian"""
+    q = Q()
+    for box in split_box(south, west, north, east):
+        q |= box_q(*box)
+    return q
+
+
+def distance_km(latitude, longitude):
+    """Haversine distance from the point to each row, as a query expression"""
+    def half_sin_squared(field, degrees):
+        return Power(Sin((Radians(field) - math.radians(degrees)) / 2), 2)
+
+    a = (half_sin_squared(F('latitude'), latitude)
+         + Cos(Radians(F('latitude'))) * math.cos(math.radians(latitude))
+         * half_sin_squared(F('longitude'), longitude))
+    return Value(2 * EARTH_RADIUS_KM) * ASin(Least(Sqrt(a), Value(1.0)), output_field=FloatField())
+
+
+def in_bounds(queryset, south, west, north, east):
+    """Properties inside a map viewport; west > east wraps across the antimeridian"""
+    return queryset.filter(boxes_q(south, west, north, east))
+
+
+def nearby(queryset, latitude, longitude, radius_km, limit=None):
+    """Properties within ``radius_km``, nearest first, each with a ``distance_km`` attribute"""
+    queryset = (
+        queryset.filter(boxes_q(*bounding_box(latitude, longitude, radius_km)))
+        .annotate(distance_km=distance_km(latitude, longitude))
+        .filter(distance_km__lte=radius_km)
+        .order_by('distance_km', 'pk')
+    )
+    return list(queryset[:limit] if limit else queryset)
@@ -0,0 +1,162 @@
+"""Streaming bulk import of properties from CSV or JSON Lines.
+
+Rows are read lazily, validated against ``PropertyForm`` in chunks and
+written with ``bulk_create`` one transaction per chunk, so memory use is
+bounded by the chunk size rather than the file size. Invalid rows are
+reported through an ``on_error(row_number, errors)`` callback and skipped.
+
+A row may carry a ``features`` column: a ``|``-separated string in CSV or a
+list of strings in JSONL. A file that stops decoding as UTF-8 (or as CSV)
+is reported as an error on the row where it broke; rows before it are
+still imported.
+"""
+import csv
+import io
+import json
+from itertools import islice
+
+from django.db import transaction
+
+from accounts.forms import PropertyForm
+from accounts.models import Property, PropertyFeature
+from . import alerts, matching, rollups, trends
+
+
+CHUNK_SIZE = 500
+FORMATS = ('csv', 'jsonl')
+FEATURE_SEPARATOR = '|'
+
+
+class ImportResult:
+    def __init__(self):
+        self.created = 0
+        self.failed = 0
+
+    @property
+    def total(self):
+        return self.created + self.failed
+
+
+def detect_format(filename):
+    name = (filename or '').lower()
+    if name.endswith('.csv'):
+        return 'csv'
+    if name.endswith(('.jsonl', '.ndjson')):
+        return 'jsonl'
+    return None
+
+
+def _text_stream(stream):
+    if isinstance(stream, io.TextIOBase):
+        return stream
+    return io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+
+
+def iter_records(stream, fmt):
+    """Yield ``(row_number, record)``; a record is a dict or the error that spoiled it"""
+    text = _text_stream(stream)
+    records = _csv_records(text) if fmt == 'csv' else _jsonl_records(text)
+    # The row before the first one, should the file break straight away.
+    row_number = 1 if fmt == 'csv' else 0
+    try:
+        for row_number, record in records:
+            yield row_number, record
+    except UnicodeDecodeError as exc:
+        yield row_number + 1, ValueError(
+            f"The file is not UTF-8 text ({exc.reason}); this row and the rest of the file were skipped."
+        )
+    except csv.Error as exc:
+        yield row_number + 1, ValueError(
+            f"Malformed CSV ({exc}); this row and the rest of the file were skipped."
+        )
+
+
+def _csv_records(text):
+    # Row 1 is the header, so data rows are numbered as they appear in a spreadsheet.
+    yield from enumerate(csv.DictReader(text), start=2)
+
+
+def _jsonl_records(text):
+    for row_number, line in enumerate(text, start=1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as exc:
+            yield row_number, exc
+            continue
+        if not isinstance(record, dict):
+            record = ValueError("Each line must be a JSON object.")
+        yield row_number, record
+
+
+def _features(record):
+    """The row's feature names; raises ``ValueError`` if ``features`` has the wrong shape"""
+    value = record.get('features') or []
+    if isinstance(value, str):
+        value = value.split(FEATURE_SEPARATOR)
+    elif not isinstance(value, list) or not all(isinstance(feature, str) for feature in value):
+        raise ValueError(f"Expected a list of strings or a '{FEATURE_SEPARATOR}'-separated string.")
+    return [feature.strip()[:100] for feature in value if feature.strip()]
+
+
+def _chunks(iterable, size):
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+def import_properties(stream, vendor, fmt, chunk_size=CHUNK_SIZE, on_error=None):
+    """Import every valid row of ``stream`` as a Property owned by ``vendor``"""
+    result = ImportResult()
+    for chunk in _chunks(iter_records(stream, fmt), chunk_size):
+        properties, features = [], []
+        for row_number, record in chunk:
+            if isinstance(record, Exception):
+                result.failed += 1
+                if on_error:
+                    on_error(row_number, {'__all__': [str(record)]})
+                continue
+
+            form = PropertyForm(data=record)
+            errors = {} if form.is_valid() else dict(form.errors)
+            try:
+                names = _features(record)
+            except ValueError as exc:
+                errors['features'] = [str(exc)]
+            if errors:
+                result.failed += 1
+                if on_error:
+                    on_error(row_number, errors)
+                continue
+
+            property_obj = form.save(commit=False)
+            property_obj.vendor = vendor
+            # bulk_create skips save(), which normally derives the geohash
+            property_obj.update_geohash()
+            properties.append(property_obj)
+            features.append(names)
+
+        if not properties:
+            continue
+        with transaction.atomic():
+            Property.objects.bulk_create(properties)
+            PropertyFeature.objects.bulk_create(
+                PropertyFeature(property=property_obj, feature=feature)
+                for property_obj, names in zip(properties, features)
+                for feature in names
+            )
+            rollups.properties_created(properties)
+            trends.record_history(properties)
+        for property_obj in properties:
+            matching.engine.property_saved(property_obj)
+        alerts.index.properties_saved(properties)
+        result.created += len(properties)
+    return result
+
+
+def error_rows(row_number, errors):
+    """Flatten a form's errors into ``(row, field, message)`` report lines"""
+    for field, messages in errors.items():
+        for message in messages:
+            yield row_number, field, message
@@ -0,0 +1,21 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from listings import trends
+
+
+class Command(BaseCommand):
+    help = "Materialize weekly asking-price percentiles per city, property type and listing type"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--weeks', type=int, default=trends.RECOMPUTE_WEEKS,
+                            help="Recompute this many most recent weeks (older weeks do not change)")
+        parser.add_argument('--full', action='store_true', help="Recompute all of history")
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        written = trends.compute_trends(weeks=None if options['full'] else options['weeks'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Wrote {written} trend row(s) in {time.perf_counter() - started:.2f}s"
+        ))
@@ -0,0 +1,53 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from accounts.models import VendorProfile
+from listings import exports
+
+
+class Command(BaseCommand):
+    help = "Stream properties or users to a CSV or JSONL file"
+
+    def add_arguments(self, parser):
+        parser.add_argument('model', choices=('properties', 'users'))
+        parser.add_argument('--format', choices=exports.FORMATS, default='csv')
+        parser.add_argument('--output', '-o', default='-', help="Output file, or - for stdout")
+        parser.add_argument('--vendor', help="Only export this vendor's properties (email)")
+        parser.add_argument('--chunk-size', type=int, default=exports.CHUNK_SIZE)
+        parser.add_argument(
+            '--filter', action='append', default=[], metavar='FIELD=VALUE',
+            help="Admin list_filter style filter, e.g. status=available or created_at__gte=2025-01-01",
+        )
+
+    def handle(self, *args, **options):
+        params = {}
+        for item in options['filter']:
+            field, sep, value = item.partition('=')
+            if not sep:
+                raise CommandError(f"Filters look like FIELD=VALUE, got {item!r}")
+            params[field] = value
+
+        try:
+            if options['model'] == 'properties':
+                vendor = None
+                if options['vendor']:
+                    try:
+                        vendor = VendorProfile.objects.get(user__email=options['vendor'])
+                    except VendorProfile.DoesNotExist:
+                        raise CommandError(f"No vendor profile for {options['vendor']}")
+                queryset = exports.property_queryset(params, vendor=vendor)
+                columns = exports.PROPERTY_COLUMNS
+            else:
+                queryset = exports.user_queryset(params)
+                columns = exports.USER_COLUMNS
+        except exports.InvalidFilter as exc:
+            raise CommandError(str(exc))
+
+        chunks = exports.iter_export(queryset, columns, options['format'], options['chunk_size'])
+        if options['output'] == '-':
+            sys.stdout.writelines(chunks)
+            return
+        with open(options['output'], 'w', encoding='utf-8', newline='') as output:
+            output.writelines(chunks)
+        self.stderr.write(self.style.SUCCESS(f"Wrote {options['output']}"))
@@ -0,0 +1,58 @@
+import csv
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from accounts.models import VendorProfile
+from listings import importer
+
+
+class Command(BaseCommand):
+    help = "Stream properties from a CSV or JSONL file into a vendor's listings"
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="CSV or JSONL file, or - for stdin")
+        parser.add_argument('--vendor', required=True, help="Email of the vendor who will own the listings")
+        parser.add_argument('--format', choices=importer.FORMATS)
+        parser.add_argument('--chunk-size', type=int, default=importer.CHUNK_SIZE)
+        parser.add_argument('--errors', help="Write a per-row error report (CSV) to this path")
+
+    def handle(self, *args, **options):
+        try:
+            vendor = VendorProfile.objects.get(user__email=options['vendor'])
+        except VendorProfile.DoesNotExist:
+            raise CommandError(f"No vendor profile for {options['vendor']}")
+
+        fmt = options['format'] or importer.detect_format(options['path'])
+        if fmt is None:
+            raise CommandError("Cannot tell the file format; pass --format csv or --format jsonl")
+
+        report = open(options['errors'], 'w', newline='') if options['errors'] else None
+        writer = csv.writer(report) if report else None
+        if writer:
+            writer.writerow(['row', 'field', 'error'])
+
+        def on_error(row_number, errors):
+            for line in importer.error_rows(row_number, errors):
+                if writer:
+                    writer.writerow(line)
+                else:
+                    self.stderr.write("row {}: {}: {}".format(*line))
+
+        try:
+            if options['path'] == '-':
+                result = importer.import_properties(
+                    sys.stdin.buffer, vendor, fmt, options['chunk_size'], on_error
+                )
+            else:
+                with open(options['path'], 'rb') as stream:
+                    result = importer.import_properties(
+                        stream, vendor, fmt, options['chunk_size'], on_error
+                    )
+        finally:
+            if report:
+                report.close()
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {result.created} of {result.total} row(s); {result.failed} rejected"
+        ))
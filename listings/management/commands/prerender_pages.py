@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from listings import prerender
+
+
+class Command(BaseCommand):
+    help = "Pre-render the static marketing pages to HTML served by PrerenderedPageMiddleware"
+
+    def handle(self, *args, **options):
+        for path in prerender.build():
+            self.stdout.write(f"Wrote {path}")
+        self.stdout.write(self.style.SUCCESS(f"Pre-rendered {len(prerender.PAGES)} page(s)"))
@@ -0,0 +1,35 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from listings import fulltext
+
+
+class Command(BaseCommand):
+    help = "Rebuild the FTS5 keyword index over all properties in one bulk pass"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--no-optimize', action='store_true',
+            help="Skip merging index segments after the rebuild",
+        )
+
+    def handle(self, *args, **options):
+        if not fulltext.is_supported():
+            raise CommandError("Keyword search index requires the SQLite backend.")
+
+        started = time.perf_counter()
+        with transaction.atomic():
+            fulltext.install()
+            fulltext.rebuild()
+        if not options['no_optimize']:
+            fulltext.optimize()
+
+        with connection.cursor() as cursor:
+            cursor.execute(f"SELECT count(*) FROM {fulltext.FTS_TABLE}")
+            total = cursor.fetchone()[0]
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"Indexed {total} properties in {elapsed:.2f}s"
+        ))
@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand
+
+from listings import rollups
+
+
+class Command(BaseCommand):
+    help = "Backfill vendor analytics rollups, or report and repair drift from Property"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--vendor', type=int, action='append', dest='vendors',
+                            help="Limit to this VendorProfile id (repeatable)")
+        parser.add_argument('--check', action='store_true',
+                            help="Only report rows that differ from a fresh aggregate")
+
+    def handle(self, *args, **options):
+        vendor_ids = options['vendors']
+        expected_status, expected_daily = rollups.expected_rollups(vendor_ids)
+        current_status, current_daily = rollups.current_rollups(vendor_ids)
+
+        drift = 0
+        for key in sorted(set(expected_status) | set(current_status), key=str):
+            if expected_status.get(key) != current_status.get(key):
+                drift += 1
+                self.stdout.write(f"status {key}: have {current_status.get(key)}, expected {expected_status.get(key)}")
+        for key in sorted(set(expected_daily) | set(current_daily), key=str):
+            if expected_daily.get(key) != current_daily.get(key):
+                drift += 1
+                self.stdout.write(f"daily {key}: have {current_daily.get(key)}, expected {expected_daily.get(key)}")
+
+        if options['check']:
+            self.stdout.write(f"{drift} rollup row(s) out of date")
+            return
+        if drift:
+            status_count, daily_count = rollups.rebuild(vendor_ids)
+            self.stdout.write(self.style.SUCCESS(
+                f"Rebuilt {status_count} status and {daily_count} daily rollup row(s)"
+            ))
+        else:
+            self.stdout.write(self.style.SUCCESS("Rollups are up to date"))
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from listings import alerts
+
+
+class Command(BaseCommand):
+    help = "Queue one digest email per customer for new listings matching their saved searches"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--max-listings', type=int, default=alerts.DIGEST_MAX_LISTINGS,
+                            help="Listings shown per saved search in one digest")
+
+    def handle(self, *args, **options):
+        emails, covered = alerts.send_digests(max_listings=options['max_listings'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Queued {emails} digest email(s) covering {covered} alert(s); "
+            "run send_queued_mail to deliver them"
+        ))
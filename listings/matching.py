@@ -0,0 +1,346 @@
+"""Score available listings against a customer's CustomerProfile preferences.
+
+Every available Property is held in a ``ListingMatrix``: one compact NumPy
+column per attribute (price, city, state, type, bedrooms), with text
+values replaced by small integer codes. Scoring a customer is a handful of
+vectorised operations over those columns followed by ``argpartition`` for
+the top results, a few milliseconds for 100k listings.
+
+Each customer's top matches are cached in process. Saving or deleting a
+Property updates its row in place and appends it to a change log; a cached
+list only re-scores the rows changed since it was computed. The matrix is
+reloaded from the database every ``MATCH_REBUILD_INTERVAL`` seconds, which
+picks up writes made by other processes.
+"""
+import logging
+import re
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+from django.conf import settings
+from django.db import connection
+
+from accounts.models import Property
+
+
+logger = logging.getLogger(__name__)
+
+MATCH_LIMIT = getattr(settings, 'MATCH_LIMIT', 50)
+REBUILD_INTERVAL = getattr(settings, 'MATCH_REBUILD_INTERVAL', 300)
+MAX_CACHED_CUSTOMERS = getattr(settings, 'MATCH_MAX_CACHED_CUSTOMERS', 10000)
+CHANGE_LOG_SIZE = 5000
+
+WEIGHTS = {
+    'budget': 0.4,
+    'location': 0.3,
+    'type': 0.15,
+    'size': 0.15,
+}
+OVER_BUDGET_TOLERANCE = 0.25    # 25% above budget_max scores 0
+UNDER_BUDGET_TOLERANCE = 0.5    # 50% below budget_min scores 0
+STATE_MATCH_SCORE = 0.6         # same state, different city
+BEDROOM_SHORTFALL_PENALTY = 0.34
+
+LOAD_FIELDS = ('pk', 'price', 'city', 'state', 'property_type', 'bedrooms')
+
+
+def _key(value):
+    return (value or '').strip().lower()
+
+
+class Preferences:
+    """The parts of a CustomerProfile the matcher scores on"""
+
+    def __init__(self, profile):
+        self.budget_min = float(profile.budget_min) if profile.budget_min is not None else None
+        self.budget_max = float(profile.budget_max) if profile.budget_max is not None else None
+        self.locations = [_key(part) for part in re.split(r'[,/;]', profile.preferred_location or '') if _key(part)]
+        self.property_type = profile.preferred_property_type or ''
+        self.bedrooms = profile.preferred_bedrooms
+
+    @property
+    def is_empty(self):
+        return (self.budget_min is None and self.budget_max is None and not self.locations
+                and not self.property_type and self.bedrooms is None)
+
+
+class ListingMatrix:
+    """Column store of available listings, updatable one row at a time"""
+
+    def __init__(self, capacity=1024):
+        self.size = 0
+        self.rows = {}              # pk -> row index
+        self.free = []              # indexes of removed rows, reused by inserts
+        self.codes = {'city': {}, 'state': {}, 'type': {}}
+        self._allocate(capacity)
+
+    def _allocate(self, capacity):
+        old = getattr(self, 'pk', None)
+        # bedrooms is an unbounded IntegerField, so it gets the full 64 bits.
+        columns = {
+            'pk': np.int64, 'price': np.float64, 'city': np.int32,
+            'state': np.int32, 'type': np.int32, 'bedrooms': np.int64, 'active': np.bool_,
+        }
+        for name, dtype in columns.items():
+            column = np.zeros(capacity, dtype=dtype)
+            if old is not None:
+                column[:self.size] = getattr(self, name)[:self.size]
+            setattr(self, name, column)
+
+    def code(self, kind, value):
+        """Integer code for a city/state/type, assigned on first sight"""
+        table = self.codes[kind]
+        return table.setdefault(_key(value), len(table))
+
+    def upsert(self, pk, price, city, state, property_type, bedrooms):
+        row = self.rows.get(pk)
+        if row is None:
+            if self.free:
+                row = self.free.pop()
+            else:
+                if self.size == len(self.pk):
+                    self._allocate(len(self.pk) * 2)
+                row = self.size
+                self.size += 1
+            self.rows[pk] = row
+        self.pk[row] = pk
+        self.price[row] = float(price)
+        self.city[row] = self.code('city', city)
+        self.state[row] = self.code('state', state)
+        self.type[row] = self.code('type', property_type)
+        self.bedrooms[row] = bedrooms
+        self.active[row] = True
+
+    def remove(self, pk):
+        row = self.rows.pop(pk, None)
+        if row is not None:
+            self.active[row] = False
+            self.free.append(row)
+
+    @classmethod
+    def load(cls, queryset=None):
+        queryset = queryset if queryset is not None else Property.objects.filter(status='available')
+        rows = list(queryset.order_by().values_list(*LOAD_FIELDS))
+        count = len(rows)
+        matrix = cls(capacity=max(1024, count * 5 // 4))
+        if not count:
+            return matrix
+        pks, prices, cities, states, types, bedrooms = zip(*rows)
+        matrix.pk[:count] = pks
+        matrix.price[:count] = np.array(prices, dtype=np.float64)
+        matrix.city[:count] = [matrix.code('city', city) for city in cities]
+        matrix.state[:count] = [matrix.code('state', state) for state in states]
+        matrix.type[:count] = [matrix.code('type', property_type) for property_type in types]
+        matrix.bedrooms[:count] = bedrooms
+        matrix.active[:count] = True
+        matrix.rows = dict(zip(pks, range(count)))
+        matrix.size = count
+        return matrix
+
+    # --------------------------------
+    # Scoring
+    # --------------------------------
+    def scores(self, prefs, rows=None):
+        """Score ``rows`` (default: every row) for ``prefs``; inactive rows score 0"""
+        rows = slice(0, self.size) if rows is None else rows
+        price, bedrooms = self.price[rows], self.bedrooms[rows]
+        total = np.zeros(len(price))
+        weight = 0.0
+
+        if prefs.budget_min is not None or prefs.budget_max is not None:
+            budget = np.ones(len(price))
+            if prefs.budget_max:
+                over = np.maximum(price - prefs.budget_max, 0) / (prefs.budget_max * OVER_BUDGET_TOLERANCE)
+                budget -= np.minimum(over, 1)
+            if prefs.budget_min:
+                under = np.maximum(prefs.budget_min - price, 0) / (prefs.budget_min * UNDER_BUDGET_TOLERANCE)
+                budget -= np.minimum(under, 1)
+            total += WEIGHTS['budget'] * np.maximum(budget, 0)
+            weight += WEIGHTS['budget']
+
+        if prefs.locations:
+            cities = [self.codes['city'][name] for name in prefs.locations if name in self.codes['city']]
+            states = [self.codes['state'][name] for name in prefs.locations if name in self.codes['state']]
+            location = np.where(np.isin(self.city[rows], cities), 1.0,
+                                np.where(np.isin(self.state[rows], states), STATE_MATCH_SCORE, 0.0))
+            total += WEIGHTS['location'] * location
+            weight += WEIGHTS['location']
+
+        if prefs.property_type:
+            code = self.codes['type'].get(prefs.property_type, -1)
+            total += WEIGHTS['type'] * (self.type[rows] == code)
+            weight += WEIGHTS['type']
+
+        if prefs.bedrooms is not None:
+            shortfall = np.maximum(prefs.bedrooms - bedrooms, 0)
+            total += WEIGHTS['size'] * np.maximum(1 - shortfall * BEDROOM_SHORTFALL_PENALTY, 0)
+            weight += WEIGHTS['size']
+
+        if not weight:
+            return np.zeros(len(price))
+        return np.where(self.active[rows], total / weight, 0.0)
+
+    def top(self, prefs, limit):
+        """``[(pk, score), ...]`` of the best ``limit`` rows, best first"""
+        scores = self.scores(prefs)
+        candidates = np.flatnonzero(scores > 0)
+        if len(candidates) > limit:
+            # Score of the limit-th best; keep every tie with it so the pk tie-break below is exact.
+            cutoff = -np.partition(-scores[candidates], limit - 1)[limit - 1]
+            candidates = candidates[scores[candidates] >= cutoff]
+        # Highest score first, ties broken by newest listing (larger pk)
+        order = np.lexsort((-self.pk[candidates], -scores[candidates]))[:limit]
+        return [(int(self.pk[i]), float(scores[i])) for i in candidates[order]]
+
+
+class MatchList:
+    """A customer's best matches; exact for every listing scoring above ``floor``"""
+
+    def __init__(self, prefs, matches, version, floor):
+        self.prefs = prefs
+        self.matches = dict(matches)
+        self.version = version
+        self.floor = floor
+
+
+class MatchingEngine:
+    """Process-wide matrix, change log and per-customer match cache"""
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.matrix = None
+        self.loaded_at = 0.0
+        self.version = 0
+        self.changes = []           # [(version, pk)], oldest first
+        self.cache = OrderedDict()  # customer profile id -> MatchList
+        self.reloading = False
+
+    def _install(self, matrix):
+        self.matrix = matrix
+        self.loaded_at = time.monotonic()
+        self.version += 1
+        self.changes.clear()
+        self.cache.clear()
+
+    def _ensure_loaded(self):
+        if self.matrix is None:
+            self._install(ListingMatrix.load())
+        elif time.monotonic() - self.loaded_at > REBUILD_INTERVAL and not self.reloading:
+            # Keep serving the current matrix while a fresh one loads.
+            self.reloading = True
+            threading.Thread(target=self._reload, args=(self.version,), name='match-reload', daemon=True).start()
+
+    def _reload(self, started_version):
+        try:
+            matrix = ListingMatrix.load()
+            with self.lock:
+                # Replay rows saved in this process while the load was running.
+                changed = {pk for version, pk in self.changes if version > started_version}
+                if changed:
+                    available = Property.objects.filter(pk__in=changed, status='available').values_list(*LOAD_FIELDS)
+                    for row in available:
+                        matrix.upsert(*row)
+                        changed.discard(row[0])
+                    for pk in changed:
+                        matrix.remove(pk)
+                if self.matrix is not None:
+                    self._install(matrix)
+        except Exception:
+            logger.exception("Reloading the listing match matrix failed")
+        finally:
+            self.reloading = False
+            connection.close()
+
+    def reset(self):
+        with self.lock:
+            self.matrix = None
+            self.cache.clear()
+            self.changes.clear()
+
+    # --------------------------------
+    # Updates
+    # --------------------------------
+    def _log(self, pk):
+        self.version += 1
+        self.changes.append((self.version, pk))
+        if len(self.changes) > CHANGE_LOG_SIZE:
+            del self.changes[:len(self.changes) - CHANGE_LOG_SIZE]
+
+    def property_saved(self, property_obj):
+        with self.lock:
+            if self.matrix is None:
+                return
+            if property_obj.status == 'available':
+                self.matrix.upsert(*(getattr(property_obj, field) for field in LOAD_FIELDS))
+            else:
+                self.matrix.remove(property_obj.pk)
+            self._log(property_obj.pk)
+
+    def property_deleted(self, pk):
+        with self.lock:
+            if self.matrix is None:
+                return
+            self.matrix.remove(pk)
+            self._log(pk)
+
+    def forget(self, customer_id):
+        """Drop a customer's cached list, e.g. after their preferences change"""
+        with self.lock:
+            self.cache.pop(customer_id, None)
+
+    # --------------------------------
+    # Queries
+    # --------------------------------
+    def matches(self, profile, limit=MATCH_LIMIT):
+        """``[(property pk, score 0..1), ...]`` for ``profile``, best first"""
+        with self.lock:
+            self._ensure_loaded()
+            entry = self.cache.get(profile.pk)
+            if entry is not None and not self._catch_up(entry, limit):
+                entry = None
+            if entry is None:
+                prefs = Preferences(profile)
+                if prefs.is_empty:
+                    return []
+                # Keep spare matches so a few listings dropping out does not force a rescore.
+                top = self.matrix.top(prefs, limit * 2)
+                floor = top[-1][1] if len(top) == limit * 2 else 0.0
+                entry = MatchList(prefs, top, self.version, floor)
+                self.cache[profile.pk] = entry
+                while len(self.cache) > MAX_CACHED_CUSTOMERS:
+                    self.cache.popitem(last=False)
+            self.cache.move_to_end(profile.pk)
+            ranked = sorted(entry.matches.items(), key=lambda item: (-item[1], -item[0]))
+            return ranked[:limit]
+
+    def _catch_up(self, entry, limit):
+        """Re-score the listings changed since ``entry`` was computed; False if it needs a rebuild"""
+        if entry.version == self.version:
+            return True
+        if not self.changes or self.changes[0][0] > entry.version + 1:
+            return False    # the log no longer reaches back far enough
+
+        changed = {pk for version, pk in self.changes if version > entry.version}
+        for pk in changed:
+            entry.matches.pop(pk, None)
+        rows = np.array([self.matrix.rows[pk] for pk in changed if pk in self.matrix.rows], dtype=np.int64)
+        if len(rows):
+            for row, score in zip(rows, self.matrix.scores(entry.prefs, rows)):
+                if score > 0 and score >= entry.floor:
+                    entry.matches[int(self.matrix.pk[row])] = float(score)
+        entry.version = self.version
+        # Listings at or below the floor may be missing, so the list is only
+        # usable while the ones above it still fill a page.
+        return entry.floor == 0.0 or sum(score > entry.floor for score in entry.matches.values()) >= limit
+
+
+engine = MatchingEngine()
+
+
+def top_matches(profile, limit=12):
+    """The best available listings for a CustomerProfile as ``[(Property, score)]``"""
+    ranked = engine.matches(profile, limit)
+    properties = Property.objects.filter(pk__in=[pk for pk, _ in ranked], status='available').in_bulk()
+    return [(properties[pk], score) for pk, score in ranked if pk in properties]
@@ -0,0 +1,48 @@
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.http import FileResponse
+
+from .prerender import output_path, prerendered_paths
+
+
+class PrerenderedPageMiddleware:
+    """Serve pre-rendered marketing pages to anonymous visitors from disk.
+
+    Sits above the session middleware so a hit never loads a session,
+    checks CSRF or renders a template. Visitors with a session cookie get
+    the live view, since the shared nav depends on auth state.
+    """
+
+    max_age = 300
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return self.prerendered(request) or self.get_response(request)
+
+    async def __acall__(self, request):
+        return self.prerendered(request) or await self.get_response(request)
+
+    def prerendered(self, request):
+        """The pre-rendered response for this request, or ``None``"""
+        if (
+            request.method in ('GET', 'HEAD')
+            and not request.GET
+            and settings.SESSION_COOKIE_NAME not in request.COOKIES
+            and request.path_info in prerendered_paths()
+        ):
+            try:
+                handle = open(output_path(request.path_info), 'rb')
+            except FileNotFoundError:
+                return None
+            response = FileResponse(handle, content_type='text/html; charset=utf-8')
+            response['Cache-Control'] = f'public, max-age={self.max_age}'
+            return response
+        return None
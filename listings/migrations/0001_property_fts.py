@@ -0,0 +1,29 @@
+from django.db import migrations
+
+
+def install_index(apps, schema_editor):
+    from listings import fulltext
+    if not fulltext.is_supported(schema_editor.connection):
+        return
+    fulltext.install(schema_editor.connection)
+    fulltext.rebuild(schema_editor.connection)
+
+
+def drop_index(apps, schema_editor):
+    from listings import fulltext
+    if not fulltext.is_supported(schema_editor.connection):
+        return
+    for suffix in ('ai', 'ad', 'au'):
+        schema_editor.execute(f"DROP TRIGGER IF EXISTS {fulltext.FTS_TABLE}_{suffix}")
+    schema_editor.execute(f"DROP TABLE IF EXISTS {fulltext.FTS_TABLE}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0003_property_search_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(install_index, drop_index),
+    ]
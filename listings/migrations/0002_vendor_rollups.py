@@ -0,0 +1,43 @@
+# Generated by Django 5.2.7 on 2026-10-18 08:45
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('accounts', '0005_image_variants'),
+        ('listings', '0001_property_fts'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VendorDailyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('new_listings', models.IntegerField(default=0)),
+                ('vendor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_rollups', to='accounts.vendorprofile')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('vendor', 'day'), name='unique_vendor_daily_rollup')],
+            },
+        ),
+        migrations.CreateModel(
+            name='VendorStatusRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('available', 'Available'), ('pending', 'Pending'), ('sold', 'Sold'), ('rented', 'Rented'), ('inactive', 'Inactive')], max_length=20)),
+                ('listing_count', models.IntegerField(default=0)),
+                ('price_total', models.DecimalField(decimal_places=2, default=0, max_digits=20)),
+                ('views_total', models.BigIntegerField(default=0)),
+                ('vendor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='status_rollups', to='accounts.vendorprofile')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('vendor', 'status'), name='unique_vendor_status_rollup')],
+            },
+        ),
+    ]
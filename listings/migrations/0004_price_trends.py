@@ -0,0 +1,70 @@
+# Generated by Django 5.2.7 on 2026-10-18 09:06
+
+import django.db.models.deletion
+import django.utils.timezone
+from itertools import islice
+
+from django.db import migrations, models
+
+
+def backfill_price_history(apps, schema_editor):
+    """Record every existing listing's current price as of its creation"""
+    Property = apps.get_model('accounts', 'Property')
+    PriceHistory = apps.get_model('listings', 'PriceHistory')
+    rows = Property.objects.values_list(
+        'pk', 'price', 'city', 'property_type', 'listing_type', 'created_at',
+    ).iterator(chunk_size=5000)
+    while batch := list(islice(rows, 5000)):
+        PriceHistory.objects.bulk_create(
+            PriceHistory(
+                property_id=pk, price=price, city=city.strip(),
+                property_type=property_type, listing_type=listing_type, recorded_at=created_at,
+            )
+            for pk, price, city, property_type, listing_type, created_at in batch
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0008_customer_match_preferences'),
+        ('listings', '0003_saved_searches'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PriceHistory',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('price', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('city', models.CharField(max_length=100)),
+                ('property_type', models.CharField(choices=[('apartment', 'Apartment'), ('house', 'House'), ('condo', 'Condominium'), ('townhouse', 'Townhouse'), ('land', 'Land'), ('commercial', 'Commercial')], max_length=20)),
+                ('listing_type', models.CharField(choices=[('sale', 'For Sale'), ('rent', 'For Rent'), ('lease', 'For Lease')], max_length=10)),
+                ('recorded_at', models.DateTimeField(db_index=True, default=django.utils.timezone.now)),
+                ('property', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='price_history', to='accounts.property')),
+            ],
+            options={
+                'verbose_name_plural': 'price history',
+            },
+        ),
+        migrations.CreateModel(
+            name='PriceTrend',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('city', models.CharField(blank=True, help_text='Lowercased', max_length=100)),
+                ('property_type', models.CharField(blank=True, choices=[('apartment', 'Apartment'), ('house', 'House'), ('condo', 'Condominium'), ('townhouse', 'Townhouse'), ('land', 'Land'), ('commercial', 'Commercial')], max_length=20)),
+                ('listing_type', models.CharField(blank=True, choices=[('sale', 'For Sale'), ('rent', 'For Rent'), ('lease', 'For Lease')], max_length=10)),
+                ('week', models.DateField(help_text='Monday the week starts on')),
+                ('listings', models.IntegerField()),
+                ('p10', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('p25', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('median', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('p75', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('p90', models.DecimalField(decimal_places=2, max_digits=12)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('city', 'property_type', 'listing_type', 'week'), name='unique_price_trend_week')],
+            },
+        ),
+        migrations.RunPython(backfill_price_history, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.7 on 2026-10-18 11:02
+
+from itertools import islice
+
+from django.db import migrations, models
+
+
+def backfill_status(apps, schema_editor):
+    """Record when listings that are no longer available last changed"""
+    Property = apps.get_model('accounts', 'Property')
+    PriceHistory = apps.get_model('listings', 'PriceHistory')
+    rows = Property.objects.exclude(status='available').values_list(
+        'pk', 'price', 'status', 'city', 'property_type', 'listing_type', 'updated_at',
+    ).iterator(chunk_size=5000)
+    while batch := list(islice(rows, 5000)):
+        PriceHistory.objects.bulk_create(
+            PriceHistory(
+                property_id=pk, price=price, status=status, city=city.strip(),
+                property_type=property_type, listing_type=listing_type, recorded_at=updated_at,
+            )
+            for pk, price, status, city, property_type, listing_type, updated_at in batch
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('listings', '0005_saved_search_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='pricehistory',
+            name='status',
+            field=models.CharField(choices=[('available', 'Available'), ('pending', 'Pending'), ('sold', 'Sold'), ('rented', 'Rented'), ('inactive', 'Inactive')], default='available', max_length=20),
+        ),
+        migrations.RunPython(backfill_status, migrations.RunPython.noop),
+    ]
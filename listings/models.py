@@ -1,3 +1,141 @@
 from django.db import models
+from django.utils import timezone
 
-# Create your models here.
+from accounts.models import CustomerProfile, VendorProfile, Property
+
+
+# ======================
+# VENDOR ANALYTICS ROLLUPS
+# ======================
+
+class VendorStatusRollup(models.Model):
+    """Running listing totals per vendor and status, maintained by Property signals"""
+    vendor = models.ForeignKey(VendorProfile, on_delete=models.CASCADE, related_name='status_rollups')
+    status = models.CharField(max_length=20, choices=Property.STATUS_CHOICES)
+    listing_count = models.IntegerField(default=0)
+    price_total = models.DecimalField(max_digits=20, decimal_places=2, default=0)
+    views_total = models.BigIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['vendor', 'status'], name='unique_vendor_status_rollup'),
+        ]
+
+    def __str__(self):
+        return f"{self.vendor_id} - {self.status}: {self.listing_count}"
+
+
+class VendorDailyRollup(models.Model):
+    """Listings created per vendor per day"""
+    vendor = models.ForeignKey(VendorProfile, on_delete=models.CASCADE, related_name='daily_rollups')
+    day = models.DateField()
+    new_listings = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['vendor', 'day'], name='unique_vendor_daily_rollup'),
+        ]
+
+    def __str__(self):
+        return f"{self.vendor_id} - {self.day}: {self.new_listings}"
+
+
+# ======================
+# SAVED SEARCHES & ALERTS
+# ======================
+
+class SavedSearch(models.Model):
+    """Listing criteria a customer wants to be alerted about; blank criteria match anything"""
+    customer = models.ForeignKey(CustomerProfile, on_delete=models.CASCADE, related_name='saved_searches')
+    name = models.CharField(max_length=100)
+    city = models.CharField(max_length=100, blank=True)
+    property_type = models.CharField(max_length=20, choices=Property.PROPERTY_TYPES, blank=True)
+    listing_type = models.CharField(max_length=10, choices=Property.LISTING_TYPES, blank=True)
+    min_price = models.DecimalField(max_digits=12, decimal_places=2, blank=True, null=True)
+    max_price = models.DecimalField(max_digits=12, decimal_places=2, blank=True, null=True)
+    is_active = models.BooleanField(default=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    # Lets every process's alert index pick up searches changed elsewhere
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
+    def __str__(self):
+        return f"{self.customer_id} - {self.name}"
+
+    def matches(self, property_obj):
+        """Exact check of one property against the criteria"""
+        return (
+            (not self.city or self.city.strip().lower() == property_obj.city.strip().lower())
+            and (not self.property_type or self.property_type == property_obj.property_type)
+            and (not self.listing_type or self.listing_type == property_obj.listing_type)
+            and (self.min_price is None or property_obj.price >= self.min_price)
+            and (self.max_price is None or property_obj.price <= self.max_price)
+        )
+
+
+class SearchAlert(models.Model):
+    """A property that matched a saved search, waiting for the next digest email"""
+    search = models.ForeignKey(SavedSearch, on_delete=models.CASCADE, related_name='alerts')
+    property = models.ForeignKey(Property, on_delete=models.CASCADE, related_name='search_alerts')
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        constraints = [
+            # A listing is announced to a search once, however often it is edited.
+            models.UniqueConstraint(fields=['search', 'property'], name='unique_search_alert'),
+        ]
+        indexes = [
+            models.Index(fields=['sent_at', 'search'], name='search_alert_pending'),
+        ]
+
+    def __str__(self):
+        return f"{self.search_id} -> {self.property_id}"
+
+
+# ======================
+# PRICE TRENDS
+# ======================
+
+class PriceHistory(models.Model):
+    """A property's asking price and status, recorded when it is listed and whenever either changes"""
+    property = models.ForeignKey(Property, on_delete=models.CASCADE, related_name='price_history')
+    price = models.DecimalField(max_digits=12, decimal_places=2)
+    status = models.CharField(max_length=20, choices=Property.STATUS_CHOICES, default='available')
+    # Copied from the property so trend jobs never join back to it.
+    city = models.CharField(max_length=100)
+    property_type = models.CharField(max_length=20, choices=Property.PROPERTY_TYPES)
+    listing_type = models.CharField(max_length=10, choices=Property.LISTING_TYPES)
+    recorded_at = models.DateTimeField(default=timezone.now, db_index=True)
+
+    class Meta:
+        verbose_name_plural = 'price history'
+
+    def __str__(self):
+        return f"{self.property_id}: {self.price} at {self.recorded_at:%Y-%m-%d}"
+
+
+class PriceTrend(models.Model):
+    """Weekly asking-price percentiles per city, property type and listing type.
+
+    A blank city, property type or listing type is the aggregate over all of them.
+    """
+    city = models.CharField(max_length=100, blank=True, help_text="Lowercased")
+    property_type = models.CharField(max_length=20, choices=Property.PROPERTY_TYPES, blank=True)
+    listing_type = models.CharField(max_length=10, choices=Property.LISTING_TYPES, blank=True)
+    week = models.DateField(help_text="Monday the week starts on")
+    listings = models.IntegerField()
+    p10 = models.DecimalField(max_digits=12, decimal_places=2)
+    p25 = models.DecimalField(max_digits=12, decimal_places=2)
+    median = models.DecimalField(max_digits=12, decimal_places=2)
+    p75 = models.DecimalField(max_digits=12, decimal_places=2)
+    p90 = models.DecimalField(max_digits=12, decimal_places=2)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['city', 'property_type', 'listing_type', 'week'], name='unique_price_trend_week',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.city or 'all'}/{self.property_type or 'all'}/{self.listing_type or 'all'} {self.week}: {self.median}"
@@ -0,0 +1,82 @@
+"""Pre-rendered HTML for the fully static marketing pages.
+
+``manage.py prerender_pages`` renders each route in ``PAGES`` for an
+anonymous visitor and writes it under ``PRERENDER_ROOT``;
+``PrerenderedPageMiddleware`` then answers anonymous GETs for those routes
+straight from disk, before sessions, CSRF or the template engine run.
+"""
+import hashlib
+import os
+import re
+import tempfile
+from functools import lru_cache
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.contrib.staticfiles import finders
+from django.test import RequestFactory
+from django.urls import resolve, reverse
+
+
+# URL names of pages with no per-user or per-request content.
+PAGES = ('blog', 'single-blog', 'about-us', 'contact', 'elements')
+
+
+def prerender_root():
+    return Path(getattr(settings, 'PRERENDER_ROOT', Path(settings.BASE_DIR) / 'prerendered'))
+
+
+def output_path(url_path):
+    return prerender_root() / url_path.strip('/') / 'index.html'
+
+
+@lru_cache(maxsize=None)
+def prerendered_paths():
+    return frozenset(reverse(name) for name in PAGES)
+
+
+@lru_cache(maxsize=None)
+def _asset_version(path):
+    found = finders.find(path)
+    if not found:
+        return None
+    with open(found, 'rb') as handle:
+        return hashlib.md5(handle.read(), usedforsecurity=False).hexdigest()[:12]
+
+
+def hash_asset_urls(html):
+    """Append a content hash to every local static URL so it can be cached forever"""
+    pattern = re.compile(r'(%s)([^"\'()\s?#]+)' % re.escape(settings.STATIC_URL.rstrip('/') + '/'))
+
+    def replace(match):
+        version = _asset_version(match.group(2))
+        return match.group(0) if version is None else f"{match.group(0)}?v={version}"
+
+    return pattern.sub(replace, html)
+
+
+def render_page(url_path):
+    """Render ``url_path`` exactly as an anonymous visitor would receive it"""
+    request = RequestFactory().get(url_path)
+    request.user = AnonymousUser()
+    match = resolve(url_path)
+    response = match.func(request, *match.args, **match.kwargs)
+    return hash_asset_urls(response.content.decode(response.charset))
+
+
+def write_page(url_path, html):
+    """Atomically replace the pre-rendered file for ``url_path``"""
+    target = output_path(url_path)
+    target.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=target.parent, suffix='.tmp')
+    with os.fdopen(fd, 'w', encoding='utf-8') as handle:
+        handle.write(html)
+    os.replace(tmp, target)
+    return target
+
+
+def build():
+    """Render and write every page in ``PAGES``; returns the written file paths"""
+    _asset_version.cache_clear()
+    return [write_page(path, render_page(path)) for path in sorted(prerendered_paths())]
@@ -0,0 +1,191 @@
+"""Incrementally maintained per-vendor listing analytics.
+
+Every Property insert, update and delete applies a small delta to the
+vendor's ``VendorStatusRollup`` and ``VendorDailyRollup`` rows with ``F()``
+updates, so the vendor dashboard reads a handful of pre-aggregated rows
+instead of aggregating over all of a vendor's listings.
+"""
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from accounts.models import Property
+from .models import VendorStatusRollup, VendorDailyRollup
+
+
+def _upsert(model, lookup, **deltas):
+    """Add ``deltas`` to the row matching ``lookup``, creating it if needed"""
+    changes = {field: F(field) + value for field, value in deltas.items()}
+    if model.objects.filter(**lookup).update(**changes):
+        return
+    try:
+        with transaction.atomic():
+            model.objects.create(**lookup, **deltas)
+    except IntegrityError:
+        # Another writer created the row first.
+        model.objects.filter(**lookup).update(**changes)
+
+
+def apply_status_delta(vendor_id, status, count=0, price=Decimal('0'), views=0):
+    if not (count or price or views):
+        return
+    _upsert(
+        VendorStatusRollup, {'vendor_id': vendor_id, 'status': status},
+        listing_count=count, price_total=price, views_total=views,
+    )
+
+
+def record_new_listings(vendor_id, day, count=1):
+    _upsert(VendorDailyRollup, {'vendor_id': vendor_id, 'day': day}, new_listings=count)
+
+
+def snapshot(property_obj):
+    """The fields a rollup row depends on"""
+    return (property_obj.vendor_id, property_obj.status, property_obj.price, property_obj.views_count)
+
+
+def property_created(property_obj):
+    vendor_id, status, price, views = snapshot(property_obj)
+    apply_status_delta(vendor_id, status, 1, Decimal(price), views)
+    record_new_listings(vendor_id, timezone.localdate(property_obj.created_at))
+
+
+def property_changed(old, property_obj):
+    new = snapshot(property_obj)
+    if old == new:
+        return
+    old_vendor, old_status, old_price, old_views = old
+    vendor_id, status, price, views = new
+    apply_status_delta(old_vendor, old_status, -1, -Decimal(old_price), -old_views)
+    apply_status_delta(vendor_id, status, 1, Decimal(price), views)
+    if old_vendor != vendor_id:
+        # The listing moves to its new vendor's daily counts too.
+        day = timezone.localdate(property_obj.created_at)
+        record_new_listings(old_vendor, day, -1)
+        record_new_listings(vendor_id, day, 1)
+
+
+def property_deleted(property_obj):
+    vendor_id, status, price, views = snapshot(property_obj)
+    apply_status_delta(vendor_id, status, -1, -Decimal(price), -views)
+    record_new_listings(vendor_id, timezone.localdate(property_obj.created_at), -1)
+
+
+def properties_created(properties):
+    """Apply rollups for rows inserted with ``bulk_create`` (which sends no signals)"""
+    status_deltas = defaultdict(lambda: [0, Decimal('0'), 0])
+    daily_deltas = defaultdict(int)
+    for property_obj in properties:
+        vendor_id, status, price, views = snapshot(property_obj)
+        delta = status_deltas[vendor_id, status]
+        delta[0] += 1
+        delta[1] += Decimal(price)
+        delta[2] += views
+        daily_deltas[vendor_id, timezone.localdate(property_obj.created_at)] += 1
+    for (vendor_id, status), (count, price, views) in status_deltas.items():
+        apply_status_delta(vendor_id, status, count, price, views)
+    for (vendor_id, day), count in daily_deltas.items():
+        record_new_listings(vendor_id, day, count)
+
+
+def views_added(views_by_property):
+    """Fold flushed ``views_count`` increments (``{pk: n}``) into the rollups"""
+    totals = defaultdict(int)
+    rows = Property.objects.filter(pk__in=views_by_property).values_list('pk', 'vendor_id', 'status')
+    for pk, vendor_id, status in rows:
+        totals[vendor_id, status] += views_by_property[pk]
+    for (vendor_id, status), views in totals.items():
+        apply_status_delta(vendor_id, status, views=views)
+
+
+def vendor_summary(vendor):
+    """Dashboard figures for ``vendor`` read from its rollup rows"""
+    return _summary(list(vendor.status_rollups.filter(listing_count__gt=0)))
+
+
+async def avendor_summary(vendor):
+    """``vendor_summary()`` through the async ORM"""
+    return _summary([row async for row in vendor.status_rollups.filter(listing_count__gt=0)])
+
+
+def _summary(rows):
+    total = sum(row.listing_count for row in rows)
+    price_total = sum((row.price_total for row in rows), Decimal('0'))
+    return {
+        'total_properties': total,
+        'active_listings': sum(row.listing_count for row in rows if row.status == 'available'),
+        'total_views': sum(row.views_total for row in rows),
+        'average_price': price_total / total if total else None,
+        'status_counts': [(row.get_status_display(), row.listing_count) for row in rows],
+    }
+
+
+# --------------------------------
+# Backfill & reconcile
+# --------------------------------
+def expected_rollups(vendor_ids=None):
+    """Recompute rollups from ``Property`` with aggregate queries"""
+    queryset = Property.objects.all()
+    if vendor_ids is not None:
+        queryset = queryset.filter(vendor_id__in=vendor_ids)
+
+    status_rows = {
+        (row['vendor_id'], row['status']): (row['count'], row['price'] or Decimal('0'), row['views'] or 0)
+        for row in queryset.order_by().values('vendor_id', 'status').annotate(
+            count=Count('pk'), price=Sum('price'), views=Sum('views_count'),
+        )
+    }
+    daily_rows = {
+        (row['vendor_id'], row['day']): row['count']
+        for row in queryset.order_by().annotate(day=TruncDate('created_at'))
+        .values('vendor_id', 'day').annotate(count=Count('pk'))
+    }
+    return status_rows, daily_rows
+
+
+def current_rollups(vendor_ids=None):
+    status_qs = VendorStatusRollup.objects.all()
+    daily_qs = VendorDailyRollup.objects.all()
+    if vendor_ids is not None:
+        status_qs = status_qs.filter(vendor_id__in=vendor_ids)
+        daily_qs = daily_qs.filter(vendor_id__in=vendor_ids)
+    status_rows = {
+        (vendor_id, status): (count, price, views)
+        for vendor_id, status, count, price, views in status_qs.values_list(
+            'vendor_id', 'status', 'listing_count', 'price_total', 'views_total'
+        )
+        if count or price or views
+    }
+    daily_rows = {
+        (vendor_id, day): count
+        for vendor_id, day, count in daily_qs.values_list('vendor_id', 'day', 'new_listings')
+        if count
+    }
+    return status_rows, daily_rows
+
+
+@transaction.atomic
+def rebuild(vendor_ids=None):
+    """Replace the rollup rows for ``vendor_ids`` (or everyone) with fresh aggregates"""
+    status_rows, daily_rows = expected_rollups(vendor_ids)
+    status_qs = VendorStatusRollup.objects.all()
+    daily_qs = VendorDailyRollup.objects.all()
+    if vendor_ids is not None:
+        status_qs = status_qs.filter(vendor_id__in=vendor_ids)
+        daily_qs = daily_qs.filter(vendor_id__in=vendor_ids)
+    status_qs.delete()
+    daily_qs.delete()
+    VendorStatusRollup.objects.bulk_create(
+        VendorStatusRollup(vendor_id=vendor_id, status=status, listing_count=count,
+                           price_total=price, views_total=views)
+        for (vendor_id, status), (count, price, views) in status_rows.items()
+    )
+    VendorDailyRollup.objects.bulk_create(
+        VendorDailyRollup(vendor_id=vendor_id, day=day, new_listings=count)
+        for (vendor_id, day), count in daily_rows.items()
+    )
+    return len(status_rows), len(daily_rows)
@@ -0,0 +1,270 @@
+"""Faceted property search with keyset (seek) pagination."""
+import base64
+import binascii
+import json
+import math
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+
+from django.db.models import Count, Q
+
+from accounts.models import Property
+from . import fulltext
+
+
+PAGE_SIZE = 12
+FACET_LIMIT = 50
+
+# Dimensions we filter on exactly and report counts for.
+FACET_FIELDS = ('city', 'state', 'property_type', 'listing_type', 'status', 'bedrooms', 'bathrooms')
+
+# Every ordering ends on the primary key so the seek predicate is unique.
+SORT_ORDERS = {
+    'newest': ('created_at', 'desc'),
+    'price_low': ('price', 'asc'),
+    'price_high': ('price', 'desc'),
+    'relevance': ('search_rank', 'asc'),
+}
+DEFAULT_SORT = 'newest'
+
+# Filters whose values must be one of the model's choices; withdrawn listings are not public.
+CHOICE_FIELDS = {
+    field: {value for value, _ in Property._meta.get_field(field).flatchoices} - {'inactive'}
+    for field in ('property_type', 'listing_type', 'status')
+}
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def _to_int(value):
+    try:
+        return int(str(value).rstrip('+'))
+    except (TypeError, ValueError):
+        return None
+
+
+def _to_decimal(value):
+    if value in (None, ''):
+        return None
+    try:
+        value = Decimal(str(value).replace(',', ''))
+    except InvalidOperation:
+        return None
+    # Decimal() also parses 'NaN' and 'Infinity', which the ORM rejects.
+    return value if value.is_finite() else None
+
+
+def encode_cursor(sort, value, pk):
+    if isinstance(value, datetime):
+        value = value.isoformat()
+    payload = json.dumps([sort, str(value), pk], separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        sort, value, pk = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        field, _ = SORT_ORDERS[sort]
+        if field == 'created_at':
+            value = datetime.fromisoformat(value)
+        elif field == 'search_rank':
+            value = float(value)
+            if not math.isfinite(value):
+                raise ValueError(value)
+        else:
+            value = Decimal(value)
+            if not value.is_finite():
+                raise ValueError(value)
+        return sort, value, int(pk)
+    except (binascii.Error, ValueError, TypeError, KeyError, InvalidOperation):
+        raise InvalidCursor(cursor)
+
+
+class SearchPage:
+    def __init__(self, results, next_cursor):
+        self.results = results
+        self.next_cursor = next_cursor
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def __iter__(self):
+        return iter(self.results)
+
+    def __len__(self):
+        return len(self.results)
+
+
+class PropertySearch:
+    """Turn query parameters into a filtered, faceted, seek-paginated search"""
+
+    def __init__(self, params, queryset=None, page_size=PAGE_SIZE):
+        self.params = params
+        # Withdrawn listings are never public; the detail pages 404 on them too.
+        self.queryset = queryset if queryset is not None else Property.objects.exclude(status='inactive')
+        self.page_size = page_size
+        self.keywords = (params.get('q') or '').strip()
+        self.ranked = bool(fulltext.match_expression(self.keywords)) and fulltext.is_supported()
+        self.sort = self._parse_sort(params.get('sort'))
+        # Parameters given a value we could not use; the filter is skipped.
+        self.invalid = []
+        self.filters = self._parse_filters(params)
+
+    def _parse_sort(self, sort):
+        if sort == 'relevance' and not self.ranked:
+            return DEFAULT_SORT
+        if sort in SORT_ORDERS:
+            return sort
+        return 'relevance' if self.ranked else DEFAULT_SORT
+
+    def _parse_filters(self, params):
+        """Map request parameters onto per-dimension Q objects"""
+        filters = {}
+        if self.keywords:
+            filters['q'] = fulltext.matching_q(self.keywords)
+
+        for field in ('city', 'state', 'property_type', 'listing_type'):
+            value = (params.get(field) or '').strip()
+            if value:
+                filters[field] = Q(**{field: value})
+                if field in CHOICE_FIELDS and value not in CHOICE_FIELDS[field]:
+                    self.invalid.append(field)
+
+        # Only live listings are searchable unless a status is asked for.
+        status = params.get('status') or 'available'
+        if status != 'all':
+            filters['status'] = Q(status=status)
+            if status not in CHOICE_FIELDS['status']:
+                self.invalid.append('status')
+
+        for field in ('bedrooms', 'bathrooms'):
+            value = self._parse_number(params, field, _to_int)
+            if value is not None:
+                filters[field] = Q(**{f'{field}__gte': value})
+
+        min_price = self._parse_number(params, 'min_price', _to_decimal)
+        max_price = self._parse_number(params, 'max_price', _to_decimal)
+        price = Q()
+        if min_price is not None:
+            price &= Q(price__gte=min_price)
+        if max_price is not None:
+            price &= Q(price__lte=max_price)
+        if price:
+            filters['price'] = price
+        return filters
+
+    def _parse_number(self, params, field, parse):
+        raw = params.get(field)
+        value = parse(raw)
+        if value is None and raw not in (None, ''):
+            self.invalid.append(field)
+        return value
+
+    def get_queryset(self, exclude=None):
+        queryset = self.queryset
+        for field, condition in self.filters.items():
+            if field != exclude:
+                queryset = queryset.filter(condition)
+        return queryset
+
+    def _facet_querysets(self):
+        for field in FACET_FIELDS:
+            labels = dict(Property._meta.get_field(field).flatchoices)
+            rows = (
+                self.get_queryset(exclude=field)
+                .order_by()
+                .values_list(field)
+                .annotate(count=Count('pk'))
+                .order_by('-count', field)[:FACET_LIMIT]
+            )
+            yield field, labels, rows
+
+    def facets(self):
+        """Counts per value for each dimension, ignoring that dimension's own filter"""
+        return {
+            field: [{'value': value, 'label': labels.get(value, value), 'count': count} for value, count in rows]
+            for field, labels, rows in self._facet_querysets()
+        }
+
+    async def afacets(self):
+        """``facets()`` through the async ORM"""
+        return {
+            field: [
+                {'value': value, 'label': labels.get(value, value), 'count': count}
+                async for value, count in rows
+            ]
+            for field, labels, rows in self._facet_querysets()
+        }
+
+    def _seek(self, cursor):
+        """The filtered queryset in sort order, starting after ``cursor``"""
+        field, direction = SORT_ORDERS[self.sort]
+        after = decode_cursor(cursor) if cursor else None
+        if after is not None and after[0] != self.sort:
+            raise InvalidCursor(cursor)
+
+        if self.ranked:
+            # Join the FTS index directly so rank and snippet come back in the same query.
+            queryset = fulltext.ranked(
+                self.get_queryset(exclude='q'), self.keywords,
+                after=after[1:] if after and self.sort == 'relevance' else None,
+            )
+        else:
+            queryset = self.get_queryset()
+
+        if after is not None and self.sort != 'relevance':
+            _, value, pk = after
+            op = 'lt' if direction == 'desc' else 'gt'
+            queryset = queryset.filter(
+                Q(**{f'{field}__{op}': value}) | Q(**{field: value, f'pk__{op}': pk})
+            )
+
+        prefix = '-' if direction == 'desc' else ''
+        return queryset.order_by(f'{prefix}{field}', f'{prefix}pk')
+
+    def _page_queryset(self, cursor):
+        return self._seek(cursor).select_related('vendor__user')[:self.page_size + 1]
+
+    def _to_page(self, results):
+        field, _ = SORT_ORDERS[self.sort]
+        next_cursor = None
+        if len(results) > self.page_size:
+            results = results[:self.page_size]
+            last = results[-1]
+            next_cursor = encode_cursor(self.sort, getattr(last, field), last.pk)
+        if self.ranked:
+            for result in results:
+                result.snippet = fulltext.highlight(result.search_snippet)
+        return SearchPage(results, next_cursor)
+
+    def page(self, cursor=None):
+        """Return one page of results seeking past ``cursor``"""
+        return self._to_page(list(self._page_queryset(cursor)))
+
+    async def apage(self, cursor=None):
+        """``page()`` through the async ORM"""
+        return self._to_page([result async for result in self._page_queryset(cursor)])
+
+    def value_page(self, columns, cursor=None):
+        """Like ``page``, but each result is a ``values_list`` tuple of ``columns``.
+
+        No model instances are built; the sort key and pk are fetched
+        alongside (and dropped again) when ``columns`` leaves them out.
+        """
+        field, _ = SORT_ORDERS[self.sort]
+        columns = list(columns)
+        fetch = columns + [name for name in (field, 'pk') if name not in columns]
+        rows = list(self._seek(cursor).values_list(*fetch)[:self.page_size + 1])
+
+        next_cursor = None
+        if len(rows) > self.page_size:
+            rows = rows[:self.page_size]
+            last = rows[-1]
+            next_cursor = encode_cursor(self.sort, last[fetch.index(field)], last[fetch.index('pk')])
+        if len(fetch) > len(columns):
+            rows = [row[:len(columns)] for row in rows]
+        return SearchPage(rows, next_cursor)
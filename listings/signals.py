@@ -0,0 +1,126 @@
+from django.db import transaction
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+
+from accounts.images import variants_built
+from accounts.models import CustomerProfile, Property, PropertyFeature, PropertyImage
+from . import alerts, detail, matching, rollups, trends
+from .models import SavedSearch
+
+
+# --------------------------------
+# Vendor analytics rollups
+# --------------------------------
+@receiver(pre_save, sender=Property)
+def remember_rollup_state(sender, instance, raw=False, update_fields=None, **kwargs):
+    if raw or instance._state.adding:
+        instance._rollup_state = instance._trend_state = None
+        return
+    previous = (
+        Property.objects.filter(pk=instance.pk)
+        .values_list('vendor_id', 'status', 'price', 'views_count', 'city', 'property_type', 'listing_type')
+        .first()
+    )
+    if previous and update_fields is not None and 'views_count' not in update_fields:
+        # Not written by this save (see Property.save), so pick up the stored count.
+        instance.views_count = previous[3]
+    # One read serves both the rollups and the price history below.
+    instance._rollup_state = previous and previous[:4]
+    instance._trend_state = previous and (previous[1], previous[2], previous[4].strip(), *previous[5:])
+
+
+@receiver(post_save, sender=Property)
+def update_rollups_on_save(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    old = getattr(instance, '_rollup_state', None)
+    if created or old is None:
+        rollups.property_created(instance)
+    else:
+        rollups.property_changed(old, instance)
+
+
+@receiver(post_delete, sender=Property)
+def update_rollups_on_delete(sender, instance, **kwargs):
+    rollups.property_deleted(instance)
+
+
+# --------------------------------
+# Customer matching
+# --------------------------------
+@receiver(post_save, sender=Property)
+def update_matches_on_save(sender, instance, raw=False, **kwargs):
+    if not raw:
+        transaction.on_commit(lambda: matching.engine.property_saved(instance))
+
+
+@receiver(post_delete, sender=Property)
+def update_matches_on_delete(sender, instance, **kwargs):
+    pk = instance.pk
+    transaction.on_commit(lambda: matching.engine.property_deleted(pk))
+
+
+@receiver(post_save, sender=CustomerProfile)
+def forget_matches_on_profile_change(sender, instance, raw=False, **kwargs):
+    if not raw:
+        matching.engine.forget(instance.pk)
+
+
+# --------------------------------
+# Saved-search alerts
+# --------------------------------
+@receiver(post_save, sender=Property)
+def queue_search_alerts(sender, instance, raw=False, **kwargs):
+    if not raw:
+        transaction.on_commit(lambda: alerts.index.property_saved(instance))
+
+
+@receiver(post_save, sender=SavedSearch)
+def index_saved_search(sender, instance, raw=False, **kwargs):
+    if not raw:
+        transaction.on_commit(lambda: alerts.index.search_saved(instance))
+
+
+@receiver(post_delete, sender=SavedSearch)
+def unindex_saved_search(sender, instance, **kwargs):
+    pk = instance.pk
+    transaction.on_commit(lambda: alerts.index.search_deleted(pk))
+
+
+# --------------------------------
+# Price history
+# --------------------------------
+@receiver(post_save, sender=Property)
+def record_price_change(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    # remember_rollup_state already fetched the previous status, price and trend group.
+    old = getattr(instance, '_trend_state', None)
+    if created or old is None or old != trends.tracked_state(instance):
+        trends.record_history([instance])
+
+
+# --------------------------------
+# Detail page cache
+# --------------------------------
+@receiver(post_save, sender=Property)
+@receiver(post_delete, sender=Property)
+def forget_property_detail(sender, instance, **kwargs):
+    pk = instance.pk
+    transaction.on_commit(lambda: detail.forget(pk))
+
+
+@receiver(post_save, sender=PropertyImage)
+@receiver(post_delete, sender=PropertyImage)
+@receiver(post_save, sender=PropertyFeature)
+@receiver(post_delete, sender=PropertyFeature)
+def forget_parent_detail(sender, instance, **kwargs):
+    property_id = instance.property_id
+    transaction.on_commit(lambda: detail.forget(property_id))
+
+
+@receiver(variants_built, sender=PropertyImage)
+def forget_detail_on_new_variants(sender, pk, **kwargs):
+    property_id = PropertyImage.objects.filter(pk=pk).values_list('property_id', flat=True).first()
+    if property_id is not None:
+        detail.forget(property_id)
@@ -1,3 +1,859 @@
+import csv
+import hashlib
+import importlib
+import io
+import json
+import shutil
+import tempfile
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+from pathlib import Path
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.staticfiles import finders
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.core.management.sql import emit_post_migrate_signal
+from django.db import connection
+from django.http import FileResponse, QueryDict
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from accounts.images import variants_built
+from accounts.models import CustomUser, OutboundEmail, Property, PropertyFeature, PropertyImage
+from estates.testing import assert_query_budget, plain_static_storage
+from . import alerts, detail, exports, fulltext, geo, importer, matching, prerender, rollups, trends, viewcounts
+from .models import PriceHistory, PriceTrend, SavedSearch, SearchAlert, VendorDailyRollup, VendorStatusRollup
+from .search import InvalidCursor, PropertySearch, decode_cursor, encode_cursor
+
+
+def make_vendor(email='vendor@example.com'):
+    user = CustomUser.objects.create_user(email, email.split('@')[0], role='vendor')
+    return user.vendor_profile
+
+
+def make_customer(email='customer@example.com', **preferences):
+    user = CustomUser.objects.create_user(email, email.split('@')[0], role='customer')
+    profile = user.customer_profile
+    if preferences:
+        for name, value in preferences.items():
+            setattr(profile, name, value)
+        profile.save()
+    return profile
+
+
+def make_property(vendor, **fields):
+    values = {
+        'title': 'Two bedroom flat',
+        'description': 'Bright flat close to the market.',
+        'property_type': 'apartment',
+        'listing_type': 'sale',
+        'address': '1 Marina Road',
+        'city': 'Lagos',
+        'state': 'Lagos',
+        'price': Decimal('250000.00'),
+        'bedrooms': 2,
+        'bathrooms': 1,
+        **fields,
+    }
+    return Property.objects.create(vendor=vendor, **values)
+
+
+# --------------------------------
+# Search
+# --------------------------------
+@plain_static_storage
+class PriceFilterTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        vendor = make_vendor()
+        cls.cheap = make_property(vendor, price=Decimal('100000.00'))
+        cls.dear = make_property(vendor, price=Decimal('900000.00'))
+
+    def search(self, query):
+        return PropertySearch(QueryDict(query)).get_queryset()
+
+    def test_price_range(self):
+        self.assertQuerySetEqual(self.search('min_price=500,000'), [self.dear])
+        self.assertQuerySetEqual(self.search('max_price=500000'), [self.cheap])
+
+    def test_non_finite_prices_are_ignored(self):
+        for query in ('min_price=NaN', 'max_price=Infinity', 'min_price=-inf', 'max_price=sNaN'):
+            with self.subTest(query=query):
+                self.assertEqual(self.search(query).count(), 2)
+
+    def test_listings_page_ignores_non_finite_prices(self):
+        response = self.client.get('/listings/listings', {'min_price': 'NaN', 'max_price': 'Infinity'})
+        self.assertEqual(response.status_code, 200)
+
+    def test_inactive_listings_are_never_listed(self):
+        withdrawn = make_property(self.cheap.vendor, status='inactive')
+        for status in ('', 'all', 'inactive'):
+            with self.subTest(status=status):
+                response = self.client.get('/listings/listings', {'status': status})
+                self.assertEqual(response.status_code, 200)
+                self.assertNotIn(withdrawn.pk, [p.pk for p in response.context['page']])
+                statuses = [facet['value'] for facet in response.context['facets']['status']]
+                self.assertNotIn('inactive', statuses)
+        self.assertEqual(self.client.get(f'/listings/listings/{withdrawn.pk}').status_code, 404)
+
+    def test_non_finite_cursor_values_are_rejected(self):
+        for sort, value in (('price_low', 'NaN'), ('price_high', 'Infinity'), ('relevance', 'nan')):
+            with self.subTest(sort=sort, value=value):
+                with self.assertRaises(InvalidCursor):
+                    decode_cursor(encode_cursor(sort, value, 1))
+
+    def test_listings_page_restarts_on_non_finite_cursor(self):
+        cursor = encode_cursor('price_low', 'NaN', self.cheap.pk)
+        response = self.client.get('/listings/listings', {'sort': 'price_low', 'cursor': cursor})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([p.pk for p in response.context['page']], [self.cheap.pk, self.dear.pk])
+
+
+class ApiFilterTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        make_property(make_vendor(), price=Decimal('100000.00'))
+
+    def test_invalid_filters_are_a_json_400(self):
+        for query, field in (
+            ({'min_price': 'NaN'}, 'min_price'), ({'max_price': 'Infinity'}, 'max_price'),
+            ({'min_price': 'cheap'}, 'min_price'), ({'bedrooms': 'two'}, 'bedrooms'),
+            ({'status': 'bogus'}, 'status'), ({'listing_type': 'swap'}, 'listing_type'),
+        ):
+            for url in ('/api/v1/properties', '/api/v1/properties/facets'):
+                with self.subTest(url=url, query=query):
+                    response = self.client.get(url, query)
+                    self.assertEqual(response.status_code, 400)
+                    self.assertEqual(response['Content-Type'], 'application/json')
+                    self.assertEqual(response.json(), {'error': f"Invalid value(s) for: {field}"})
+
+    def test_inactive_listings_are_not_served(self):
+        withdrawn = make_property(make_vendor('other@example.com'), status='inactive')
+        for url in ('/api/v1/properties', '/api/v1/properties/facets'):
+            with self.subTest(url=url):
+                response = self.client.get(url, {'status': 'inactive'})
+                self.assertEqual(response.status_code, 400)
+                self.assertEqual(response.json(), {'error': "Invalid value(s) for: status"})
+        results = self.client.get('/api/v1/properties', {'status': 'all'}).json()['results']
+        self.assertEqual(len(results), 1)
+        self.assertNotIn(withdrawn.pk, [result['id'] for result in results])
+        facets = self.client.get('/api/v1/properties/facets', {'status': 'all'}).json()
+        self.assertNotIn('inactive', [facet['value'] for facet in facets['status']])
+
+    def test_valid_filters(self):
+        query = {'min_price': '50,000', 'bedrooms': '2+', 'status': 'all', 'property_type': 'apartment'}
+        response = self.client.get('/api/v1/properties', query)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()['results']), 1)
+        self.assertEqual(self.client.get('/api/v1/properties/facets', query).status_code, 200)
+
+
+# --------------------------------
+# Keyword index
+# --------------------------------
+class FullTextIndexTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.vendor = make_vendor()
+
+    def matches(self, text):
+        """Row ids the index itself returns, whether or not the property still exists"""
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT rowid FROM {fulltext.FTS_TABLE} WHERE {fulltext.FTS_TABLE} MATCH %s',
+                [fulltext.match_expression(text)],
+            )
+            return {rowid for rowid, in cursor.fetchall()}
+
+    def drop_triggers(self):
+        with connection.cursor() as cursor:
+            for suffix in ('ai', 'ad', 'au'):
+                cursor.execute(f'DROP TRIGGER {fulltext.FTS_TABLE}_{suffix}')
+
+    def test_index_follows_inserts_updates_and_deletes(self):
+        listing = make_property(self.vendor, title='Lekki penthouse')
+        bulk, = Property.objects.bulk_create([Property(
+            vendor=self.vendor, title='Ikoyi terrace', description='Terrace.', property_type='house',
+            listing_type='sale', address='2 Bourdillon Road', city='Lagos', state='Lagos',
+            price=Decimal('900000.00'), bedrooms=4, bathrooms=3,
+        )])
+        self.assertEqual(self.matches('penthouse'), {listing.pk})
+        self.assertEqual(self.matches('terr'), {bulk.pk})
+
+        listing.title = 'Lekki duplex'
+        listing.save()
+        Property.objects.filter(pk=bulk.pk).update(city='Abuja')
+        self.assertEqual(self.matches('penthouse'), set())
+        self.assertEqual(self.matches('duplex'), {listing.pk})
+        self.assertEqual(self.matches('abuja terrace'), {bulk.pk})
+
+        listing.delete()
+        self.assertEqual(self.matches('duplex'), set())
+
+    def test_triggers_are_reinstalled_after_migrate(self):
+        self.drop_triggers()
+        emit_post_migrate_signal(verbosity=0, interactive=False, db='default')
+        listing = make_property(self.vendor, title='Lekki penthouse')
+        self.assertEqual(self.matches('penthouse'), {listing.pk})
+
+    def test_rebuild_indexes_existing_rows(self):
+        self.drop_triggers()
+        listing = make_property(self.vendor, title='Lekki penthouse')
+        self.assertEqual(self.matches('penthouse'), set())
+
+        out = StringIO()
+        call_command('rebuild_search_index', stdout=out)
+        self.assertEqual(self.matches('penthouse'), {listing.pk})
+        self.assertIn('Indexed 1 properties', out.getvalue())
+        # The command also puts the triggers back
+        listing.delete()
+        self.assertEqual(self.matches('penthouse'), set())
+
+
+# --------------------------------
+# Geo search
+# --------------------------------
+class GeoSearchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.vendor = make_vendor()
+
+    def place(self, title, latitude, longitude, **fields):
+        return make_property(self.vendor, title=title, latitude=latitude, longitude=longitude, **fields)
+
+    def test_nearest_first_within_radius(self):
+        # About 111km per degree of latitude
+        far = self.place('Far', 6.45 + 8 / 111.2, 3.39)
+        middle = self.place('Middle', 6.45 - 3 / 111.2, 3.39)
+        near = self.place('Near', 6.45 + 1 / 111.2, 3.39)
+        self.place('Withdrawn', 6.45, 3.39, status='inactive')
+
+        listed = Property.objects.exclude(status='inactive')
+        results = geo.nearby(listed, 6.45, 3.39, 5)
+        self.assertEqual(results, [near, middle])
+        self.assertAlmostEqual(results[0].distance_km, geo.haversine_km(6.45, 3.39, near.latitude, near.longitude))
+        self.assertEqual(geo.nearby(listed, 6.45, 3.39, 10), [near, middle, far])
+
+    def test_limit_is_applied_in_the_query(self):
+        for i in range(5):
+            self.place(f'Flat {i}', 6.45 + i / 1000, 3.39)
+        with CaptureQueriesContext(connection) as queries:
+            results = geo.nearby(Property.objects.all(), 6.45, 3.39, 5, limit=2)
+        self.assertEqual([result.title for result in results], ['Flat 0', 'Flat 1'])
+        self.assertEqual(len(queries), 1)
+        self.assertIn('LIMIT 2', queries[0]['sql'])
+
+    def test_nearby_wraps_across_the_antimeridian(self):
+        east = self.place('East of the line', -17.0, 179.99)
+        west = self.place('West of the line', -17.0, -179.98)
+        self.place('Far west', -17.0, -179.0)
+
+        self.assertEqual(geo.nearby(Property.objects.all(), -17.0, 179.995, 5), [east, west])
+        self.assertEqual(geo.nearby(Property.objects.all(), -17.0, -179.985, 5), [west, east])
+
+    def test_map_viewport_across_the_antimeridian(self):
+        self.place('East of the line', -17.0, 179.5)
+        self.place('West of the line', -17.0, -179.5)
+        self.place('Elsewhere', -17.0, 170.0)
+
+        response = self.client.get(
+            '/listings/listings/map', {'south': '-18', 'west': '179', 'north': '-16', 'east': '-179'}
+        )
+        self.assertEqual(
+            sorted(result['title'] for result in response.json()['results']), ['East of the line', 'West of the line']
+        )
+
+
+# --------------------------------
+# Query budgets
+# --------------------------------
+@plain_static_storage
+class ListingQueryBudgetTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.vendor = make_vendor()
+        for i in range(15):
+            listing = make_property(cls.vendor, title=f'Flat {i}', latitude=6.45 + i / 1000, longitude=3.39)
+            PropertyFeature.objects.create(property=listing, feature='Pool')
+            PropertyImage.objects.create(property=listing, image=f'properties/{i}.jpg')
+        cls.listing = listing
+        trends.compute_trends()
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+
+    def assertWithinBudget(self, url_name, *args, data=None):
+        response = assert_query_budget(self.client, url_name, *args, data=data)
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_pages(self):
+        self.assertWithinBudget('listings')
+        self.assertWithinBudget('listings', data={'q': 'flat', 'bedrooms': '2', 'min_price': '1000'})
+        next_page = self.assertWithinBudget('listings').context['page'].next_cursor
+        self.assertWithinBudget('listings', data={'cursor': next_page})
+        self.assertWithinBudget('property_detail', self.listing.pk)
+        self.client.force_login(make_customer().user)
+        self.assertWithinBudget('property_detail', self.listing.pk)
+
+    def test_geo_and_trends(self):
+        self.assertWithinBudget('nearby_listings', data={'lat': '6.45', 'lng': '3.39', 'radius': '10'})
+        self.assertWithinBudget('map_listings', data={'south': '6', 'west': '3', 'north': '7', 'east': '4'})
+        self.assertWithinBudget('price_trends', data={'city': 'Lagos'})
+
+    def test_api(self):
+        next_page = self.assertWithinBudget('api_property_list', data={'limit': '5'}).json()['next']
+        self.assertWithinBudget('api_property_list', data={'limit': '5', 'cursor': next_page, 'city': 'Lagos'})
+        self.assertWithinBudget('api_property_detail', self.listing.pk, data={'fields': 'id,title,images,features'})
+        self.assertWithinBudget('api_vendor_detail', self.vendor.pk)
+        self.assertWithinBudget('api_property_facets', data={'city': 'Lagos'})
+
+
+# --------------------------------
+# Detail page cache
+# --------------------------------
+@plain_static_storage
+class DetailCacheTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.vendor = make_vendor()
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        # Views are counted by ViewCountTests; keep them out of the flusher here.
+        patcher = mock.patch.object(viewcounts, 'record_view')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.listing = make_property(self.vendor, title='Lekki penthouse')
+        self.url = f'/listings/listings/{self.listing.pk}'
+
+    def assertForgottenAfter(self, change):
+        """Render (and so cache) the page, then check ``change`` drops it once committed"""
+        self.client.get(self.url)
+        self.assertIsNotNone(cache.get(detail.cache_key(self.listing.pk)))
+        with self.captureOnCommitCallbacks(execute=True):
+            change()
+        self.assertIsNone(cache.get(detail.cache_key(self.listing.pk)))
+
+    def test_body_is_served_from_the_cache(self):
+        cache.set(detail.cache_key(self.listing.pk), '<p>cached body</p>')
+        self.assertContains(self.client.get(self.url), 'cached body')
+
+    def test_saving_the_property_drops_it(self):
+        self.listing.title = 'Lekki duplex'
+        self.assertForgottenAfter(self.listing.save)
+        response = self.client.get(self.url)
+        self.assertContains(response, 'Lekki duplex')
+        self.assertNotContains(response, 'Lekki penthouse')
+
+    def test_withdrawing_the_property_drops_it(self):
+        self.listing.status = 'inactive'
+        self.assertForgottenAfter(self.listing.save)
+        self.assertEqual(self.client.get(self.url).status_code, 404)
+
+    def test_image_and_feature_changes_drop_it(self):
+        self.assertForgottenAfter(lambda: PropertyFeature.objects.create(property=self.listing, feature='Pool'))
+        self.assertContains(self.client.get(self.url), 'Pool')
+        image = PropertyImage.objects.create(property=self.listing, image='properties/1.jpg')
+        self.assertForgottenAfter(image.delete)
+
+    def test_new_image_variants_drop_it(self):
+        image = PropertyImage.objects.create(property=self.listing, image='properties/1.jpg')
+        self.assertForgottenAfter(lambda: variants_built.send(sender=PropertyImage, pk=image.pk))
+
+
+# --------------------------------
+# Bulk import
+# --------------------------------
+IMPORT_ROW = {
+    'title': 'Imported duplex', 'description': 'Four bedroom duplex.', 'property_type': 'house',
+    'listing_type': 'sale', 'status': 'available', 'address': '3 Allen Avenue', 'city': 'Ikeja',
+    'state': 'Lagos', 'price': '450000', 'currency': 'NGN', 'bedrooms': '4', 'bathrooms': '3',
+}
+CSV_HEADER = ','.join(IMPORT_ROW)
+CSV_ROW = ','.join(IMPORT_ROW.values())
+
+
+@plain_static_storage
+class ImporterTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.vendor = make_vendor()
+
+    def run_import(self, content, fmt):
+        errors = []
+        result = importer.import_properties(
+            io.BytesIO(content), self.vendor, fmt,
+            on_error=lambda row, row_errors: errors.extend(importer.error_rows(row, row_errors)),
+        )
+        return result, errors
+
+    def jsonl(self, *rows):
+        return b''.join(json.dumps({**IMPORT_ROW, **row}).encode() + b'\n' for row in rows)
+
+    def test_features(self):
+        result, errors = self.run_import(self.jsonl({'features': ['Pool', ' Garden ', '']}), 'jsonl')
+        self.assertEqual((result.created, errors), (1, []))
+        self.assertEqual(sorted(PropertyFeature.objects.values_list('feature', flat=True)), ['Garden', 'Pool'])
+
+    def test_malformed_features_reject_only_their_row(self):
+        content = self.jsonl({'features': 5}, {'features': ['Pool', 3]}, {'features': {'a': 1}}, {})
+        result, errors = self.run_import(content, 'jsonl')
+        self.assertEqual((result.created, result.failed), (1, 3))
+        self.assertEqual([(row, field) for row, field, _ in errors], [(1, 'features'), (2, 'features'), (3, 'features')])
+
+    def test_non_utf8_csv_is_reported_not_raised(self):
+        content = f"{CSV_HEADER}\n{CSV_ROW}\n".replace('Ikeja', 'Ikéja').encode('latin-1')
+        result, errors = self.run_import(content, 'csv')
+        self.assertEqual(result.created, 0)
+        self.assertEqual(len(errors), 1)
+        self.assertIn('not UTF-8', errors[0][2])
+
+    def test_rows_before_a_decoding_error_are_kept(self):
+        # Larger than the text reader's buffer, so the bad byte arrives in a later read.
+        good = '\n'.join([CSV_HEADER] + [CSV_ROW] * 200) + '\n'
+        result, errors = self.run_import(good.encode() + b'\xff\xfe,,\n', 'csv')
+        self.assertGreater(result.created, 0)
+        self.assertEqual(len(errors), 1)
+        self.assertEqual(Property.objects.count(), result.created)
+
+    def test_upload_view_reports_undecodable_files(self):
+        self.client.force_login(self.vendor.user)
+        upload = SimpleUploadedFile('listings.csv', f"{CSV_HEADER}\n{CSV_ROW}\n".encode('utf-16'))
+        response = self.client.post('/vendor/properties/import/', {'file': upload})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['result'].created, 0)
+        self.assertIn('not UTF-8', str(response.context['report']))
+
+
+# --------------------------------
+# Exports
+# --------------------------------
+class CsvExportTests(TestCase):
+    def test_formula_cells_are_neutralised(self):
+        vendor = make_vendor()
+        make_property(vendor, title='=HYPERLINK("http://evil.example","Click")', address='@SUM(A1)',
+                      description='-2+3', city='+Lagos', bedrooms=-1)
+        lines = list(exports.iter_export(exports.property_queryset({}), exports.PROPERTY_COLUMNS, 'csv'))
+        row = next(csv.DictReader(io.StringIO(''.join(lines))))
+        self.assertEqual(row['title'], '\'=HYPERLINK("http://evil.example","Click")')
+        self.assertEqual(row['address'], "'@SUM(A1)")
+        self.assertEqual(row['description'], "'-2+3")
+        self.assertEqual(row['city'], "'+Lagos")
+        # Numbers are not text, so they are left alone.
+        self.assertEqual(row['bedrooms'], '-1')
+
+    def test_other_cells_are_unchanged(self):
+        self.assertEqual(exports.csv_cell('Two bedroom flat'), 'Two bedroom flat')
+        self.assertEqual(exports.csv_cell(['Pool', 'Garden']), 'Pool|Garden')
+        self.assertEqual(exports.csv_cell(['=1', 'Garden']), "'=1|Garden")
+        self.assertEqual(exports.csv_cell(None), None)
+
+
+# --------------------------------
+# Customer matching
+# --------------------------------
+@plain_static_storage
+class MatchingTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.vendor = make_vendor()
+        cls.customer = make_customer(preferred_location='Lagos', preferred_bedrooms=3)
+
+    def setUp(self):
+        matching.engine.reset()
+        self.addCleanup(matching.engine.reset)
+
+    def test_large_bedroom_counts_load_and_score(self):
+        mansion = make_property(self.vendor, bedrooms=40_000)
+        huge = make_property(self.vendor, bedrooms=2 ** 40)
+        studio = make_property(self.vendor, bedrooms=0)
+        matrix = matching.ListingMatrix.load()
+        prefs = matching.Preferences(self.customer)
+        scores = dict(zip(matrix.pk[:matrix.size].tolist(), matrix.scores(prefs)))
+        self.assertEqual(scores[mansion.pk], 1.0)
+        self.assertEqual(scores[huge.pk], 1.0)
+        self.assertLess(scores[studio.pk], 1.0)
+
+    def test_large_bedroom_count_saved_into_a_loaded_matrix(self):
+        make_property(self.vendor)
+        self.assertEqual(len(matching.top_matches(self.customer)), 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            mansion = make_property(self.vendor, bedrooms=40_000)
+        self.assertEqual(matching.top_matches(self.customer)[0][0], mansion)
+
+    def test_customer_dashboard_with_large_bedroom_counts(self):
+        mansion = make_property(self.vendor, bedrooms=40_000)
+        self.client.force_login(self.customer.user)
+        response = self.client.get('/customer/dashboard/')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(mansion, [match for match, _ in response.context['matches']])
+
+    def test_customer_dashboard_shows_listing_currency(self):
+        make_property(self.vendor, currency='USD', price=Decimal('1500.00'))
+        self.client.force_login(self.customer.user)
+        response = self.client.get('/customer/dashboard/')
+        self.assertContains(response, 'USD 1500.00')
+        self.assertNotContains(response, '₦')
+
+
+# --------------------------------
+# Saved-search alerts
+# --------------------------------
+@plain_static_storage
+class SearchAlertTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.vendor = make_vendor()
+        cls.customer = make_customer()
+
+    def setUp(self):
+        # Stands in for another worker's index, which this process's signals never touch.
+        self.other = alerts.AlertIndex()
+        self.other.properties_saved([make_property(self.vendor, city='Abuja')])
+
+    def save_search(self, **criteria):
+        return SavedSearch.objects.create(customer=self.customer, name='Lagos flats', city='Lagos', **criteria)
+
+    def test_search_saved_in_another_process_alerts_straight_away(self):
+        search = self.save_search()
+        listing = make_property(self.vendor)
+        self.assertEqual(self.other.properties_saved([listing]), 1)
+        self.assertTrue(SearchAlert.objects.filter(search=search, property=listing).exists())
+
+    def test_search_changed_in_another_process(self):
+        search = self.save_search()
+        self.other.properties_saved([make_property(self.vendor)])
+        search.city = 'Ibadan'
+        search.save()
+        self.assertEqual(self.other.match(make_property(self.vendor)), [])
+        self.assertEqual(self.other.match(make_property(self.vendor, city='Ibadan')), [search])
+
+    def test_search_paused_or_deleted_in_another_process(self):
+        paused, deleted = self.save_search(), self.save_search()
+        self.other.properties_saved([make_property(self.vendor)])
+        SavedSearch.objects.filter(pk=paused.pk).update(is_active=False)
+        SavedSearch.objects.filter(pk=deleted.pk).delete()
+        self.assertEqual(self.other.properties_saved([make_property(self.vendor)]), 0)
+        self.assertEqual(len(self.other.index), 0)
+
+    def test_digest_is_not_html_escaped(self):
+        self.save_search()
+        self.other.properties_saved([make_property(self.vendor, title='Bed & Breakfast <Ikoyi>')])
+        self.assertEqual(alerts.send_digests(), (1, 1))
+        body = OutboundEmail.objects.get().body
+        self.assertIn('Bed & Breakfast <Ikoyi>', body)
+        self.assertNotIn('&amp;', body)
+
+
+# --------------------------------
+# Vendor rollups
+# --------------------------------
+class VendorRollupTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.vendor = make_vendor()
+        cls.other = make_vendor('other@example.com')
+
+    def status_rows(self, vendor):
+        return {
+            status: (count, price, views)
+            for status, count, price, views in VendorStatusRollup.objects.filter(vendor=vendor)
+            .exclude(listing_count=0).values_list('status', 'listing_count', 'price_total', 'views_total')
+        }
+
+    def daily_total(self, vendor):
+        return sum(VendorDailyRollup.objects.filter(vendor=vendor).values_list('new_listings', flat=True))
+
+    def assertInSync(self):
+        self.assertEqual(rollups.current_rollups(), rollups.expected_rollups())
+
+    def test_signals_apply_deltas(self):
+        listing = make_property(self.vendor, price=Decimal('100.00'))
+        make_property(self.vendor, price=Decimal('50.00'))
+        self.assertEqual(self.status_rows(self.vendor), {'available': (2, Decimal('150.00'), 0)})
+        self.assertEqual(self.daily_total(self.vendor), 2)
+
+        listing.status = 'sold'
+        listing.price = Decimal('120.00')
+        listing.save()
+        self.assertEqual(self.status_rows(self.vendor), {
+            'available': (1, Decimal('50.00'), 0), 'sold': (1, Decimal('120.00'), 0),
+        })
+        listing.delete()
+        self.assertEqual(self.status_rows(self.vendor), {'available': (1, Decimal('50.00'), 0)})
+        self.assertEqual(self.daily_total(self.vendor), 1)
+        self.assertInSync()
+
+    def test_changing_vendor_moves_all_counts(self):
+        listing = make_property(self.vendor, price=Decimal('100.00'))
+        listing.vendor = self.other
+        listing.save()
+        self.assertEqual(self.status_rows(self.vendor), {})
+        self.assertEqual(self.status_rows(self.other), {'available': (1, Decimal('100.00'), 0)})
+        self.assertEqual((self.daily_total(self.vendor), self.daily_total(self.other)), (0, 1))
+        self.assertInSync()
+
+    def test_bulk_import_rollups(self):
+        content = b''.join(json.dumps({**IMPORT_ROW, 'price': str(100 * i)}).encode() + b'\n' for i in (1, 2, 3))
+        self.assertEqual(importer.import_properties(io.BytesIO(content), self.vendor, 'jsonl').created, 3)
+        self.assertEqual(self.status_rows(self.vendor), {'available': (3, Decimal('600.00'), 0)})
+        self.assertEqual(self.daily_total(self.vendor), 3)
+        self.assertInSync()
+
+    def test_reconcile_command(self):
+        make_property(self.vendor)
+        make_property(self.other, status='sold')
+        out = StringIO()
+        call_command('rebuild_vendor_rollups', '--check', stdout=out)
+        self.assertIn('0 rollup row(s) out of date', out.getvalue())
+
+        # Drift from writes that bypass the signals.
+        Property.objects.filter(vendor=self.vendor).update(price=Decimal('1.00'), views_count=9)
+        VendorDailyRollup.objects.filter(vendor=self.other).delete()
+        out = StringIO()
+        call_command('rebuild_vendor_rollups', '--check', stdout=out)
+        self.assertIn('2 rollup row(s) out of date', out.getvalue())
+
+        out = StringIO()
+        call_command('rebuild_vendor_rollups', '--vendor', str(self.vendor.pk), stdout=out)
+        self.assertIn('Rebuilt', out.getvalue())
+        self.assertEqual(self.status_rows(self.vendor), {'available': (1, Decimal('1.00'), 9)})
+        self.assertNotEqual(rollups.current_rollups(), rollups.expected_rollups())
+        call_command('rebuild_vendor_rollups', stdout=StringIO())
+        self.assertInSync()
+        out = StringIO()
+        call_command('rebuild_vendor_rollups', stdout=out)
+        self.assertIn('Rollups are up to date', out.getvalue())
+
+
+# --------------------------------
+# View counts
+# --------------------------------
+@plain_static_storage
+class ViewCountTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.vendor = make_vendor()
+        cls.listings = [make_property(cls.vendor, title=f'Flat {i}') for i in range(3)]
+
+    def setUp(self):
+        # The flusher thread would write on its own connection; tests flush by hand.
+        patcher = mock.patch.object(viewcounts, '_ensure_flusher')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        viewcounts.flush()
+
+    def views(self):
+        return dict(Property.objects.values_list('pk', 'views_count'))
+
+    def assertRollupsMatch(self):
+        self.assertEqual(rollups.current_rollups()[0], rollups.expected_rollups()[0])
+
+    def test_views_are_buffered_until_flushed(self):
+        first, second, third = self.listings
+        for pk in (first.pk, first.pk, second.pk):
+            self.assertEqual(self.client.get(f'/listings/listings/{pk}').status_code, 200)
+        viewcounts.record_view(third.pk, 5)
+        self.assertEqual(set(self.views().values()), {0})
+        self.assertEqual(viewcounts.pending_views(), {first.pk: 2, second.pk: 1, third.pk: 5})
+
+        with CaptureQueriesContext(connection) as captured:
+            self.assertEqual(viewcounts.flush(), 3)
+        # One UPDATE per distinct increment, not per property.
+        updates = [query for query in captured if query['sql'].startswith('UPDATE "accounts_property"')]
+        self.assertEqual(len(updates), 3)
+        self.assertEqual(self.views(), {first.pk: 2, second.pk: 1, third.pk: 5})
+        self.assertEqual(viewcounts.pending_views(), {})
+        self.assertRollupsMatch()
+
+    def test_same_increments_share_an_update(self):
+        for listing in self.listings:
+            viewcounts.record_view(listing.pk, 2)
+        with CaptureQueriesContext(connection) as captured:
+            viewcounts.flush()
+        updates = [query for query in captured if query['sql'].startswith('UPDATE "accounts_property"')]
+        self.assertEqual(len(updates), 1)
+        self.assertEqual(set(self.views().values()), {2})
+
+    def test_failed_flush_keeps_the_counts(self):
+        viewcounts.record_view(self.listings[0].pk, 4)
+        with mock.patch.object(rollups, 'views_added', side_effect=RuntimeError('database is locked')), \
+                self.assertLogs(viewcounts.logger, 'ERROR'):
+            self.assertEqual(viewcounts.flush(), 0)
+        self.assertEqual(viewcounts.pending_views(), {self.listings[0].pk: 4})
+        self.assertEqual(self.views()[self.listings[0].pk], 0)
+        viewcounts.flush()
+        self.assertEqual(self.views()[self.listings[0].pk], 4)
+
+    def test_full_save_keeps_views_flushed_since_loading(self):
+        stale = Property.objects.get(pk=self.listings[0].pk)
+        viewcounts.record_view(stale.pk, 7)
+        viewcounts.flush()
+        stale.title = 'Edited title'
+        stale.price = Decimal('260000.00')
+        stale.save()
+        self.assertEqual(stale.views_count, 7)
+        fresh = Property.objects.get(pk=stale.pk)
+        self.assertEqual((fresh.title, fresh.views_count), ('Edited title', 7))
+        self.assertRollupsMatch()
+
+
+class ViewCountFlusherTests(TestCase):
+    def test_thread_starts_once_per_process(self):
+        with mock.patch.object(viewcounts, '_flusher_pid', None), \
+                mock.patch('threading.Thread') as thread, mock.patch.object(viewcounts, '_pending', viewcounts.Counter()):
+            viewcounts.record_view(1)
+            viewcounts.record_view(2)
+            self.assertEqual(thread.call_count, 1)
+            self.assertIs(thread.call_args.kwargs['target'], viewcounts._run_flusher)
+            self.assertTrue(thread.call_args.kwargs['daemon'])
+            # A forked worker gets its own thread.
+            with mock.patch('os.getpid', return_value=-1):
+                viewcounts.record_view(3)
+            self.assertEqual(thread.call_count, 2)
+
+    def test_thread_flushes_every_interval(self):
+        with mock.patch('time.sleep', side_effect=[None, None, SystemExit]) as sleep, \
+                mock.patch.object(viewcounts, 'flush') as flush:
+            with self.assertRaises(SystemExit):
+                viewcounts._run_flusher()
+        sleep.assert_called_with(viewcounts.FLUSH_INTERVAL)
+        self.assertEqual(flush.call_count, 2)
+
+    def test_flushes_at_exit(self):
+        with mock.patch('atexit.register') as register:
+            module = importlib.reload(viewcounts)
+        self.addCleanup(importlib.reload, viewcounts)
+        register.assert_called_once_with(module.flush)
+
+
+# --------------------------------
+# Price trends
+# --------------------------------
+class PriceTrendTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.vendor = make_vendor()
+        cls.this_week = trends.week_start(timezone.localdate())
+
+    def trend(self, weeks_ago=0, **group):
+        week = self.this_week - timedelta(weeks=weeks_ago)
+        return PriceTrend.objects.get(week=week, **{'city': '', 'property_type': '', 'listing_type': '', **group})
+
+    def backdate(self, listing, weeks):
+        PriceHistory.objects.filter(property=listing).update(recorded_at=timezone.now() - timedelta(weeks=weeks))
+
+    def test_repriced_listing_counts_once_at_its_current_price(self):
+        listing = make_property(self.vendor, price=Decimal('300000.00'))
+        for price in ('280000.00', '260000.00', '240000.00'):
+            listing.price = Decimal(price)
+            listing.save()
+        listing.title = 'Renamed'
+        listing.save()
+        self.assertEqual(PriceHistory.objects.filter(property=listing).count(), 4)
+        trends.compute_trends()
+        trend = self.trend(city='lagos')
+        self.assertEqual(trend.listings, 1)
+        self.assertEqual((trend.p10, trend.p90), (Decimal('240000.00'), Decimal('240000.00')))
+
+    def test_past_weeks_use_the_price_in_effect(self):
+        listing = make_property(self.vendor, price=Decimal('100000.00'))
+        self.backdate(listing, 3)
+        listing.price = Decimal('120000.00')
+        listing.save()
+        make_property(self.vendor, price=Decimal('300000.00'))
+        self.assertEqual(trends.compute_trends(weeks=None), 8 * 4)
+        for weeks_ago in (3, 2, 1):
+            trend = self.trend(weeks_ago)
+            self.assertEqual((trend.listings, trend.median), (1, Decimal('100000.00')))
+        trend = self.trend()
+        self.assertEqual((trend.listings, trend.median), (2, Decimal('210000.00')))
+
+    def test_listings_leave_the_inventory_when_no_longer_available(self):
+        sold = make_property(self.vendor, price=Decimal('500000.00'))
+        self.backdate(sold, 1)
+        make_property(self.vendor, price=Decimal('100000.00'), status='sold')
+        sold.status = 'sold'
+        sold.save()
+        self.assertEqual(list(PriceHistory.objects.filter(property=sold).values_list('status', flat=True)),
+                         ['available', 'sold'])
+        trends.compute_trends()
+        self.assertEqual((self.trend(1).listings, self.trend(1).median), (1, Decimal('500000.00')))
+        self.assertFalse(PriceTrend.objects.filter(week=self.this_week).exists())
+
+    def test_recompute_replaces_only_recent_weeks(self):
+        old_week = PriceTrend.objects.create(
+            week=self.this_week - timedelta(weeks=5), listings=7,
+            p10=1, p25=2, median=3, p75=4, p90=5,
+        )
+        make_property(self.vendor)
+        self.assertEqual(trends.compute_trends(), 8)
+        make_property(self.vendor, city='Abuja')
+        trends.compute_trends()
+        self.assertEqual(self.trend().listings, 2)
+        self.assertEqual(PriceTrend.objects.filter(week=self.this_week, city='lagos', property_type='', listing_type='').count(), 1)
+        self.assertTrue(PriceTrend.objects.filter(pk=old_week.pk).exists())
+
+
+# --------------------------------
+# Pre-rendered pages
+# --------------------------------
+@plain_static_storage
+class PrerenderTests(TestCase):
+    def setUp(self):
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root)
+        override = override_settings(PRERENDER_ROOT=Path(root))
+        override.enable()
+        self.addCleanup(override.disable)
+
+    def test_build_writes_every_page(self):
+        out = StringIO()
+        call_command('prerender_pages', stdout=out)
+        for name in prerender.PAGES:
+            with self.subTest(page=name):
+                html = prerender.output_path(reverse(name)).read_text(encoding='utf-8')
+                self.assertIn('<html', html)
+                self.assertRegex(html, r'/static/style\.css\?v=[0-9a-f]{12}')
+        self.assertIn(f'Pre-rendered {len(prerender.PAGES)} page(s)', out.getvalue())
+
+    def test_asset_urls_are_hashed_by_content(self):
+        html = prerender.hash_asset_urls(
+            '<link href="/static/style.css"><img src="/static/img/missing.png"><a href="/about-us">'
+        )
+        with open(finders.find('style.css'), 'rb') as handle:
+            version = hashlib.md5(handle.read(), usedforsecurity=False).hexdigest()[:12]
+        self.assertEqual(
+            html, f'<link href="/static/style.css?v={version}"><img src="/static/img/missing.png"><a href="/about-us">'
+        )
+
+    def test_anonymous_visitors_are_served_from_disk(self):
+        prerender.build()
+        url = reverse('about-us')
+        prerender.output_path(url).write_text('pre-rendered about page', encoding='utf-8')
+        with self.assertNumQueries(0):
+            response = self.client.get(url)
+        self.assertIsInstance(response, FileResponse)
+        self.assertEqual(response['Cache-Control'], 'public, max-age=300')
+        self.assertEqual(b''.join(response.streaming_content), b'pre-rendered about page')
 
-# Create your tests here.
+    def test_live_view_when_not_cacheable(self):
+        prerender.build()
+        url = reverse('about-us')
+        self.assertNotIsInstance(self.client.get(url, {'utm_source': 'mail'}), FileResponse)
+        self.client.cookies[settings.SESSION_COOKIE_NAME] = 'session'
+        self.assertNotIsInstance(self.client.get(url), FileResponse)
+        del self.client.cookies[settings.SESSION_COOKIE_NAME]
+        prerender.output_path(url).unlink()
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIsInstance(response, FileResponse)
@@ -0,0 +1,231 @@
+"""Weekly asking-price percentiles, materialized into ``PriceTrend``.
+
+``PriceHistory`` gets a row whenever a property is listed or its price,
+status or trend group (city, property type, listing type) changes.
+``compute_trends`` (run periodically by ``compute_price_trends``) replays
+that history into one inventory per week: each property's last recorded
+state by the end of the week, counted only if it was available then. So a
+listing repriced three times in a week counts once, at its latest price,
+and listings that never changed still count every week they were live.
+Every group's percentiles come from one NumPy pass: rows are sorted by
+(group, price), so each group is a contiguous run and a percentile is an
+interpolated index into it. Besides each exact
+(city, property type, listing type) group, every combination with some of
+those left blank ("any") is computed too, since percentiles cannot be
+merged after the fact.
+
+``trend_series`` reads the small aggregate table; the view caches it.
+"""
+import hashlib
+from datetime import date, timedelta
+from decimal import Decimal
+from itertools import product
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+
+from .models import PriceHistory, PriceTrend
+
+
+PERCENTILES = (('p10', 0.10), ('p25', 0.25), ('median', 0.50), ('p75', 0.75), ('p90', 0.90))
+RECOMPUTE_WEEKS = getattr(settings, 'PRICE_TREND_RECOMPUTE_WEEKS', 2)
+CACHE_SECONDS = getattr(settings, 'PRICE_TREND_CACHE_SECONDS', 60 * 60)
+VERSION_KEY = 'price_trends:version'
+CENTS = Decimal('0.01')
+
+
+def week_start(day):
+    return day - timedelta(days=day.weekday())
+
+
+# --------------------------------
+# Capture
+# --------------------------------
+def tracked_state(property_obj):
+    """The fields whose changes ``PriceHistory`` records"""
+    return (
+        property_obj.status, property_obj.price, property_obj.city.strip(),
+        property_obj.property_type, property_obj.listing_type,
+    )
+
+
+def history_row(property_obj, recorded_at=None):
+    status, price, city, property_type, listing_type = tracked_state(property_obj)
+    return PriceHistory(
+        property=property_obj,
+        price=price,
+        status=status,
+        city=city,
+        property_type=property_type,
+        listing_type=listing_type,
+        recorded_at=recorded_at or timezone.now(),
+    )
+
+
+def record_history(properties):
+    PriceHistory.objects.bulk_create(history_row(property_obj) for property_obj in properties)
+
+
+# --------------------------------
+# Aggregation
+# --------------------------------
+def _codes(values):
+    """Factorize strings into int codes and their labels; code 0 is "any" ('')"""
+    index = {'': 0}
+    codes = np.fromiter((index.setdefault(value, len(index)) for value in values), dtype=np.int64, count=len(values))
+    return codes, list(index)
+
+
+def weekly_percentiles(rows):
+    """``rows`` of (city, property_type, listing_type, week ordinal, price) -> PriceTrend objects"""
+    if not rows:
+        return []
+    cities, types, listing_types, weeks, prices = zip(*rows)
+    city, city_labels = _codes([city.strip().lower() for city in cities])
+    kind, kind_labels = _codes(types)
+    listing, listing_labels = _codes(listing_types)
+    week = np.fromiter(weeks, dtype=np.int64, count=len(weeks))
+    price = np.array(prices, dtype=np.float64)
+
+    # One copy of the data per combination of blanked-out dimensions.
+    columns = {'city': [], 'kind': [], 'listing': [], 'week': [], 'price': []}
+    for keep_city, keep_kind, keep_listing in product((True, False), repeat=3):
+        columns['city'].append(city if keep_city else np.zeros_like(city))
+        columns['kind'].append(kind if keep_kind else np.zeros_like(kind))
+        columns['listing'].append(listing if keep_listing else np.zeros_like(listing))
+        columns['week'].append(week)
+        columns['price'].append(price)
+    city, kind, listing, week, price = (np.concatenate(columns[name]) for name in columns)
+
+    week_base = week.min()
+    key = ((city * len(kind_labels) + kind) * len(listing_labels) + listing) * (week.max() - week_base + 1) + (week - week_base)
+    order = np.lexsort((price, key))
+    key, price = key[order], price[order]
+    starts = np.flatnonzero(np.r_[True, key[1:] != key[:-1]])
+    counts = np.diff(np.r_[starts, len(key)])
+
+    values = {}
+    for name, q in PERCENTILES:
+        position = starts + (counts - 1) * q
+        low = np.floor(position).astype(np.int64)
+        high = np.minimum(low + 1, starts + counts - 1)
+        values[name] = price[low] + (price[high] - price[low]) * (position - low)
+
+    # Decode each group's dimensions from its first row in the unsorted arrays.
+    first = order[starts]
+    return [
+        PriceTrend(
+            city=city_labels[city[row]],
+            property_type=kind_labels[kind[row]],
+            listing_type=listing_labels[listing[row]],
+            week=date.fromordinal(int(week[row])),
+            listings=int(count),
+            **{name: Decimal(float(values[name][i])).quantize(CENTS) for name, _ in PERCENTILES},
+        )
+        for i, (row, count) in enumerate(zip(first, counts))
+    ]
+
+
+def load_history():
+    """Every recorded state as arrays, ordered by property and then time"""
+    rows = list(
+        PriceHistory.objects.order_by('property_id', 'recorded_at', 'pk')
+        .values_list('property_id', 'recorded_at', 'status', 'city', 'property_type', 'listing_type', 'price')
+        .iterator(chunk_size=5000)
+    )
+    if not rows:
+        return None
+    properties, recorded, statuses, cities, types, listing_types, prices = zip(*rows)
+    prop = np.fromiter(properties, dtype=np.int64, count=len(rows))
+    # Looked up once: timezone.localdate() fetches the current zone on every call.
+    zone = timezone.get_current_timezone()
+    week = np.fromiter(
+        (week_start(recorded_at.astimezone(zone).date()).toordinal() for recorded_at in recorded),
+        dtype=np.int64, count=len(rows),
+    )
+    # A state is in effect until the week its property's next state was recorded in.
+    # Superseded within its own week, it is never a week's closing state.
+    same_property = np.r_[prop[1:] == prop[:-1], False]
+    until = np.where(same_property, np.r_[week[1:], 0], np.iinfo(np.int64).max)
+    available = np.array([status == 'available' for status in statuses], dtype=bool)
+    return {
+        'week': week, 'until': until, 'available': available,
+        'rows': list(zip(cities, types, listing_types, prices)),
+    }
+
+
+def inventory_rows(history, week):
+    """Rows of ``week`` for ``weekly_percentiles``: the inventory as it stood at the end of the week"""
+    ordinal = week.toordinal()
+    live = history['available'] & (history['week'] <= ordinal) & (history['until'] > ordinal)
+    rows = history['rows']
+    return [(*rows[i][:3], ordinal, rows[i][3]) for i in np.flatnonzero(live)]
+
+
+def compute_trends(weeks=RECOMPUTE_WEEKS):
+    """Recompute the last ``weeks`` weeks (all of history when ``None``); returns rows written"""
+    this_week = week_start(timezone.localdate())
+    history = load_history()
+    if weeks is not None:
+        since_week = this_week - timedelta(weeks=weeks - 1)
+    elif history is not None:
+        since_week = date.fromordinal(int(history['week'].min()))
+    else:
+        since_week = this_week
+
+    trends = []
+    week = since_week
+    while history is not None and week <= this_week:
+        trends.extend(weekly_percentiles(inventory_rows(history, week)))
+        week += timedelta(weeks=1)
+    with transaction.atomic():
+        stale = PriceTrend.objects.all()
+        if weeks is not None:
+            stale = stale.filter(week__gte=since_week)
+        stale.delete()
+        PriceTrend.objects.bulk_create(trends, batch_size=2000)
+    bump_version()
+    return len(trends)
+
+
+# --------------------------------
+# Reading
+# --------------------------------
+def bump_version():
+    # add() is a no-op when the key exists; the version only needs to change.
+    cache.add(VERSION_KEY, 0, None)
+    cache.incr(VERSION_KEY)
+
+
+def series_cache_key(city, property_type, listing_type, weeks):
+    version = cache.get(VERSION_KEY, 0)
+    # Hash the free-text city so the key stays valid for memcached.
+    city_hash = hashlib.sha256(city.strip().lower().encode()).hexdigest()[:16]
+    return f"price_trends:{version}:{city_hash}:{property_type}:{listing_type}:{weeks}"
+
+
+def trend_series(city='', property_type='', listing_type='', weeks=52):
+    """``[{week, listings, p10, ..., p90}]`` oldest first, for the last ``weeks`` weeks"""
+    since_week = week_start(timezone.localdate()) - timedelta(weeks=weeks - 1)
+    rows = (
+        PriceTrend.objects
+        .filter(city=city.strip().lower(), property_type=property_type, listing_type=listing_type, week__gte=since_week)
+        .order_by('week')
+        .values('week', 'listings', *(name for name, _ in PERCENTILES))
+    )
+    return [
+        {**row, 'week': row['week'].isoformat(), **{name: float(row[name]) for name, _ in PERCENTILES}}
+        for row in rows
+    ]
+
+
+def cached_trend_series(city='', property_type='', listing_type='', weeks=52):
+    key = series_cache_key(city, property_type, listing_type, weeks)
+    series = cache.get(key)
+    if series is None:
+        series = trend_series(city, property_type, listing_type, weeks)
+        cache.set(key, series, CACHE_SECONDS)
+    return series
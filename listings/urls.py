@@ -4,6 +4,10 @@ from . import views
 urlpatterns = [
     path("blog",views.blog_page,name="blog"),
     path("listings",views.listings_page,name="listings"),
+    path("listings/<int:pk>",views.property_detail,name="property_detail"),
+    path("listings/nearby",views.nearby_listings,name="nearby_listings"),
+    path("listings/map",views.map_listings,name="map_listings"),
+    path("listings/trends",views.price_trends,name="price_trends"),
     path("single-blog",views.single_blog_page,name="single-blog"),
     path("single-listings",views.single_listings_page,name="single-listings"),
     path("about-us",views.about_us_page,name="about-us"),
@@ -0,0 +1,88 @@
+"""Write-buffered Property.views_count increments.
+
+Detail-page hits only bump an in-process counter. A daemon thread flushes
+the buffer every ``VIEW_COUNT_FLUSH_INTERVAL`` seconds as a handful of
+``F()`` updates, and whatever is left is flushed when the worker exits.
+"""
+import atexit
+import logging
+import os
+import threading
+import time
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+
+from accounts.models import Property
+from . import rollups
+
+
+logger = logging.getLogger(__name__)
+
+FLUSH_INTERVAL = getattr(settings, 'VIEW_COUNT_FLUSH_INTERVAL', 10)
+
+_lock = threading.Lock()
+_pending = Counter()
+_flusher_pid = None
+
+
+def record_view(property_id, count=1):
+    """Count a view without touching the database"""
+    with _lock:
+        _pending[property_id] += count
+    _ensure_flusher()
+
+
+def pending_views():
+    with _lock:
+        return dict(_pending)
+
+
+def flush():
+    """Write buffered views; returns the number of properties updated"""
+    with _lock:
+        if not _pending:
+            return 0
+        batch = dict(_pending)
+        _pending.clear()
+
+    # Properties with the same increment share one UPDATE ... WHERE id IN (...).
+    by_increment = defaultdict(list)
+    for pk, count in batch.items():
+        by_increment[count].append(pk)
+
+    try:
+        with transaction.atomic():
+            for count, pks in by_increment.items():
+                Property.objects.filter(pk__in=pks).update(views_count=F('views_count') + count)
+            rollups.views_added(batch)
+    except Exception:
+        # Put the counts back so the next flush retries them.
+        with _lock:
+            _pending.update(batch)
+        logger.exception("Failed to flush %s buffered property views", sum(batch.values()))
+        return 0
+    return len(batch)
+
+
+def _run_flusher():
+    while True:
+        time.sleep(FLUSH_INTERVAL)
+        flush()
+
+
+def _ensure_flusher():
+    """Start the flush thread once per process (workers fork after import)"""
+    global _flusher_pid
+    if _flusher_pid == os.getpid():
+        return
+    with _lock:
+        if _flusher_pid == os.getpid():
+            return
+        _flusher_pid = os.getpid()
+    threading.Thread(target=_run_flusher, name='viewcount-flusher', daemon=True).start()
+
+
+atexit.register(flush)
@@ -1,12 +1,135 @@
+from django.http import Http404, JsonResponse
 from django.shortcuts import render
+from django.utils.cache import patch_cache_control
+
+from accounts.backends import load_user
+from accounts.models import Property
+from estates.instrumentation import query_budget
+
+from . import detail, geo, trends, viewcounts
+from .search import PropertySearch, InvalidCursor
 
 # Create your views here.
 
 def blog_page(request):
     return render(request,"blog.html")
 
-def listings_page(request):
-    return render(request,"listings.html")
+@query_budget(10)
+async def listings_page(request):
+    await load_user(request)
+    search = PropertySearch(request.GET)
+    try:
+        page = await search.apage(request.GET.get("cursor"))
+    except InvalidCursor:
+        page = await search.apage()
+
+    # Carry the active filters over to the "next page" link.
+    query = request.GET.copy()
+    query.pop("cursor", None)
+
+    return render(request,"listings.html",{
+        "page": page,
+        "facets": await search.afacets(),
+        "filters": request.GET,
+        "query_string": query.urlencode(),
+        "sort": search.sort,
+    })
+
+@query_budget(5)
+async def property_detail(request, pk):
+    """A listed property; its HTML comes from the cache until it, an image or a feature changes"""
+    await load_user(request)
+    body = await detail.abody(pk)
+    if body is None:
+        raise Http404("No such property")
+    viewcounts.record_view(pk)
+    return render(request, "property_detail.html", {"body": body})
+
+NEARBY_MAX_RADIUS_KM = 100
+NEARBY_LIMIT = 100
+GEO_RESULT_FIELDS = ("title", "city", "price", "currency", "latitude", "longitude")
+
+
+def _float(params, name, low, high):
+    try:
+        value = float(params[name])
+    except (KeyError, TypeError, ValueError):
+        return None
+    return value if low <= value <= high else None
+
+
+def _geo_result(property_obj):
+    result = {
+        "id": property_obj.pk,
+        "title": property_obj.title,
+        "city": property_obj.city,
+        "price": str(property_obj.price),
+        "currency": property_obj.currency,
+        "latitude": property_obj.latitude,
+        "longitude": property_obj.longitude,
+    }
+    if hasattr(property_obj, "distance_km"):
+        result["distance_km"] = round(property_obj.distance_km, 3)
+    return result
+
+
+@query_budget(3)
+def nearby_listings(request):
+    """Listings within ?radius= km of ?lat=&lng=, nearest first; other search filters apply"""
+    lat = _float(request.GET, "lat", -90, 90)
+    lng = _float(request.GET, "lng", -180, 180)
+    radius = _float(request.GET, "radius", 0, NEARBY_MAX_RADIUS_KM) if "radius" in request.GET else 5.0
+    if lat is None or lng is None or radius is None:
+        return JsonResponse(
+            {"error": f"lat, lng and radius (0-{NEARBY_MAX_RADIUS_KM} km) are required"}, status=400
+        )
+
+    queryset = PropertySearch(request.GET).get_queryset().only(*GEO_RESULT_FIELDS)
+    results = geo.nearby(queryset, lat, lng, radius, limit=NEARBY_LIMIT)
+    return JsonResponse({"results": [_geo_result(result) for result in results]})
+
+
+@query_budget(3)
+def map_listings(request):
+    """Listings inside the ?south=&west=&north=&east= viewport; west > east crosses the antimeridian"""
+    bounds = [
+        _float(request.GET, "south", -90, 90), _float(request.GET, "west", -180, 180),
+        _float(request.GET, "north", -90, 90), _float(request.GET, "east", -180, 180),
+    ]
+    if None in bounds or bounds[0] > bounds[2]:
+        return JsonResponse({"error": "south, west, north and east are required"}, status=400)
+
+    queryset = geo.in_bounds(PropertySearch(request.GET).get_queryset().only(*GEO_RESULT_FIELDS), *bounds)
+    results = list(queryset.order_by("pk")[:NEARBY_LIMIT + 1])
+    return JsonResponse({
+        "results": [_geo_result(result) for result in results[:NEARBY_LIMIT]],
+        "truncated": len(results) > NEARBY_LIMIT,
+    })
+
+TREND_MAX_WEEKS = 260
+
+
+@query_budget(3)
+def price_trends(request):
+    """Weekly asking-price percentiles for ?city=&property_type=&listing_type= (blank = all)"""
+    try:
+        weeks = int(request.GET.get("weeks", 52))
+    except ValueError:
+        weeks = 0
+    if not 1 <= weeks <= TREND_MAX_WEEKS:
+        return JsonResponse({"error": f"weeks must be between 1 and {TREND_MAX_WEEKS}"}, status=400)
+
+    property_type = request.GET.get("property_type", "")
+    listing_type = request.GET.get("listing_type", "")
+    if property_type and property_type not in dict(Property.PROPERTY_TYPES):
+        return JsonResponse({"error": "unknown property_type"}, status=400)
+    if listing_type and listing_type not in dict(Property.LISTING_TYPES):
+        return JsonResponse({"error": "unknown listing_type"}, status=400)
+
+    series = trends.cached_trend_series(request.GET.get("city", ""), property_type, listing_type, weeks)
+    response = JsonResponse({"series": series})
+    patch_cache_control(response, public=True, max_age=trends.CACHE_SECONDS)
+    return response
 
 def single_blog_page(request):
     return render(request,"single-blog.html")